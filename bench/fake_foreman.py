@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+
+Local stand-in for Foreman, serving a synthetic fleet to the plugins
+
+ - hosts/<name>/reports/last    last report of a host
+ - hosts/<mode>/                out_of_sync, errors or active hosts
+ - hosts/?search=hostgroup = x  hosts of a hostgroup
+ - fact_values?search=name = x  value of the fact x of every host, osfamily
+                                and virtual are known
+ - reports/                     last reports, newest first, searchable
+                                by last_report > "..." and hostgroup = x
+ - api/dashboard/               dashboard counters
+ - api/v2/hosts?search=...      hosts of the dashboard searches, with
+                                their count, thin=true for names only
+ - _stats                       requests served so far
+
+Lists honour per_page / page when given, like Foreman does.
+Replies carry an ETag and HTTP/1.1 keep-alive is supported. With
+--compress, replies are compressed for the clients accepting it.
+
+Ex :
+
+    bench/fake_foreman.py --hosts 8000 --payload-kb 50 --latency-ms 20
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from datetime import datetime, timedelta
+from optparse import OptionParser
+import BaseHTTPServer
+import SocketServer
+import hashlib
+import threading
+import time
+import urlparse
+import zlib
+
+try:
+    import simplejson as json
+except ImportError:
+    # pylint: disable-msg=W0404
+    import json
+
+HOSTGROUPS = ['web', 'db', 'app', 'cache']
+ENVIRONMENTS = ['production', 'staging']
+RESOURCE_TYPES = ['file', 'package', 'exec', 'service', 'config_retrieval']
+FACTS = {'osfamily': ['Debian', 'RedHat', 'Suse'],
+         'virtual': ['kvm', 'physical']}
+
+
+class Fleet(object):
+    """
+    Deterministic synthetic fleet, host i last reported i * spread ago
+    """
+
+    def __init__(self, size, payload_kb, interval=60, domain='example.com'):
+        self.size = size
+        self.domain = domain
+        self.payload = ['Notice: synthetic log line %05d' % i
+                        for i in range(payload_kb * 1024 / 40)]
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.spread = float(interval * 60) / max(size, 1)
+
+    def hostname(self, index):
+        """ Name of host number index """
+        return 'host%05d.%s' % (index, self.domain)
+
+    def host(self, index):
+        """ Host entry as listed by foreman """
+        return {'host': {'name': self.hostname(index),
+                         'hostgroup_name': HOSTGROUPS[index % 4],
+                         'environment_name': ENVIRONMENTS[index % 2],
+                         'last_report': self.reported_at(index)}}
+
+    def fact(self, index, name):
+        """ Value of the fact name of host number index, None if unknown """
+        values = FACTS.get(name)
+        return values and values[index % len(values)]
+
+    def reported(self, index):
+        """ When host number index last reported """
+        return self.now - timedelta(seconds=int(index * self.spread))
+
+    def reported_at(self, index):
+        """ Zulu timestamp of the last report of host number index """
+        return self.reported(index).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def report(self, index):
+        """ Last report of host number index """
+        times = dict([(name, 1.0 + (index + rank) % 7)
+                      for rank, name in enumerate(RESOURCE_TYPES)])
+        times['total'] = sum(times.values())
+        return {'host_name': self.hostname(index),
+                'reported_at': self.reported_at(index),
+                'summary': index % 10 and 'Success' or 'Error',
+                'metrics': {'time': times},
+                'logs': self.payload}
+
+    def index(self, hostname):
+        """ Number of a host from its name, None if unknown """
+        try:
+            index = int(hostname[4:9])
+        except ValueError:
+            return None
+        if 0 <= index < self.size and self.hostname(index) == hostname:
+            return index
+        return None
+
+    def mode(self, mode):
+        """ Indexes of the hosts in that mode """
+        if mode == 'errors':
+            return [i for i in range(self.size) if not i % 10]
+        if mode == 'out_of_sync':
+            return [i for i in range(self.size) if i * self.spread > 1800]
+        return range(self.size)
+
+    def searched(self, search):
+        """ Indexes of the hosts a search of the nodes check finds """
+        if 'status.failed' in search:
+            return self.mode('errors')
+        if 'last_report <' in search:
+            return self.mode('out_of_sync')
+        return self.mode('active')
+
+    def dashboard(self):
+        """ Dashboard counters """
+        bad = len(self.mode('errors'))
+        out_of_sync = len(self.mode('out_of_sync'))
+        return {'total_hosts': self.size,
+                'bad_hosts': bad,
+                'bad_hosts_enabled': bad,
+                'out_of_sync_hosts': out_of_sync,
+                'out_of_sync_hosts_enabled': out_of_sync,
+                'good_hosts': self.size - bad,
+                'good_hosts_enabled': self.size - bad,
+                'active_hosts': self.size,
+                'active_hosts_ok': self.size - bad,
+                'active_hosts_ok_enabled': self.size - bad,
+                'ok_hosts': self.size - bad,
+                'ok_hosts_enabled': self.size - bad,
+                'pending_hosts': 0,
+                'pending_hosts_enabled': 0,
+                'disabled_hosts': 0,
+                'reports_missing': 0}
+
+
+def search_terms(search):
+    """
+    The (field, operator, value) terms of a foreman search joined by and
+
+    >>> last_report, hostgroup = search_terms(
+    ...     'last_report > "2012-02-14 09:21:52 UTC" and hostgroup = "web"')
+    >>> last_report
+    ('last_report', '>', '2012-02-14 09:21:52 UTC')
+    >>> hostgroup
+    ('hostgroup', '=', 'web')
+    """
+
+    terms = []
+    for term in search.split(' and '):
+        if not term.strip():
+            continue
+        field, operator, value = term.strip().split(' ', 2)
+        terms.append((field, operator, value.strip('"')))
+    return terms
+
+
+def paginate(items, query):
+    """
+    Slice a list the way foreman does with per_page / page
+
+    >>> paginate(range(10), {'per_page': '3', 'page': '2'})
+    [3, 4, 5]
+
+    >>> paginate(range(3), {})
+    [0, 1, 2]
+    """
+
+    if 'per_page' not in query:
+        return items
+    per_page = int(query['per_page'])
+    page = int(query.get('page', 1))
+    return items[(page - 1) * per_page:page * per_page]
+
+
+class FakeForemanHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answer the few urls the plugins use
+    """
+
+    protocol_version = 'HTTP/1.1'
+    fleet = None
+    latency = 0
+    compress = None
+    requests = 0
+    lock = threading.Lock()
+
+    def route(self, path, query):
+        """ Return the reply for that path, None if unknown """
+
+        fleet = self.fleet
+        parts = [part for part in path.split('/') if part]
+        if parts == ['api', 'dashboard']:
+            return fleet.dashboard()
+        if parts == ['api', 'v2', 'hosts']:
+            indexes = fleet.searched(query.get('search', ''))
+            if query.get('thin') == 'true':
+                results = [{'id': i, 'name': fleet.hostname(i)}
+                           for i in indexes]
+            else:
+                results = [fleet.host(i)['host'] for i in indexes]
+            return {'total': fleet.size, 'subtotal': len(indexes),
+                    'page': int(query.get('page', 1)),
+                    'per_page': int(query.get('per_page', 20)),
+                    'search': query.get('search'),
+                    'results': paginate(results, query)}
+        if parts == ['reports']:
+            indexes = range(fleet.size)
+            for field, _, value in search_terms(query.get('search', '')):
+                if field == 'hostgroup':
+                    indexes = [i for i in indexes
+                               if HOSTGROUPS[i % 4] == value]
+                elif field == 'last_report':
+                    since = datetime.strptime(value, '%Y-%m-%d %H:%M:%S UTC')
+                    indexes = [i for i in indexes
+                               if fleet.reported(i) > since]
+            return paginate([{'report': fleet.report(i)} for i in indexes],
+                            query)
+        if parts == ['hosts']:
+            indexes = range(fleet.size)
+            search = query.get('search', '')
+            if search.startswith('hostgroup'):
+                group = search.split('=', 1)[1].strip().strip('"')
+                indexes = [i for i in indexes if HOSTGROUPS[i % 4] == group]
+            return paginate([fleet.host(i) for i in indexes], query)
+        if parts == ['fact_values']:
+            name = dict([term[::2] for term in search_terms(
+                            query.get('search', ''))]).get('name')
+            if name not in FACTS:
+                return {}
+            return dict(paginate([(fleet.hostname(i),
+                                   {name: fleet.fact(i, name)})
+                                  for i in range(fleet.size)], query))
+        if len(parts) == 2 and parts[0] == 'hosts':
+            return paginate([fleet.host(i) for i in fleet.mode(parts[1])],
+                            query)
+        if len(parts) == 4 and parts[2:] == ['reports', 'last']:
+            index = fleet.index(parts[1])
+            if index is not None:
+                return {'report': fleet.report(index)}
+        return None
+
+    def do_GET(self):
+        """ Serve one request, after the injected latency """
+
+        with self.lock:
+            FakeForemanHandler.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse.urlsplit(self.path)
+        if url.path == '/_stats':
+            body = {'requests': self.requests}
+        else:
+            body = self.route(url.path, dict(urlparse.parse_qsl(url.query)))
+        if body is None:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body)
+        etag = '"%s"' % hashlib.sha1(data).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if self.compress and self.compress in self.headers.get(
+                                            'Accept-Encoding', ''):
+            wbits = self.compress == 'gzip' and 16 + zlib.MAX_WBITS or \
+                    zlib.MAX_WBITS
+            compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+            data = compressor.compress(data) + compressor.flush()
+            self.send_header('Content-Encoding', self.compress)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        """ Stay quiet, we are being benchmarked """
+        pass
+
+
+class FakeForeman(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    One thread per connection, like a foreman behind passenger
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(port, fleet, latency_ms=0, compress=None):
+    """
+    Build the server, port 0 picks a free one
+    """
+
+    class Handler(FakeForemanHandler):
+        """ Handler serving that fleet """
+        pass
+
+    Handler.fleet = fleet
+    Handler.latency = latency_ms / 1000.0
+    Handler.compress = compress
+    return FakeForeman(('127.0.0.1', port), Handler)
+
+
+def main():
+    """
+    Serve a fleet until interrupted
+    """
+
+    parser = OptionParser(usage='%prog [options]', version=__version__)
+    parser.add_option('-p', '--port', type='int', default=8080,
+                      help='Port to listen on')
+    parser.add_option('--hosts', type='int', default=1000,
+                      help='Number of hosts in the fleet')
+    parser.add_option('--payload-kb', type='int', default=4,
+                      help='Size of the logs in each report')
+    parser.add_option('--latency-ms', type='int', default=0,
+                      help='Delay added to every request')
+    parser.add_option('--domain', type='string', default='example.com',
+                      help='Domain of the hosts, one per fake foreman '
+                           'to federate')
+    parser.add_option('--compress', type='choice',
+                      choices=['gzip', 'deflate'],
+                      help='Compress the replies of the clients accepting '
+                           'that encoding')
+    options = parser.parse_args()[0]
+
+    server = make_server(options.port,
+                         Fleet(options.hosts, options.payload_kb,
+                               domain=options.domain),
+                         options.latency_ms, options.compress)
+    print 'Fake foreman with %s hosts on http://127.0.0.1:%s/' % (
+                options.hosts, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+
+Startup budget of the plugins, so import cost does not creep back
+
+For every plugin :
+ - importing it must not pull any of the HEAVY modules, those belong
+   to the code paths which need them
+ - the median wall clock of `plugin --version` must stay under
+   --budget-ms
+
+Exits 1 when over budget, suitable for CI.
+
+Ex :
+
+    bench/import_budget.py --budget-ms 60 --runs 20
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from optparse import OptionParser
+import os
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.dirname(BENCH_DIR)
+
+PLUGINS = ['check_foreman', 'check_puppet', 'check_puppet_nodes',
+           'check_foreman_dashboard']
+
+# Modules only some code paths need
+HEAVY = ['json', 'simplejson', 'urllib', 'urllib2', 'httplib', 'ssl',
+         'socket', 'base64', 'hashlib', 'tempfile', 'threading',
+         'SocketServer', 'multiprocessing', 'StringIO', 'calendar',
+         'sqlite3', 'foreman_checks.http', 'foreman_checks.cache',
+         'foreman_checks.state', 'foreman_checks.history',
+         'foreman_checks.retry', 'foreman_checks.federation',
+         'foreman_checks.receiver', 'foreman_checks.projection',
+         'foreman_checks.scheduler']
+
+PROBE = """import sys
+before = set(sys.modules)
+import %s
+print ' '.join(sorted(name for name in set(sys.modules) - before
+                      if sys.modules[name] is not None))
+"""
+
+
+def imported_modules(plugin):
+    """
+    Modules loaded by importing the plugin, in a fresh interpreter
+    """
+
+    probe = subprocess.Popen([sys.executable, '-c', PROBE % plugin],
+                             cwd=PLUGIN_DIR, stdout=subprocess.PIPE)
+    return probe.communicate()[0].split()
+
+
+def startup_ms(plugin, runs):
+    """
+    Median wall clock of `plugin --version`, in milliseconds
+    """
+
+    argv = [sys.executable, os.path.join(PLUGIN_DIR, '%s.py' % plugin),
+            '--version']
+    devnull = open(os.devnull, 'w')
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.call(argv, stdout=devnull)
+        timings.append((time.time() - start) * 1000)
+    devnull.close()
+    return sorted(timings)[len(timings) / 2]
+
+
+def main():
+    """
+    Check every plugin against the budget
+    """
+
+    parser = OptionParser(usage='%prog [options]', version=__version__)
+    parser.add_option('--budget-ms', type='int', default=60,
+                      help='Maximum median startup time')
+    parser.add_option('--runs', type='int', default=10,
+                      help='Runs to take the median of')
+    options = parser.parse_args()[0]
+
+    failures = 0
+    for plugin in PLUGINS:
+        heavy = [name for name in imported_modules(plugin) if name in HEAVY]
+        elapsed = startup_ms(plugin, options.runs)
+        over = heavy or elapsed > options.budget_ms
+        failures += over and 1 or 0
+        print '%-4s %-26s %6.1f ms (budget %s ms)%s' % (
+                    over and 'FAIL' or 'OK', plugin, elapsed,
+                    options.budget_ms,
+                    heavy and ', imports %s' % ' '.join(heavy) or '')
+
+    raise SystemExit(failures and 1 or 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+
+Benchmark the plugins against a local fake foreman
+
+Every scenario runs a plugin --runs times, one after the other, and
+records per run the wall clock latency, user + system CPU and peak RSS
+(from wait4), plus the requests served by the fake foreman.
+
+Results are written as JSON to bench/results/, pass an earlier file
+with --compare to see the ratios between the two.
+
+Ex :
+
+    bench/run_bench.py --hosts 8000 --payload-kb 50 --latency-ms 20
+    bench/run_bench.py --compare bench/results/20261017-101500.json
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from optparse import OptionParser
+import os
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import simplejson as json
+except ImportError:
+    # pylint: disable-msg=W0404
+    import json
+
+import fake_foreman
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.dirname(BENCH_DIR)
+
+# name, plugin, arguments ; %(port)s is the fake foreman port
+SCENARIOS = [
+    ('check_puppet', 'check_puppet.py',
+     '-H host00001.example.com -F 127.0.0.1 -P %(port)s'),
+    ('check_puppet_bulk', 'check_puppet.py',
+     '--bulk -F 127.0.0.1 -P %(port)s -w 30 -c 60 --per-page 500'),
+    ('check_puppet_hostgroup', 'check_puppet.py',
+     '--hostgroup web -F 127.0.0.1 -P %(port)s --concurrency 20'),
+    ('check_puppet_nodes', 'check_puppet_nodes.py',
+     '-H 127.0.0.1 -P %(port)s -m active -w 1000000 -c 1000000'),
+    ('check_foreman_dashboard', 'check_foreman_dashboard.py',
+     '-H 127.0.0.1 -P %(port)s -m bad_hosts -w 1000000 -c 1000000'),
+]
+
+
+def percentile(values, fraction):
+    """
+    Nearest rank percentile of a list of numbers
+
+    >>> percentile([3, 1, 2, 5, 4], 0.5)
+    3
+    >>> percentile([3, 1, 2, 5, 4], 0.95)
+    5
+    """
+
+    ordered = sorted(values)
+    rank = int(round(fraction * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+def run_once(argv):
+    """
+    Run a plugin, return (wall seconds, cpu seconds, peak rss in kB)
+    """
+
+    devnull = open(os.devnull, 'w')
+    start = time.time()
+    process = subprocess.Popen(argv, stdout=devnull, stderr=devnull)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.time() - start
+    process.returncode = status
+    devnull.close()
+    return wall, usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+
+def run_scenario(server, plugin, arguments, runs):
+    """
+    Run one scenario, return its summary
+    """
+
+    argv = [sys.executable, os.path.join(PLUGIN_DIR, plugin)]
+    argv.extend((arguments % {'port': server.server_address[1]}).split())
+
+    handler = server.RequestHandlerClass
+    requests_before = handler.requests
+    walls, cpus, rss = [], [], []
+    start = time.time()
+    for _ in range(runs):
+        wall, cpu, max_rss = run_once(argv)
+        walls.append(wall)
+        cpus.append(cpu)
+        rss.append(max_rss)
+    elapsed = time.time() - start
+    requests = handler.requests - requests_before
+
+    return {'runs': runs,
+            'latency_ms': {'min': min(walls) * 1000,
+                           'median': percentile(walls, 0.5) * 1000,
+                           'p95': percentile(walls, 0.95) * 1000,
+                           'max': max(walls) * 1000},
+            'cpu_ms': percentile(cpus, 0.5) * 1000,
+            'max_rss_kb': max(rss),
+            'requests_per_run': float(requests) / runs,
+            'requests_per_s': requests / elapsed,
+            'checks_per_s': runs / elapsed}
+
+
+def compare(old, new):
+    """
+    Print new / old for every metric both results have
+    """
+
+    print '%-26s %-20s %12s %12s %8s' % ('scenario', 'metric',
+                                         'before', 'after', 'ratio')
+    for name in sorted(new['scenarios']):
+        if name not in old['scenarios']:
+            continue
+        before = old['scenarios'][name]
+        after = new['scenarios'][name]
+        metrics = [('latency_median_ms', before['latency_ms']['median'],
+                    after['latency_ms']['median']),
+                   ('latency_p95_ms', before['latency_ms']['p95'],
+                    after['latency_ms']['p95'])]
+        metrics.extend([(metric, before[metric], after[metric])
+                        for metric in ('cpu_ms', 'max_rss_kb',
+                                       'requests_per_run')])
+        for metric, value_before, value_after in metrics:
+            ratio = value_before and float(value_after) / value_before or 0
+            print '%-26s %-20s %12.1f %12.1f %7.2fx' % (
+                        name, metric, value_before, value_after, ratio)
+
+
+def main():
+    """
+    Start the fake foreman, run the scenarios, store and compare results
+    """
+
+    parser = OptionParser(usage='%prog [options]', version=__version__)
+    parser.add_option('--hosts', type='int', default=1000,
+                      help='Number of hosts in the fleet')
+    parser.add_option('--payload-kb', type='int', default=4,
+                      help='Size of the logs in each report')
+    parser.add_option('--latency-ms', type='int', default=0,
+                      help='Delay added to every foreman request')
+    parser.add_option('--runs', type='int', default=10,
+                      help='Runs per scenario')
+    parser.add_option('--only', type='string', action='append',
+                      help='Scenario to run, may be repeated')
+    parser.add_option('--output', type='string',
+                      help='Results file, default bench/results/<date>.json')
+    parser.add_option('--compare', type='string',
+                      help='Earlier results file to compare with')
+    options = parser.parse_args()[0]
+
+    fleet = fake_foreman.Fleet(options.hosts, options.payload_kb)
+    server = fake_foreman.make_server(0, fleet, options.latency_ms)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    results = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'python': sys.version.split()[0],
+               'hosts': options.hosts,
+               'payload_kb': options.payload_kb,
+               'latency_ms': options.latency_ms,
+               'scenarios': {}}
+
+    for name, plugin, arguments in SCENARIOS:
+        if options.only and name not in options.only:
+            continue
+        summary = run_scenario(server, plugin, arguments, options.runs)
+        results['scenarios'][name] = summary
+        print '%-26s median %8.1f ms  p95 %8.1f ms  cpu %7.1f ms  ' \
+              'rss %7d kB  %6.1f req/run' % (
+                    name,
+                    summary['latency_ms']['median'],
+                    summary['latency_ms']['p95'],
+                    summary['cpu_ms'],
+                    summary['max_rss_kb'],
+                    summary['requests_per_run'])
+    server.shutdown()
+
+    output = options.output
+    if output is None:
+        if not os.path.isdir(os.path.join(BENCH_DIR, 'results')):
+            os.makedirs(os.path.join(BENCH_DIR, 'results'))
+        output = os.path.join(BENCH_DIR, 'results',
+                              '%s.json' % time.strftime('%Y%m%d-%H%M%S'))
+    result_file = open(output, 'w')
+    json.dump(results, result_file, sort_keys=True, indent=2)
+    result_file.close()
+    print 'Results stored in %s' % output
+
+    if options.compare:
+        compare(json.load(open(options.compare)), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+
+Micro-benchmark of the bulk evaluation : the last reports of --hosts
+hosts kept as dicts and evaluated one by one like up to 1.0, against a
+HostTable checked column by column, with and without numpy
+
+Ex :
+
+    bench/table_bench.py --hosts 100000
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from calendar import timegm
+from optparse import OptionParser
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                        __file__))))
+from foreman_checks import puppet
+from foreman_checks.hosttable import HostTable, numpy_module, STATUSES
+
+SUMMARIES = ['Success', 'Success', 'Success', 'Error']
+
+
+def make_reports(size, now):
+    """
+    Last reports of size hosts, as foreman sends them
+    """
+
+    reports = []
+    for index in range(size):
+        reported_at = now - timedelta(seconds=index * 7200 / size)
+        reports.append({'host_name': 'host%06d.example.com' % index,
+                        'reported_at': reported_at.strftime(
+                                            '%Y-%m-%dT%H:%M:%SZ'),
+                        'summary': SUMMARIES[index % len(SUMMARIES)],
+                        'metrics': {'time': {'total': 10.0 + index % 50}}})
+    return reports
+
+
+def timed(function, *args):
+    """
+    Seconds function(*args) took, best of 3
+    """
+
+    best = None
+    for _ in range(3):
+        started = time.time()
+        function(*args)
+        elapsed = time.time() - started
+        best = min(best or elapsed, elapsed)
+    return best
+
+
+def main():
+    """
+    Print how long each way takes
+    """
+
+    parser = OptionParser(usage='%prog [options]', version=__version__)
+    parser.add_option('--hosts', type='int', default=100000,
+                      help='Number of hosts evaluated')
+    options = parser.parse_args()[0]
+
+    now = datetime.utcnow().replace(microsecond=0)
+    params = {'now': now, 'warning': 30, 'critical': 60, 'history': 0}
+    reports = make_reports(options.hosts, now)
+
+    def with_dicts():
+        """ check_result() and report_perfdata() of every report """
+        for report in reports:
+            puppet.evaluate(params, report['host_name'], report)
+
+    table = HostTable()
+    for report in reports:
+        table.add(report['host_name'],
+                  timegm(puppet.parse_timestamp(
+                                    report['reported_at']).timetuple()),
+                  report['summary'], puppet.report_total(report))
+
+    def with_table():
+        """ evaluate_table() of the whole table """
+        for _ in puppet.evaluate_table(params, table):
+            pass
+
+    epoch = timegm(now.timetuple())
+    print 'Hosts                 %8d' % options.hosts
+    print 'dicts, evaluate()     %8.3f s' % timed(with_dicts)
+    print 'table, evaluate_table %8.3f s' % timed(with_table)
+    print 'table.check(), array  %8.3f s' % timed(table.check, epoch,
+                                                  1800, 3600)
+    numpy = numpy_module()
+    if numpy is not None:
+        print 'table.check(), numpy  %8.3f s' % timed(table.check, epoch,
+                                                      1800, 3600, numpy)
+    counts = table.check(epoch, 1800, 3600)
+    print ', '.join(['%s %s' % (status, counts.count(code))
+                     for code, status in enumerate(STATUSES)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+
+Micro-benchmark of foreman_checks.puppet.parse_timestamp() against the
+re.split() parsing check_result() used before
+
+Ex :
+
+    bench/timestamp_bench.py --number 200000
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from optparse import OptionParser
+import os
+import re
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                        __file__))))
+from foreman_checks.puppet import parse_timestamp
+
+SAMPLES = ['2012-02-14T09:21:52Z', '2013-12-01T23:59:07Z',
+           '2026-10-17T06:00:00Z', '2014-07-30T14:45:31Z']
+
+
+def legacy_parse(timestamp):
+    """
+    The way check_result() parsed reported_at up to 1.0
+
+    >>> legacy_parse('2012-02-14T09:21:52Z')
+    datetime.datetime(2012, 2, 14, 9, 21, 52)
+    """
+
+    return datetime(*[int(x) for x in re.split(r'[^\d]', timestamp)[:-1]])
+
+
+def throughput(parser, number):
+    """
+    Timestamps parsed per second, best of 3
+    """
+
+    def parse_all():
+        """ One pass over the samples """
+        for sample in SAMPLES:
+            parser(sample)
+
+    best = min(timeit.repeat(parse_all, number=number / len(SAMPLES),
+                             repeat=3))
+    return number / best
+
+
+def main():
+    """
+    Print the throughput of both parsers
+    """
+
+    parser = OptionParser(usage='%prog [options]', version=__version__)
+    parser.add_option('--number', type='int', default=100000,
+                      help='Timestamps parsed per measure')
+    options = parser.parse_args()[0]
+
+    for sample in SAMPLES:
+        assert parse_timestamp(sample) == legacy_parse(sample), sample
+
+    legacy = throughput(legacy_parse, options.number)
+    fast = throughput(parse_timestamp, options.number)
+    print 're.split         %10.0f timestamps/s' % legacy
+    print 'parse_timestamp  %10.0f timestamps/s  (%.1fx)' % (fast,
+                                                             fast / legacy)
+
+
+if __name__ == '__main__':
+    main()
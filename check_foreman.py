@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+
+Every Foreman check in one plugin
+
+check_foreman.py puppet -H server1.example.com -F foreman.example.com
+check_foreman.py nodes -H foreman.example.com -m out_of_sync
+check_foreman.py dashboard -H foreman.example.com -m bad_hosts
+
+Checks can be chained with --and, they share their foreman replies.
+See foreman_checks/cli.py
+
+"""
+__date__ = "October 2026"
+
+__version__ = "2.0"
+__credits__ = """Thanks to Foreman - http://theforeman.org/"""
+
+from foreman_checks import cli
+
+if __name__ == '__main__':
+    cli.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+
+Minimal front end for check_puppet.py --daemon
+
+Nagios calls it with the same arguments as check_puppet.py,
+the check itself runs in the daemon which keeps the interpreter,
+modules and recent foreman replies warm. Output and exit code are
+the ones check_puppet.py would have produced.
+
+If the daemon is not running (no socket, or the connection refused),
+check_puppet.py is run directly ; a daemon which does not answer in
+time is UNKNOWN.
+
+The socket defaults to /var/run/check_puppet/check_puppet.sock,
+set CHECK_PUPPET_SOCKET to change it.
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+# Keep the imports to the bare minimum, startup time is the point
+import errno
+import os
+import sys
+import socket
+
+SOCKET = os.environ.get('CHECK_PUPPET_SOCKET',
+                        '/var/run/check_puppet/check_puppet.sock')
+# The daemon enforces the foreman timeout (-t), this is only a safety net
+TIMEOUT = 120
+# The daemon is not running, check_puppet.py runs the check itself
+NOT_RUNNING = (errno.ENOENT, errno.ECONNREFUSED)
+
+
+def ask_daemon(argv):
+    """
+    Send the arguments to the daemon, return (exit code, output)
+    """
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(TIMEOUT)
+    client.connect(SOCKET)
+    client.sendall('%s\n' % '\0'.join(argv))
+
+    chunks = []
+    while True:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    client.close()
+
+    code, output = ''.join(chunks).split('\n', 1)
+    return int(code), output
+
+
+def main():
+    """
+    Relay the check to the daemon, fall back to check_puppet.py when it
+    is not running
+    """
+
+    argv = sys.argv[1:]
+    try:
+        code, output = ask_daemon(argv)
+    except ValueError:
+        print 'UNKNOWN - Invalid reply from the daemon on %s' % SOCKET
+        raise SystemExit(3)
+    except socket.error, err:
+        if err.errno not in NOT_RUNNING:
+            # a second run of the check would only take longer
+            print 'UNKNOWN - No reply from the daemon on %s : %s' % (SOCKET,
+                                                                     err)
+            raise SystemExit(3)
+        check_puppet = os.path.join(os.path.dirname(os.path.abspath(
+                                        __file__)), 'check_puppet.py')
+        os.execv(sys.executable, [sys.executable, check_puppet] + argv)
+
+    sys.stdout.write(output)
+    raise SystemExit(code)
+
+
+if __name__ == '__main__':
+    main()
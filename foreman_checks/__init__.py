@@ -0,0 +1,29 @@
+#-*- coding: utf-8 -*-
+"""
+
+Nagios checks against Foreman, as one package
+
+ - core        Nagios plumbing : exit codes, options, passive results
+ - session     connection settings and replies shared by the checks of a run
+ - http        pooled HTTP/1.1 client, revalidation and compression
+ - cache       on-disk cache shared by the checks of a poller
+ - retry       backoff, adaptive timeouts and circuit breaker
+ - federation  several foremen asked in parallel, seen as one
+ - hosttable   last report of many hosts, in columns
+ - receiver    reports pushed by foreman, served to the checks
+ - scheduler   the puppet check of many hosts, spread over time
+ - timing      where the time of a run goes, perfdata and StatsD
+ - projection  only the fields a check reads, parsed out of a reply
+ - registry    subcommand name -> check module
+ - cli         check_foreman <subcommand> entry point
+
+Every check module (puppet, nodes, groups, dashboard, resources, fleet,
+herd) provides the same few functions, see registry.py. Heavy modules are
+imported where they are used, keep it that way : the plugins run
+thousands of times a minute.
+
+"""
+__date__ = "October 2026"
+
+__version__ = "2.0"
+__credits__ = """Thanks to Foreman - http://theforeman.org/"""
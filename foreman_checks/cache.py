@@ -0,0 +1,202 @@
+#-*- coding: utf-8 -*-
+"""
+
+On-disk cache of Foreman replies, shared by every check on a poller
+
+Twenty services asking for the same url within seconds should cost
+one request to Foreman : the first check fetches and stores the reply,
+the others read it back until it is older than the ttl.
+
+ - entries are written to a temporary file then renamed,
+   readers never see a half written reply
+ - one check refreshes an expired entry (a lock file says who),
+   while the others keep serving the previous reply for up to
+   `stale` seconds instead of stampeding Foreman
+ - the oldest entries are removed past `max_entries`
+ - the reply validators (ETag, Last-Modified) are stored on the first
+   line of the entry, so an expired entry can be revalidated
+   instead of downloaded again
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/cache.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import os
+import time
+import errno
+import hashlib
+import tempfile
+from foreman_checks.http import parse_validators, format_validators
+
+
+def cache_key(url, username, password):
+    """
+    Name of the cache entry, credentials are part of it but never in clear
+
+    >>> cache_key('http://foreman/api/dashboard/', 'admin', 'secret')
+    '36ebacd2a694cdcb716455a5c3e71459b20a0add'
+
+    >>> cache_key('http://foreman/api/dashboard/', None, None)
+    '0e1dea6f2a19821ca87596fbbfb3e850df0e47bb'
+    """
+
+    return hashlib.sha1('\0'.join([url, username or '',
+                                   password or ''])).hexdigest()
+
+
+class ResponseCache(object):
+    """
+    Raw Foreman replies stored as one file per url and credentials
+
+    >>> import shutil
+    >>> directory = tempfile.mkdtemp()
+    >>> cache = ResponseCache(directory, ttl=60)
+    >>> cache.fetch(('http://foreman/', None, None),
+    ...             lambda previous: ('{"a": 1}', {'etag': '"1"'}))
+    '{"a": 1}'
+    >>> cache.fetch(('http://foreman/', None, None),
+    ...             lambda previous: ('{"a": 2}', {}))
+    '{"a": 1}'
+    >>> cache.read(cache_key('http://foreman/', None, None))[2]
+    {'etag': '"1"'}
+    >>> shutil.rmtree(directory)
+    """
+
+    def __init__(self, directory, ttl=30, stale=60, max_entries=1000):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0700)
+
+    def path(self, key):
+        """ File holding the entry """
+        return os.path.join(self.directory, '%s.json' % key)
+
+    def read(self, key):
+        """
+        Return (age in seconds, raw reply, validators),
+        (None, None, None) if not cached
+        """
+
+        try:
+            entry = open(self.path(key))
+            try:
+                age = time.time() - os.fstat(entry.fileno()).st_mtime
+                validators = parse_validators(entry.readline().rstrip('\n'))
+                return age, entry.read(), validators
+            finally:
+                entry.close()
+        except (IOError, OSError):
+            return None, None, None
+
+    def write(self, key, raw, validators):
+        """
+        Atomically replace the entry, then make room if needed
+        """
+
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            suffix='.tmp')
+        try:
+            os.write(handle, '%s\n' % format_validators(validators))
+            os.write(handle, raw)
+        finally:
+            os.close(handle)
+        os.rename(tmp_path, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently written entries past max_entries
+        """
+
+        entries = [name for name in os.listdir(self.directory)
+                   if name.endswith('.json')]
+        if len(entries) <= self.max_entries:
+            return
+
+        dated = []
+        for name in entries:
+            try:
+                path = os.path.join(self.directory, name)
+                dated.append((os.stat(path).st_mtime, path))
+            except OSError:
+                # removed by another check meanwhile
+                pass
+        dated.sort()
+        for _, path in dated[:len(dated) - self.max_entries]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def lock(self, key):
+        """
+        Try to become the one check refreshing that entry
+        """
+
+        lock_path = '%s.lock' % self.path(key)
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL, 0600))
+            return True
+        except OSError, err:
+            if err.errno != errno.EEXIST:
+                raise
+        # a check which died while fetching must not hold the lock forever
+        try:
+            if time.time() - os.stat(lock_path).st_mtime > self.ttl:
+                os.unlink(lock_path)
+                return self.lock(key)
+        except OSError:
+            pass
+        return False
+
+    def unlock(self, key):
+        """ Let the next expiry be refreshed """
+        try:
+            os.unlink('%s.lock' % self.path(key))
+        except OSError:
+            pass
+
+    def fetch(self, key_parts, loader, wait=5):
+        """
+        Return the cached reply for (url, username, password),
+        calling loader() to get a fresh one when needed
+
+        loader gets the (validators, raw reply) of the expired entry, if any,
+        and returns a (raw reply, validators) tuple
+        """
+
+        key = cache_key(*key_parts)
+        age, raw, validators = self.read(key)
+        if raw is not None and age < self.ttl:
+            return raw
+
+        locked = self.lock(key)
+        if not locked:
+            if raw is not None and age < self.ttl + self.stale:
+                # somebody else is refreshing, the previous reply will do
+                return raw
+            # nothing usable yet, give the other check a chance to finish
+            deadline = time.time() + wait
+            while time.time() < deadline:
+                time.sleep(0.1)
+                age, raw, validators = self.read(key)
+                if raw is not None and age < self.ttl:
+                    return raw
+
+        previous = None
+        if raw is not None:
+            previous = (validators, raw)
+        try:
+            raw, validators = loader(previous)
+            self.write(key, raw, validators)
+        finally:
+            if locked:
+                self.unlock(key)
+        return raw
@@ -0,0 +1,201 @@
+#-*- coding: utf-8 -*-
+"""
+
+check_foreman <subcommand> [options] [--and <subcommand> [options]]...
+
+Run one check, or several against one or more foremen : checks with the
+same connection options share one session, a reply needed by two of them
+is fetched and parsed once. Several checks print the worst status, the
+messages of every check and all their perfdata on one line. The time
+of the run is broken down into fetching, parsing and checking, see
+timing.py.
+
+check_puppet.py, check_puppet_nodes.py and check_foreman_dashboard.py
+are check_foreman puppet, nodes and dashboard.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/cli.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from optparse import OptionParser
+import os
+import sys
+import time
+
+from foreman_checks import core, registry
+from foreman_checks.session import Session, connect
+
+# Separates the checks of a run on the command line
+SEPARATOR = '--and'
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    return """
+    usage: check_foreman.py CHECK [options] [--and CHECK [options]]...
+
+    Checks : %s
+    check_foreman.py CHECK --help describes the options of a check
+
+    Ex :
+
+    check_foreman.py dashboard -H foreman.example.com -m bad_hosts \\
+        --and nodes -H foreman.example.com -m out_of_sync -w 5 -c 10
+    will ask foreman.example.com once per url for both checks
+
+    """ % ', '.join(registry.names())
+
+
+def split_checks(argv):
+    """
+    Cut the command line in one argument list per check
+
+    >>> split_checks(['puppet', '-H', 'a', '--and', 'nodes', '-m', 'errors'])
+    [['puppet', '-H', 'a'], ['nodes', '-m', 'errors']]
+    """
+
+    checks = [[]]
+    for arg in argv:
+        if arg == SEPARATOR:
+            checks.append([])
+        else:
+            checks[-1].append(arg)
+    return checks
+
+
+def make_parser(name, prog=None):
+    """
+    The check module of a subcommand and the parser of its options
+    """
+
+    check = registry.load(name)
+
+    parser = OptionParser(description=check.DESCRIPTION, usage=check.usage(),
+                          version="%prog " + check.__version__,
+                          prog=prog or '%s %s' % (
+                                os.path.basename(sys.argv[0]), name))
+    core.add_connection_options(parser)
+    check.add_options(parser)
+    core.add_cache_options(parser)
+    core.add_retry_options(parser)
+    core.add_extra_options(parser)
+    return check, parser
+
+
+def parse(argv, prog=None, defaults=None):
+    """
+    Parse the arguments of one check, fail quick if not enough parameters
+    defaults replace those of the options, the command line still wins
+
+    Return the check module and its parameters
+    """
+
+    if not argv or argv[0] not in registry.CHECKS:
+        if argv and argv[0] in ('-h', '--help'):
+            print usage()
+            raise SystemExit(0)
+        if argv:
+            print "\nUnknown check %s" % argv[0]
+        print usage()
+        raise SystemExit(2)
+
+    check, parser = make_parser(argv[0], prog)
+    parser.set_defaults(**(defaults or {}))
+    options, arguments = parser.parse_args(argv[1:])
+
+    if (arguments != []):
+        print """Non recognized option %s
+        Please use --help for usage""" % arguments
+        print check.usage()
+        raise SystemExit(2)
+
+    check.validate(options)
+    return check, vars(options)
+
+
+def main(argv=None, prog=None, defaults=None):
+    """
+    Runs all the checks of the command line
+    """
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    checks = [parse(args, prog, defaults) for args in split_checks(argv)]
+
+    started = time.time()
+    sessions = {}
+    results = []
+    try:
+        for check, params in checks:
+            verboseprint = core.verbose_printer(params['verbose'])
+            key = Session.key(params)
+            if key not in sessions:
+                sessions[key] = connect(params)
+            session = sessions[key]
+            verboseprint("CLI Arguments : ", params)
+            result = check.run(params, session, verboseprint)
+            if session.unreachable:
+                from foreman_checks.federation import degrade
+                result = degrade(result, session.unreachable)
+            results.append(result)
+    except SystemExit, err:
+        # bulk and daemon modes, errors : the run ends in the check
+        finish(checks, sessions, started, exit_status(err.code))
+        raise
+
+    if len(results) == 1:
+        status, message, perfdata = results[0]
+    else:
+        status = core.worst([result[0] for result in results])
+        message = '; '.join([result[1] for result in results])
+        perfdata = ' '.join([result[2] for result in results if result[2]])
+
+    timings = finish(checks, sessions, started, status)
+    params = checks[0][1]
+    verboseprint = core.verbose_printer(params['verbose'])
+    verboseprint("Timing : ", timings.breakdown())
+    if timings.compressed:
+        verboseprint("Compression : \n%s" % '\n'.join(timings.compression()))
+    if params['timing']:
+        perfdata = ' '.join([part for part in (perfdata, timings.perfdata())
+                             if part])
+    core.nagios_exit(status, message, perfdata)
+
+
+def finish(checks, sessions, started, status):
+    """
+    Timings of the run, handed over to --timing-log / --timing-statsd
+    """
+
+    from foreman_checks import timing
+
+    timings = timing.Timings()
+    for session in sessions.values():
+        timings.merge(session.measured())
+    timings.run = time.time() - started
+    timing.report(checks[0][1],
+                  [check.__name__.split('.')[-1] for check, _ in checks],
+                  timings, status)
+    return timings
+
+
+def exit_status(code):
+    """
+    Nagios status of a SystemExit code
+
+    >>> exit_status(2), exit_status(None), exit_status('usage')
+    ('CRITICAL', 'OK', 'UNKNOWN')
+    """
+
+    for status, value in core.NAGIOS_CODES.items():
+        if value == (code or 0):
+            return status
+    return 'UNKNOWN'
@@ -0,0 +1,266 @@
+#-*- coding: utf-8 -*-
+"""
+
+Nagios plumbing shared by the Foreman checks
+
+Exit codes, the options every check has (connection, cache, verbose),
+the foreman url, passive check results and the final print and exit.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/core.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from optparse import OptionGroup
+
+# Exit statuses recognized by Nagios
+NAGIOS_CODES = {'OK': 0, 'WARNING': 1, 'CRITICAL': 2, 'UNKNOWN': 3}
+# Which status wins when several results are aggregated
+SEVERITY = ['OK', 'WARNING', 'UNKNOWN', 'CRITICAL']
+
+
+def json_module():
+    """
+    simplejson when available, imported on first use only
+    """
+
+    try:
+        import simplejson as json
+    except ImportError:
+        # pylint: disable-msg=W0404
+        import json
+    return json
+
+
+def worst(statuses):
+    """
+    The status to report for several results
+
+    >>> worst(['OK', 'CRITICAL', 'WARNING'])
+    'CRITICAL'
+    >>> worst([])
+    'OK'
+    """
+
+    return max(['OK'] + list(statuses), key=SEVERITY.index)
+
+
+def verbose_printer(verbose):
+    """
+    Return the verboseprint function of the run
+    """
+
+    if verbose:
+        def verboseprint(*args):
+            """
+            http://stackoverflow.com/a/5980173 print only when verbose ON
+            """
+            # Print each argument separately so caller doesn't need to
+            # stuff everything to be printed into a single string
+            print
+            for arg in args:
+                print arg,
+            print
+    else:
+        def verboseprint(*args):
+            """ do-nothing function """
+            pass
+    return verboseprint
+
+
+def add_connection_options(parser):
+    """
+    Network / Authentication options, the foreman host itself is
+    an option of each check
+    """
+
+    connection = OptionGroup(parser, "Connection Options",
+                             "Network / Authentication related options")
+    connection.add_option('-u', '--username', type='string',
+                          help='Foreman username')
+    connection.add_option('-p', '--password', type='string',
+                          help='Foreman password')
+    connection.add_option('-t', '--timeout', type='int', default=10,
+                          help='Connection timeout in seconds')
+    connection.add_option('-P', '--port', type='int',
+                          help='Foreman port',
+                          default=80)
+    connection.add_option('--prefix', type='string',
+                          help='Foreman prefix, if not installed on /',
+                          default='/')
+    connection.add_option('-S', '--ssl', action="store_true",
+                          default=False,
+                          help='If the connection requires ssl')
+    parser.add_option_group(connection)
+
+
+def add_cache_options(parser):
+    """
+    On-disk cache options
+    """
+
+    cache = OptionGroup(parser, "Cache Options",
+                        "Share foreman replies between checks")
+    cache.add_option('--cache-dir', type='string',
+                     help='Directory of the on-disk cache, off if unset')
+    cache.add_option('--cache-ttl', type='int', default=30,
+                     help='Seconds a foreman reply is reused')
+    cache.add_option('--cache-stale', type='int', default=60,
+                     help='Extra seconds an expired reply is served '
+                          'while another check refreshes it')
+    cache.add_option('--cache-size', type='int', default=1000,
+                     help='Maximum number of cached replies')
+    parser.add_option_group(cache)
+
+
+def add_retry_options(parser):
+    """
+    Retries and circuit breaker options
+    """
+
+    retry = OptionGroup(parser, "Retry Options",
+                        "Ride out a slow foreman, stop asking a dead one")
+    retry.add_option('--retries', type='int', default=2,
+                     help='Retries of a failed request, after a jittered '
+                          'exponential backoff')
+    retry.add_option('--deadline', type='float',
+                     help='Seconds all the attempts of a request may take, '
+                          'TIMEOUT * (RETRIES + 1) by default')
+    retry.add_option('--breaker-dir', type='string',
+                     help='Directory of the circuit breaker and latency '
+                          'files shared by the checks, off if unset')
+    retry.add_option('--breaker-threshold', type='int', default=5,
+                     help='Consecutive failures opening the circuit')
+    retry.add_option('--breaker-cooldown', type='int', default=60,
+                     help='Seconds the checks answer UNKNOWN without '
+                          'asking foreman once the circuit is open')
+    parser.add_option_group(retry)
+
+
+def add_extra_options(parser):
+    """
+    Verbose mode and timings
+    """
+
+    parser.set_defaults(verbose=False)
+    extra = OptionGroup(parser, "Extra Options")
+    extra.add_option('-v', action='store_true', dest='verbose',
+                     default=False,
+                     help='Verbose mode, with the time spent per phase')
+    extra.add_option('--timing', action='store_true', dest='timing',
+                     default=False,
+                     help='Add fetch_ms, parse_ms, check_ms and bytes to the '
+                          'perfdata')
+    extra.add_option('--timing-log', dest='timing_log', metavar='FILE',
+                     help='Append the timings of every run to FILE, one '
+                          'JSON line per run')
+    extra.add_option('--timing-statsd', dest='timing_statsd',
+                     metavar='[HOST:]PORT',
+                     help='Send the timings of every run to a StatsD daemon '
+                          'over UDP, on localhost by default')
+    parser.add_option_group(extra)
+
+
+def base_url(params):
+    """
+    Url of the foreman root, port and prefix fixed up along the way
+
+    >>> base_url({'foreman': 'foreman', 'ssl': True, 'port': 80,
+    ...           'prefix': 'foreman'})
+    'https://foreman:443/foreman/'
+    >>> base_url({'foreman': 'foreman', 'ssl': False, 'port': 8080,
+    ...           'prefix': '/'})
+    'http://foreman:8080/'
+    """
+
+    # Validate the port based on the required protocol
+    if params['ssl']:
+        protocol = "https"
+        # Unspecified port will be 80 by default, not correct if ssl is ON
+        if (params['port'] == 80):
+            params['port'] = 443
+    else:
+        protocol = "http"
+
+    # Let's avoid the double / if we specified a prefix
+    if (params['prefix'].strip('/')):
+        params['prefix'] = '/%s/' % params['prefix'].strip('/')
+    else:
+        params['prefix'] = '/'
+
+    return "%s://%s:%s%s" % (protocol,
+                             params['foreman'],
+                             params['port'],
+                             params['prefix'])
+
+
+def passive_result(timestamp, hostname, service, status, message):
+    """
+    Format a check result as a Nagios external command
+
+    >>> passive_result(1329177600, 'server1', 'puppet', 'OK', 'all good')
+    '[1329177600] PROCESS_SERVICE_CHECK_RESULT;server1;puppet;0;OK - all good'
+    """
+
+    return '[%d] PROCESS_SERVICE_CHECK_RESULT;%s;%s;%d;%s - %s' % (
+                    timestamp,
+                    hostname,
+                    service,
+                    NAGIOS_CODES[status],
+                    status,
+                    message)
+
+
+def write_passive(command_file, lines):
+    """
+    Write the passive results to the Nagios command file (or stdout)
+    Errors are raised as IOError
+    """
+
+    if command_file is None:
+        for line in lines:
+            print line
+        return
+
+    handle = open(command_file, 'a')
+    try:
+        handle.write(''.join(['%s\n' % line for line in lines]))
+    finally:
+        handle.close()
+
+
+def submit_passive(command_file, lines):
+    """
+    Same as write_passive(), errors are reported as UNKNOWN and end the run
+    """
+
+    try:
+        write_passive(command_file, lines)
+    except IOError, err:
+        print 'UNKNOWN - Could not write to %s : %s' % (command_file, err)
+        raise SystemExit(3)
+
+
+def output(status, message, perfdata=None):
+    """
+    The line Nagios reads
+
+    >>> output('OK', 'all good', 'hosts=3;5;10')
+    'OK - all good | hosts=3;5;10'
+    """
+
+    if perfdata:
+        return '%s - %s | %s' % (status, message, perfdata)
+    return '%s - %s' % (status, message)
+
+
+def nagios_exit(status, message, perfdata=None):
+    """
+    Print the result and exit with the matching Nagios code
+    """
+
+    print output(status, message, perfdata)
+    raise SystemExit(NAGIOS_CODES.get(status, 3))
@@ -0,0 +1,173 @@
+#-*- coding: utf-8 -*-
+"""
+
+Keep the interpreter (and recent foreman replies) warm
+
+check_puppet.py --daemon SOCKET listens on a unix socket and answers
+check_puppet_client.py : the client sends the check arguments, the
+daemon runs the check in a thread and sends back the exit code and
+the output the check would have printed. Clients may only set the
+options of the check of one host, see CLIENT_OPTIONS, and only the
+user running the daemon may connect.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/daemon.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import os
+import sys
+
+# What a client may set, the options of the check of one host ; anything
+# else would have the daemon read or write files with its own rights, or
+# serve in the thread of a check
+CLIENT_OPTIONS = set(['hostname', 'warning', 'critical', 'foreman',
+                      'username', 'password', 'timeout', 'port', 'prefix',
+                      'ssl', 'retries', 'deadline', 'verbose', 'timing'])
+# What the daemon hands over to the checks it runs : its on-disk cache
+# and circuit breaker
+DAEMON_OPTIONS = ('cache_dir', 'cache_ttl', 'cache_stale', 'cache_size',
+                  'breaker_dir', 'breaker_threshold', 'breaker_cooldown')
+# Only the user running the daemon may connect to its socket
+SOCKET_UMASK = 0177
+
+
+class ThreadStdout(object):
+    """
+    sys.stdout replacement so each daemon thread captures its own prints
+    """
+
+    def __init__(self, stream):
+        import threading
+
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, data):
+        """ Write to the buffer of the current check, if any """
+        getattr(self.local, 'buffer', self.stream).write(data)
+
+    def flush(self):
+        """ Nothing buffered here """
+        pass
+
+
+def forbidden(argv, command='puppet'):
+    """
+    First option of argv a client may not set, None if there is none
+    Options are compared once parsed, whatever way they are written
+
+    >>> forbidden(['-H', 'server1', '-w', '60', '--ssl'])
+    >>> forbidden(['-H', 'server1', '--daem=/tmp/check.sock'])
+    '--daemon'
+    >>> forbidden(['-H', 'server1', '--and', 'puppet', '--hosts-f', 'x'])
+    '--hosts-file'
+    """
+
+    from foreman_checks import cli, registry
+
+    for args in cli.split_checks([command] + argv):
+        if not args or args[0] not in registry.CHECKS:
+            # cli.main() tells what is wrong
+            continue
+        _, parser = cli.make_parser(args[0])
+        options = parser.parse_args(args[1:])[0]
+        for group in [parser] + parser.option_groups:
+            for option in group.option_list:
+                if option.dest is None or option.dest in CLIENT_OPTIONS:
+                    continue
+                if getattr(options, option.dest) != \
+                        parser.defaults.get(option.dest):
+                    return option.get_opt_string()
+    return None
+
+
+def run_captured(argv, command='puppet', defaults=None):
+    """
+    Run the check as if called from the command line, return (code, output)
+    defaults are the options of the daemon the check runs with
+    """
+
+    from StringIO import StringIO
+    from foreman_checks import cli
+
+    buf = StringIO()
+    sys.stdout.local.buffer = buf
+    try:
+        option = forbidden(argv, command)
+        if option is not None:
+            print 'UNKNOWN - %s is not a valid check option' % option
+            code = 3
+        else:
+            cli.main([command] + argv, os.path.basename(sys.argv[0]),
+                     defaults)
+            code = 0
+    except SystemExit, err:
+        if err.code is None or isinstance(err.code, int):
+            code = err.code or 0
+        else:
+            # optparse errors exit with a message
+            print err.code
+            code = 3
+    # pylint: disable-msg=W0703
+    except Exception, err:
+        print 'UNKNOWN - %s: %s' % (err.__class__.__name__, err)
+        code = 3
+    finally:
+        del sys.stdout.local.buffer
+    return code, buf.getvalue()
+
+
+def serve(path, params, command='puppet'):
+    """
+    Answer the checks sent to the unix socket at path until interrupted,
+    foreman replies are kept in memory for --cache-ttl seconds and the
+    checks use the DAEMON_OPTIONS of params
+    """
+
+    import SocketServer
+    from foreman_checks.session import Session
+
+    class CheckHandler(SocketServer.StreamRequestHandler):
+        """
+        One request per connection : NUL separated arguments on a single line
+        Reply with the exit code on the first line, followed by the output
+        """
+
+        def handle(self):
+            line = self.rfile.readline().rstrip('\n')
+            argv = line and line.split('\0') or []
+            code, output = run_captured(argv, command, defaults)
+            self.wfile.write('%d\n%s' % (code, output))
+
+    class CheckServer(SocketServer.ThreadingMixIn,
+                      SocketServer.UnixStreamServer):
+        """
+        Threaded unix socket server, a slow foreman reply does not block
+        """
+
+        daemon_threads = True
+
+    Session.memory_ttl = params['cache_ttl']
+    defaults = dict([(name, params[name]) for name in DAEMON_OPTIONS])
+
+    if os.path.exists(path):
+        os.unlink(path)
+    umask = os.umask(SOCKET_UMASK)
+    try:
+        server = CheckServer(path, CheckHandler)
+    finally:
+        os.umask(umask)
+    sys.stdout = ThreadStdout(sys.stdout)
+    # optparse reports usage errors on stderr
+    sys.stderr = sys.stdout
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(path)
+    raise SystemExit(0)
@@ -0,0 +1,297 @@
+#-*- coding: utf-8 -*-
+"""
+
+Contact foreman to check the global health of the puppet nodes.
+
+If not too many clients are out of sync or in error
+
+Several modes can be checked from the same dashboard reply,
+-m bad_hosts,out_of_sync_hosts -w 5,3 -c 10,6 gives one status,
+the worst, with perfdata for every mode. --passive also submits
+one passive check result per mode. With several foremen, their
+dashboard counters are added up.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/dashboard.py -v
+
+"""
+__author__ = 'Ewoud Kohl van Wijngaarden'
+__date__ = "December 2013"
+
+__version__ = "1.0"
+__credits__ = """Thanks to Foreman - http://theforeman.org/"""
+
+from optparse import OptionGroup
+import time
+
+from foreman_checks import core
+
+DESCRIPTION = """A Nagios plugin to check if the puppet nodes are
+globally healthy : not too many in errors, not too many out of sync."""
+
+MODES = ['pending_hosts', 'good_hosts', 'disabled_hosts',
+         'reports_missing', 'active_hosts_ok_enabled',
+         'pending_hosts_enabled', 'good_hosts_enabled', 'active_hosts_ok',
+         'total_hosts', 'ok_hosts_enabled', 'out_of_sync_hosts_enabled',
+         'active_hosts', 'bad_hosts_enabled', 'ok_hosts',
+         'out_of_sync_hosts', 'bad_hosts']
+
+
+def merge(dashboards):
+    """
+    One dashboard out of the dashboards of several foremen, counters
+    added up, anything else taken from the first one
+
+    >>> sorted(merge([{'bad_hosts': 2, 'total_hosts': 10, 'glossary': 'x'},
+    ...               {'bad_hosts': 1, 'total_hosts': 5}]).items())
+    [('bad_hosts', 3), ('glossary', 'x'), ('total_hosts', 15)]
+    """
+
+    merged = dict(dashboards[0])
+    for dashboard in dashboards[1:]:
+        for name, value in dashboard.items():
+            if isinstance(merged.get(name), (int, long)) and \
+                    isinstance(value, (int, long)):
+                merged[name] += value
+            else:
+                merged.setdefault(name, value)
+    return merged
+
+
+def check_result(params, dashboard, details=True):
+    """
+    From the server response and input parameter
+    check if the puppet client report should trigger an alert
+
+    http://theforeman.org/projects/foreman/wiki/API
+
+    >>> check_result({'mode': 'bad_hosts', 'warning': 5, 'critical': 10},
+    ...              {'bad_hosts': 6}, details=False)
+    ('WARNING', 'bad_hosts has 6 servers (levels at 5/10)', 'bad_hosts=6;5;10')
+    """
+
+    mode = params['mode']
+    target = dashboard[mode]
+    msg = '%s has %s servers' % (mode, target)
+
+    if (target >= params['critical']):
+        status = 'CRITICAL'
+    elif (target >= params['warning']):
+        status = 'WARNING'
+    else:
+        if details:
+            msg = '%s - %s' % (msg, dashboard)
+        status = 'OK'
+
+    msg = '%s (levels at %s/%s)' % (msg, params['warning'], params['critical'])
+    perfdata = '%s=%s;%s;%s' % (mode, target, params['warning'],
+                                params['critical'])
+    return(status, msg, perfdata)
+
+
+def check_modes(params, dashboard):
+    """
+    Run check_result() for every mode, each with its own thresholds
+
+    Return the aggregated (status, message, perfdata)
+    and the (mode, status, message, perfdata) of every mode
+
+    >>> params = {'modes': ['bad_hosts', 'pending_hosts'],
+    ...           'warnings': [5, 1], 'criticals': [10, 2]}
+    >>> status, message, perfdata, results = check_modes(params,
+    ...                         {'bad_hosts': 6, 'pending_hosts': 0})
+    >>> status
+    'WARNING'
+    >>> message
+    'bad_hosts has 6 servers (levels at 5/10), \
+pending_hosts has 0 servers (levels at 1/2)'
+    >>> perfdata
+    'bad_hosts=6;5;10 pending_hosts=0;1;2'
+    """
+
+    # a single mode keeps the dashboard details in its message
+    details = len(params['modes']) == 1
+    results = []
+    for mode, warning, critical in zip(params['modes'],
+                                       params['warnings'],
+                                       params['criticals']):
+        status, msg, perfdata = check_result({'mode': mode,
+                                              'warning': warning,
+                                              'critical': critical},
+                                             dashboard, details)
+        results.append((mode, status, msg, perfdata))
+
+    status = core.worst([result[1] for result in results])
+    message = ', '.join([result[2] for result in results])
+    perfdata = ' '.join([result[3] for result in results])
+    return status, message, perfdata, results
+
+
+def passive_results(params, results):
+    """
+    One Nagios external command per mode
+
+    >>> passive_results({'passive_host': 'foreman', 'service': 'foreman_%s',
+    ...                  'now': 1329211312},
+    ...                 [('bad_hosts', 'OK', 'fine', 'bad_hosts=0;5;10')])
+    ['[1329211312] PROCESS_SERVICE_CHECK_RESULT;foreman;foreman_bad_hosts;\
+0;OK - fine | bad_hosts=0;5;10']
+    """
+
+    lines = []
+    for mode, status, msg, perfdata in results:
+        lines.append(core.passive_result(params['now'],
+                                         params['passive_host'],
+                                         params['service'] % mode,
+                                         status,
+                                         '%s | %s' % (msg, perfdata)))
+    return lines
+
+
+def parse_thresholds(value, count):
+    """
+    One threshold per mode, or a single one for all of them
+
+    >>> parse_thresholds('5', 3)
+    [5, 5, 5]
+    >>> parse_thresholds('5,3', 2)
+    [5, 3]
+    """
+
+    thresholds = [int(threshold) for threshold in value.split(',')]
+    if len(thresholds) == 1:
+        thresholds = thresholds * count
+    if len(thresholds) != count:
+        raise ValueError('%s thresholds for %s modes' % (len(thresholds),
+                                                         count))
+    return thresholds
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    usage_string = """
+    usage: %prog [options] -H FOREMAN_HOST -m MODE -w WARNING -c CRITICAL
+
+    Warning and Critical are maximum number of hosts foreman has in that MODE
+
+    Several modes can be given separated by commas, with as many
+    thresholds or a single one used for all
+
+    Ex :
+
+    check_puppet_nodes.py -H foreman.example.com -m out_of_sync_hosts \\
+        -w 5 -c 10
+    will check if less than 5 nodes are out of sync, 10 for a critical
+
+    check_foreman_dashboard.py -H foreman.example.com \\
+        -m out_of_sync_hosts,bad_hosts -w 5,1 -c 10,3 --passive \\
+        --command-file /var/spool/nagios/cmd/nagios.cmd
+    will also submit foreman_out_of_sync_hosts and foreman_bad_hosts
+    passive results for the foreman.example.com host
+
+    """
+    return usage_string
+
+
+def add_options(parser):
+    """
+    Options of the dashboard check
+    """
+
+    parser.add_option('-H', '--hostname', type='string',
+                      help='Foreman hostname, or several separated by commas')
+
+    parser.add_option('-w', '--warning', type='string', default='5',
+                      help='Warning threshold(s) in number of hosts')
+
+    parser.add_option('-c', '--critical', type='string', default='10',
+                      help='Critical threshold(s) in number of hosts')
+
+    parser.add_option('-m', '--mode', type='string',
+                      help='Mode(s) of check, among %s' % ', '.join(MODES))
+
+    passive = OptionGroup(parser, "Passive Options",
+                          "Also submit one passive check result per mode")
+    passive.add_option('--passive', action='store_true', default=False,
+                       help='Submit passive results')
+    passive.add_option('--passive-host', type='string',
+                       help='Nagios host of the services, default -H')
+    passive.add_option('--service', type='string', default='foreman_%s',
+                       help='Nagios service description, %s is the mode')
+    passive.add_option('--command-file', type='string',
+                       help='Nagios external command file, '
+                            'required by --passive')
+    parser.add_option_group(passive)
+
+
+def validate(options):
+    """
+    Fail quick if not enough parameters
+    """
+
+    if options.hostname is None:
+        print "Missing -H HOSTNAME"
+        print "We need the hostname of the Foreman server"
+        print usage()
+        raise SystemExit(2)
+
+    if options.mode is None:
+        print "\nMissing -m MODE"
+        print "\nWhat mode are you executing this check in ?"
+        print usage()
+        raise SystemExit(2)
+
+    options.modes = options.mode.split(',')
+    for mode in options.modes:
+        if mode not in MODES:
+            print "\nUnknown mode %s" % mode
+            print "\nValid modes are %s" % ', '.join(MODES)
+            raise SystemExit(2)
+
+    try:
+        options.warnings = parse_thresholds(options.warning,
+                                            len(options.modes))
+        options.criticals = parse_thresholds(options.critical,
+                                             len(options.modes))
+    except ValueError, err:
+        print "\nInvalid thresholds : %s" % err
+        print usage()
+        raise SystemExit(2)
+
+    if options.passive and options.command_file is None:
+        # on stdout, Nagios would take the first one for the output
+        print "\nMissing --command-file"
+        print "\n--passive writes its results to the Nagios command file"
+        print usage()
+        raise SystemExit(2)
+
+    if options.passive_host is None:
+        options.passive_host = options.hostname
+
+    options.foreman = options.hostname
+
+
+def run(params, session, verboseprint):
+    """
+    Check every mode against one dashboard reply
+    """
+
+    foreman_data = merge(session.gather('api/dashboard/'))
+
+    if params['verbose']:
+        verboseprint("Reply from server : \n%s" % core.json_module().dumps(
+                                                    foreman_data,
+                                                    sort_keys=True,
+                                                    indent=2))
+
+    status, message, perfdata, results = check_modes(params, foreman_data)
+
+    if params['passive']:
+        params['now'] = int(time.time())
+        core.submit_passive(params['command_file'],
+                            passive_results(params, results))
+
+    return status, message, perfdata
@@ -0,0 +1,243 @@
+#-*- coding: utf-8 -*-
+"""
+
+Several foremen, one per datacenter, seen as one
+
+-F/-H take a comma separated list of foremen, each one gets its own
+Session and the checks go through a Federation with the same methods :
+
+ - fetch() / get() ask every foreman at once and keep the first reply,
+   a host lives on one of them, the others answer 404 or nothing
+ - gather() returns the reply of every foreman, asked at once, for the
+   checks adding them up (the dashboard counters)
+ - members() gives the sessions to walk for a listing, fastest first,
+   leaving out the foremen whose circuit breaker is open ; a foreman
+   failing during the walk is handed to failed() and left out as well
+
+A foreman which does not answer is named in the message and the status
+is at least WARNING, see degrade().
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/federation.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import Queue
+import threading
+from urllib2 import HTTPError, URLError
+
+from foreman_checks import core
+from foreman_checks.retry import CircuitOpen
+from foreman_checks.session import Session, default_error_message
+
+
+def preferred(error, other):
+    """
+    The error telling the most about a lookup which failed everywhere :
+    a foreman answering 404 beats one which did not answer, beats one
+    which was not even asked
+
+    >>> down = URLError('timed out')
+    >>> preferred(CircuitOpen('open'), down) is down
+    True
+    >>> missing = HTTPError('http://foreman/', 404, 'Not Found', {}, None)
+    >>> preferred(missing, down) is missing
+    True
+    """
+
+    def rank(err):
+        if isinstance(err, HTTPError):
+            return 2
+        if isinstance(err, CircuitOpen):
+            return 0
+        return 1
+
+    if error is None or rank(other) > rank(error):
+        return other
+    return error
+
+
+def degrade(result, unreachable):
+    """
+    A check result made with some foremen missing
+
+    >>> degrade(('OK', 'bad_hosts has 2 servers', 'bad_hosts=2;5;10'),
+    ...         ['http://dc2:80/'])
+    ('WARNING', 'bad_hosts has 2 servers - no reply from http://dc2:80/', \
+'bad_hosts=2;5;10')
+    """
+
+    status, message, perfdata = result
+    return (core.worst([status, 'WARNING']),
+            '%s - no reply from %s' % (message, ', '.join(unreachable)),
+            perfdata)
+
+
+class Federation(Session):
+    """
+    The sessions of several foremen, asked in parallel
+
+    get() comes from Session, on top of fetch() and url() below
+    """
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.base_url = ', '.join([session.base_url for session in sessions])
+        self.replies = {}
+        self.unreachable = []
+        self.lock = threading.Lock()
+
+    def measured(self):
+        """
+        Timings of every foreman added up
+        """
+
+        from foreman_checks.timing import Timings
+
+        timings = Timings()
+        for session in self.sessions:
+            timings.merge(session.timings)
+        return timings
+
+    def url(self, path):
+        """
+        Urls of path on every foreman
+        """
+
+        return ', '.join([session.url(path) for session in self.sessions])
+
+    def failed(self, member, url, err, error_message=default_error_message):
+        """
+        A member failed while walking a listing : it is left out and
+        named in the message, the run only ends, as with a lone foreman,
+        once no foreman is left
+        """
+
+        self.fail(member)
+        if len(self.unreachable) < len(self.sessions):
+            return
+        Session.failed(self, member, url, err, error_message)
+
+    def closed(self):
+        """
+        Sessions whose circuit is closed, fastest first ; CircuitOpen
+        when every circuit is open
+        """
+
+        members = []
+        for session in self.sessions:
+            if session.available():
+                members.append(session)
+            else:
+                self.fail(session)
+        if not members:
+            raise CircuitOpen('None of the foremen %s is answering' % (
+                                self.base_url))
+
+        # foremen never timed yet go first, so that they get timed
+        members.sort(key=lambda session: session.latency() or 0)
+        return members
+
+    def members(self):
+        """
+        Same as closed(), the run ends as UNKNOWN when every circuit is
+        open
+        """
+
+        try:
+            return self.closed()
+        except CircuitOpen, err:
+            print 'UNKNOWN - %s' % err
+            raise SystemExit(3)
+
+    def fail(self, session):
+        """
+        Remember a foreman which did not answer
+        """
+
+        with self.lock:
+            if session.base_url not in self.unreachable:
+                self.unreachable.append(session.base_url)
+
+    def fan_out(self, path, remember, fields=None):
+        """
+        Ask every member for path at once, yield (session, reply, error)
+        as the replies come in
+
+        Threads of the slower foremen are left behind once the caller
+        has what it wanted, they end with their timeout ; CircuitOpen
+        when no foreman can be asked
+        """
+
+        results = Queue.Queue()
+
+        def ask(session):
+            reply, error = None, None
+            try:
+                reply = session.fetch(path, remember, fields)
+            except URLError, err:
+                error = err
+            except ValueError, err:
+                error = URLError('invalid reply : %s' % err)
+            finally:
+                if reply is None and error is None:
+                    error = URLError('no reply')
+                results.put((session, reply, error))
+
+        members = self.closed()
+        for session in members:
+            thread = threading.Thread(target=ask, args=(session,))
+            thread.daemon = True
+            thread.start()
+        for _ in members:
+            yield results.get()
+
+    def fetch(self, path, remember=True, fields=None):
+        """
+        First reply of any foreman to path
+        Errors are raised as urllib2 HTTPError / URLError when every
+        foreman failed, the most telling one, CircuitOpen when none was
+        asked
+        """
+
+        key = (path, fields and repr(fields))
+        if key in self.replies:
+            return self.replies[key]
+
+        error = None
+        for _, reply, err in self.fan_out(path, remember, fields):
+            if err is None:
+                if remember:
+                    self.replies[key] = reply
+                return reply
+            error = preferred(error, err)
+        raise error
+
+    def gather(self, path, error_message=default_error_message):
+        """
+        Replies of every foreman to path, asked at once, the ones not
+        answering are left out ; errors are reported as CRITICAL and end
+        the run when no foreman answered
+        """
+
+        replies = []
+        error = None
+        try:
+            for session, reply, err in self.fan_out(path, True):
+                if err is None:
+                    replies.append(reply)
+                else:
+                    self.fail(session)
+                    error = preferred(error, err)
+        except CircuitOpen, err:
+            error = err
+        if not replies:
+            if isinstance(error, CircuitOpen):
+                print 'UNKNOWN - %s' % error
+                raise SystemExit(3)
+            print 'CRITICAL - %s' % error_message(self.url(path), error)
+            raise SystemExit(2)
+        return replies
@@ -0,0 +1,214 @@
+#-*- coding: utf-8 -*-
+"""
+
+Contact foreman to see whether the puppet runs of the whole fleet get slower.
+
+The active hosts are listed the way the nodes check does, then the
+reports index is walked once, newest first, back to --horizon : the
+metrics.time.total of the last report of every active host goes into
+a quantile sketch and a histogram, nothing is sorted or kept per run.
+p50/p95/p99 and the histogram buckets are given as perfdata, the
+quantile picked with --quantile is checked against -w/-c.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/fleet.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from datetime import datetime, timedelta
+from optparse import OptionGroup
+
+from foreman_checks import nodes, puppet
+from foreman_checks.sketch import QuantileSketch, Histogram
+
+DESCRIPTION = """A Nagios plugin to check if the puppet runs of the
+whole fleet are getting slower, like when the puppetmaster is overloaded."""
+
+# Quantiles always given as perfdata, in percent
+QUANTILES = [50, 95, 99]
+
+
+def gather(params, session, sketch, histogram):
+    """
+    Add the run time of the last report of every active host to the
+    sketch and the histogram
+
+    Return the number of active hosts and of hosts with a run time
+    """
+
+    active = set()
+    for item in nodes.iter_hosts(dict(params, mode='active'), session,
+                                 nodes.NAME_FIELDS):
+        active.add(item.get('host', item)['name'])
+
+    since = params['now'] - timedelta(minutes=params['horizon'])
+    search = 'last_report > "%s"' % since.strftime('%Y-%m-%d %H:%M:%S UTC')
+    seen = set()
+    for report in puppet.iter_reports(params, session, search):
+        hostname = puppet.report_hostname(report)
+        # reports come newest first, the first one per host is the last
+        if hostname in seen or hostname not in active:
+            continue
+        seen.add(hostname)
+        total = puppet.report_total(report)
+        if total is not None and puppet.parse_timestamp(
+                report['reported_at']) >= since:
+            sketch.add(total)
+            histogram.add(total)
+    return len(active), sketch.count
+
+
+def check_result(params, sketch, histogram, active):
+    """
+    From the run time distribution and input parameter
+    check if the fleet should trigger an alert
+
+    >>> sketch, histogram = QuantileSketch(), Histogram([30, 60])
+    >>> for total in [20.0] * 90 + [70.0] * 10:
+    ...     sketch.add(total)
+    ...     histogram.add(total)
+    >>> params = {'quantile': 95, 'warning': 60, 'critical': 120,
+    ...           'horizon': 60}
+    >>> status, msg, perfdata = check_result(params, sketch, histogram, 110)
+    >>> status
+    'WARNING'
+    >>> msg
+    'p50 19.9s, p95 70.1s, p99 70.1s over 100 hosts, 10 active hosts \
+without a report in 60 minutes (levels at 60/120 on p95)'
+    >>> perfdata
+    'p50=19.9s;;;0 p95=70.1s;60;120;0 p99=70.1s;;;0 hosts=100;;;0 \
+missing=10;;;0 runtime_le_30=90;;;0 runtime_le_60=0;;;0 runtime_gt_60=10;;;0'
+    """
+
+    if not sketch.count:
+        return ('UNKNOWN', 'No run time reported by the %s active hosts '
+                'in the last %s minutes' % (active, params['horizon']), None)
+
+    quantiles = sorted(set(QUANTILES + [params['quantile']]))
+    values = dict([(percent, sketch.quantile(percent / 100.0))
+                   for percent in quantiles])
+
+    value = values[params['quantile']]
+    if (value >= params['critical']):
+        status = 'CRITICAL'
+    elif (value >= params['warning']):
+        status = 'WARNING'
+    else:
+        status = 'OK'
+
+    msg = '%s over %s hosts' % (', '.join(['p%s %.1fs' % (
+                                    percent, values[percent])
+                                    for percent in quantiles]),
+                                sketch.count)
+    missing = active - sketch.count
+    if missing > 0:
+        msg = '%s, %s active hosts without a report in %s minutes' % (
+                    msg, missing, params['horizon'])
+    msg = '%s (levels at %g/%g on p%s)' % (msg, params['warning'],
+                                           params['critical'],
+                                           params['quantile'])
+
+    perfdata = []
+    for percent in quantiles:
+        if percent == params['quantile']:
+            levels = '%g;%g' % (params['warning'], params['critical'])
+        else:
+            levels = ';'
+        perfdata.append('p%s=%.1fs;%s;0' % (percent, values[percent], levels))
+    perfdata.append('hosts=%s;;;0' % sketch.count)
+    perfdata.append('missing=%s;;;0' % max(missing, 0))
+    for label, count in histogram.buckets():
+        perfdata.append('runtime_%s=%s;;;0' % (label, count))
+    return status, msg, ' '.join(perfdata)
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    usage_string = """
+    usage: %prog [options] -H FOREMAN_HOST -w WARNING -c CRITICAL
+
+    Warning and Critical are defined in seconds, for the --quantile (p95
+    by default) of the last run time of every active host
+
+    Ex :
+
+    check_foreman.py fleet -H foreman.example.com -w 60 -c 120
+    will check that 95% of the hosts ran puppet in less than a minute
+
+    """
+    return usage_string
+
+
+def add_options(parser):
+    """
+    Options of the fleet check
+    """
+
+    parser.add_option('-H', '--hostname', type='string',
+                      help='Foreman hostname, or several separated by commas')
+
+    parser.add_option('-w', '--warning', type='float', default=60,
+                      help='Warning threshold in seconds')
+
+    parser.add_option('-c', '--critical', type='float', default=120,
+                      help='Critical threshold in seconds')
+
+    fleet = OptionGroup(parser, "Fleet Options",
+                        "Which runs and which quantile")
+    fleet.add_option('--quantile', type='int', default=95,
+                     help='Quantile checked against -w/-c, in percent')
+    fleet.add_option('--horizon', type='int', default=60,
+                     help='Ignore reports older than this, in minutes')
+    fleet.add_option('--per-page', type='int', default=100,
+                     help='Hosts or reports fetched per request')
+    fleet.add_option('--buckets', type='string', default='10,30,60,120,300',
+                     help='Upper bounds of the histogram buckets, in seconds')
+    parser.add_option_group(fleet)
+
+
+def validate(options):
+    """
+    Fail quick if not enough parameters
+    """
+
+    if options.hostname is None:
+        print "Missing -H HOSTNAME"
+        print "We need the hostname of the Foreman server"
+        print usage()
+        raise SystemExit(2)
+
+    if not 0 < options.quantile < 100:
+        print "\nInvalid --quantile %s" % options.quantile
+        print "\nThe quantile is a percentage, between 1 and 99"
+        raise SystemExit(2)
+
+    try:
+        options.edges = [float(edge) for edge in options.buckets.split(',')]
+    except ValueError:
+        print "\nInvalid --buckets %s" % options.buckets
+        print usage()
+        raise SystemExit(2)
+
+    options.foreman = options.hostname
+
+
+def run(params, session, verboseprint):
+    """
+    Gather the run times of the fleet and check their distribution
+    """
+
+    params['now'] = datetime.utcnow().replace(microsecond=0)
+
+    sketch = QuantileSketch()
+    histogram = Histogram(params['edges'])
+    active, reported = gather(params, session, sketch, histogram)
+    verboseprint("Active hosts : %s, with a run time : %s" % (active,
+                                                              reported))
+
+    return check_result(params, sketch, histogram, active)
@@ -0,0 +1,348 @@
+#-*- coding: utf-8 -*-
+"""
+
+Contact foreman to check the health of the puppet nodes group by group.
+
+The nodes check counts the hosts of a mode over the whole fleet, a
+broken hostgroup drowns in it. Here the hosts are counted per hostgroup,
+per environment or per value of a fact (--by fact:osfamily) : the hosts
+list and the hosts list of the mode are both walked once, streamed, each
+host adding one to the counter of its group. Every group is checked
+against -w/-c, a number of hosts or a percentage of the group (-w 5%),
+and given as perfdata ; one run covers every group.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/groups.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from optparse import OptionGroup
+import re
+
+from foreman_checks import core, nodes
+
+DESCRIPTION = """A Nagios plugin to check if the puppet nodes of every
+hostgroup, environment or fact value are healthy : not too many of a
+group in errors, not too many out of sync."""
+
+# What the groups check reads of a host
+HOST = {'name': None, 'hostgroup_name': None, 'environment_name': None}
+HOST_FIELDS = dict(HOST, host=HOST)
+# Group of the hosts without a hostgroup, environment or fact value
+NO_GROUP = 'none'
+# Anything else is replaced in the perfdata labels
+LABEL = re.compile(r'[^\w.-]')
+
+
+def parse_level(value):
+    """
+    (level, ratio) of a threshold, a number of hosts or a percentage of
+    the group ; ValueError when it is neither
+
+    >>> parse_level('5'), parse_level('2.5%')
+    ((5.0, False), (2.5, True))
+    """
+
+    ratio = value.endswith('%')
+    level = float(ratio and value[:-1] or value)
+    if level < 0:
+        raise ValueError('negative threshold %s' % value)
+    return level, ratio
+
+
+def grouping(by, facts=None):
+    """
+    The function giving the group of a host, by hostgroup, environment
+    or fact:NAME, facts being the value of that fact per host name
+
+    >>> host = {'name': 'a', 'hostgroup_name': 'web'}
+    >>> grouping('hostgroup')(host), grouping('environment')(host)
+    ('web', 'none')
+    >>> grouping('fact:osfamily', {'a': 'Debian'})(host)
+    'Debian'
+    """
+
+    if by == 'hostgroup':
+        return lambda host: host.get('hostgroup_name') or NO_GROUP
+    if by == 'environment':
+        return lambda host: host.get('environment_name') or NO_GROUP
+    return lambda host: facts.get(host.get('name'), NO_GROUP)
+
+
+def count_groups(items, key):
+    """
+    Number of hosts per group of a hosts listing, in one pass
+
+    >>> sorted(count_groups([{'host': {'hostgroup_name': 'web'}},
+    ...                      {'hostgroup_name': 'web'}, {'host': {}}],
+    ...                     grouping('hostgroup')).items())
+    [('none', 1), ('web', 2)]
+    """
+
+    counts = {}
+    for item in items:
+        group = key(item.get('host', item))
+        counts[group] = counts.get(group, 0) + 1
+    return counts
+
+
+def fact_values(params, session, name):
+    """
+    Value of the fact name per host name, from every foreman answering
+    """
+
+    import urllib
+    from urllib2 import URLError
+
+    facts = {}
+    # one string per value, not one per host
+    values = {}
+    for member in session.members():
+        page = 1
+        while True:
+            query = {'search': 'name = %s' % name}
+            if params['per_page']:
+                query.update(per_page=params['per_page'], page=page)
+            path = 'fact_values?%s' % urllib.urlencode(query)
+            try:
+                reply = member.fetch(path)
+            except URLError, err:
+                session.failed(member, member.url(path), err,
+                               nodes.error_message)
+                break
+            for hostname, host_facts in reply.items():
+                if host_facts.get(name) is not None:
+                    value = unicode(host_facts[name])
+                    facts[hostname] = values.setdefault(value, value)
+
+            # a foreman ignoring per_page sends everything on the first page
+            if len(reply) != params['per_page']:
+                break
+            page += 1
+    return facts
+
+
+def group_status(levels, count, total, min_hosts):
+    """
+    Status of a group of total hosts, count of them in the mode
+
+    A percentage only applies to the groups of min_hosts hosts or more
+
+    >>> levels = [(5, True), (10, False)]
+    >>> group_status(levels, 6, 100, 1), group_status(levels, 10, 100, 1)
+    ('WARNING', 'CRITICAL')
+    >>> group_status(levels, 1, 2, 1), group_status(levels, 1, 2, 5)
+    ('WARNING', 'OK')
+    """
+
+    status = 'OK'
+    for name, (level, ratio) in zip(['WARNING', 'CRITICAL'], levels):
+        if ratio:
+            reached = total >= min_hosts and count * 100.0 >= level * total
+        else:
+            reached = count >= level
+        if reached:
+            status = name
+    return status
+
+
+def perf_levels(levels, ratio):
+    """
+    The warning;critical of the perfdata of a count or of a percentage,
+    empty for the thresholds of the other kind
+
+    >>> perf_levels([(5, True), (10, False)], False)
+    ';10'
+    """
+
+    return ';'.join([kind == ratio and '%g' % level or ''
+                     for level, kind in levels])
+
+
+def check_result(params, totals, counts):
+    """
+    From the hosts per group and the hosts in the mode per group
+    check if any group should trigger an alert
+
+    >>> params = {'mode': 'out_of_sync', 'by': 'hostgroup',
+    ...           'warning': '5%', 'critical': '20', 'min_hosts': 1,
+    ...           'groups': None, 'top': 3}
+    >>> totals = {'web': 100, 'db': 10, 'app': 50}
+    >>> check_result(params, totals, {'web': 3, 'app': 1})
+    ('OK', '4 of 160 hosts in 3 groups by hostgroup have the status : \
+out_of_sync (levels at 5%/20)', 'app=1;;20;0;50 app_pct=2.0%;5;;0;100 \
+db=0;;20;0;10 db_pct=0.0%;5;;0;100 web=3;;20;0;100 web_pct=3.0%;5;;0;100')
+    >>> check_result(params, totals, {'web': 21, 'db': 1})[:2]
+    ('CRITICAL', '22 of 160 hosts in 3 groups by hostgroup have the status \
+: out_of_sync - web 21/100 (21.0%), db 1/10 (10.0%) (levels at 5%/20)')
+    >>> check_result(dict(params, groups=['cache']), totals, {})[:2]
+    ('UNKNOWN', 'No host in the groups cache')
+    """
+
+    levels = [parse_level(params['warning']),
+              parse_level(params['critical'])]
+    by = params['by'].split(':')[-1]
+    ratios = [ratio for _, ratio in levels if ratio]
+    groups = params['groups'] or sorted(set(totals) | set(counts))
+    groups = [group for group in sorted(groups)
+              if totals.get(group) or counts.get(group)]
+    if not groups:
+        return ('UNKNOWN', 'No host in the groups %s' % (
+                                ', '.join(params['groups'] or [])), None)
+
+    statuses = []
+    alerts = []
+    perfdata = []
+    for group in groups:
+        count = counts.get(group, 0)
+        # a host may have joined the group between the two listings
+        total = max(totals.get(group, 0), count)
+        percent = count * 100.0 / total
+        status = group_status(levels, count, total, params['min_hosts'])
+        statuses.append(status)
+        if status != 'OK':
+            alerts.append((status == 'CRITICAL', percent, count, group, total))
+
+        label = LABEL.sub('_', group)
+        perfdata.append('%s=%s;%s;0;%s' % (label, count,
+                                           perf_levels(levels, False), total))
+        if ratios:
+            perfdata.append('%s_pct=%.1f%%;%s;0;100' % (
+                                label, percent, perf_levels(levels, True)))
+
+    status = core.worst(statuses)
+    msg = '%s of %s hosts in %s groups by %s have the status : %s' % (
+                sum([counts.get(group, 0) for group in groups]),
+                sum([max(totals.get(group, 0), counts.get(group, 0))
+                     for group in groups]),
+                len(groups), by, params['mode'])
+    if alerts:
+        alerts.sort(reverse=True)
+        msg = '%s - %s' % (msg, ', '.join([
+                    '%s %s/%s (%.1f%%)' % (group, count, total, percent)
+                    for _, percent, count, group, total
+                    in alerts[:params['top']]]))
+    msg = '%s (levels at %s/%s)' % (msg, params['warning'],
+                                    params['critical'])
+    return status, msg, ' '.join(perfdata)
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    usage_string = """
+    usage: %prog [options] -H FOREMAN_HOST -m MODE -w WARNING -c CRITICAL
+
+    Warning and Critical are numbers of hosts of a group in that MODE, or
+    percentages of the group when ending with %
+
+    Ex :
+
+    check_foreman.py groups -H foreman.example.com -m out_of_sync \\
+        -w 5% -c 10% --by hostgroup
+    will alert when 5% of the hosts of any hostgroup are out of sync,
+    10% for a critical
+
+    check_foreman.py groups -H foreman.example.com -m errors \\
+        -w 2 -c 5 --by fact:osfamily
+    will alert when 2 hosts of any osfamily are in errors
+
+    """
+    return usage_string
+
+
+def add_options(parser):
+    """
+    Options of the groups check
+    """
+
+    parser.add_option('-H', '--hostname', type='string',
+                      help='Foreman hostname, or several separated by commas')
+
+    parser.add_option('-w', '--warning', type='string', default='5%',
+                      help='Warning threshold, hosts or percent of a group')
+
+    parser.add_option('-c', '--critical', type='string', default='10%',
+                      help='Critical threshold, hosts or percent of a group')
+
+    parser.add_option('-m', '--mode', type='choice',
+                      choices=['out_of_sync', 'errors', 'active'],
+                      help='Mode of check')
+
+    groups = OptionGroup(parser, "Group Options", "How hosts are grouped")
+    groups.add_option('--by', type='string', default='hostgroup',
+                      help='hostgroup, environment or fact:NAME')
+    groups.add_option('--group', dest='groups', action='append',
+                      help='Only check that group, may be repeated')
+    groups.add_option('--min-hosts', type='int', default=1,
+                      help='Smallest group a percentage applies to')
+    groups.add_option('--top', type='int', default=5,
+                      help='Groups in alert named in the message')
+    groups.add_option('--per-page', type='int', default=100,
+                      help='Hosts and fact values fetched per request')
+    parser.add_option_group(groups)
+
+
+def validate(options):
+    """
+    Fail quick if not enough parameters
+    """
+
+    if options.hostname is None:
+        print "Missing -H HOSTNAME"
+        print "We need the hostname of the Foreman server"
+        print usage()
+        raise SystemExit(2)
+
+    if options.mode is None:
+        print "\nMissing -m MODE"
+        print "\nWhat mode are you executing this check in ?"
+        print usage()
+        raise SystemExit(2)
+
+    for threshold in (options.warning, options.critical):
+        try:
+            parse_level(threshold)
+        except ValueError:
+            print "\nInvalid threshold %s" % threshold
+            print "\nA threshold is a number of hosts, or a percentage : 5%"
+            raise SystemExit(2)
+
+    if options.by not in ('hostgroup', 'environment') and \
+            not (options.by.startswith('fact:') and options.by[5:]):
+        print "\nInvalid --by %s" % options.by
+        print "\nHosts are grouped by hostgroup, environment or fact:NAME"
+        raise SystemExit(2)
+
+    options.foreman = options.hostname
+
+
+def run(params, session, verboseprint):
+    """
+    Count the hosts of every group, and those of them in that mode
+    """
+
+    facts = None
+    fields = HOST_FIELDS
+    if params['by'].startswith('fact:'):
+        facts = fact_values(params, session, params['by'][5:])
+        verboseprint("Hosts with a value for %s : %s" % (params['by'],
+                                                         len(facts)))
+        if not facts:
+            return ('UNKNOWN', 'No host has the fact %s' % (
+                                    params['by'][5:]), None)
+        fields = nodes.NAME_FIELDS
+    key = grouping(params['by'], facts)
+
+    totals = count_groups(nodes.iter_listing(params, session, 'hosts/',
+                                             fields), key)
+    counts = count_groups(nodes.iter_hosts(params, session, fields), key)
+    verboseprint("Hosts in %s per %s : %s" % (params['mode'], params['by'],
+                                              counts))
+
+    return check_result(params, totals, counts)
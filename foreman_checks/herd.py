@@ -0,0 +1,257 @@
+#-*- coding: utf-8 -*-
+"""
+
+Contact foreman to see whether the puppet agents check in all at once.
+
+After a mass reboot or with a broken splay, agents synchronize and the
+puppetmasters melt. The last report of every host is binned by
+time slot over the last --window minutes, in arrays of integers : one
+counter per slot, one slot and one hostgroup number per host. The peak
+of check-ins per slot divided by their mean is checked against -w/-c,
+the worst slots and the hostgroups checking in during them are named.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/herd.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from array import array
+from datetime import datetime, timedelta
+from optparse import OptionGroup
+
+from foreman_checks import nodes, puppet
+
+DESCRIPTION = """A Nagios plugin to check if the puppet agents are
+spread over time or all check in at once, overloading the puppetmaster."""
+
+# What the herd check reads of a host
+HOST = {'last_report': None, 'hostgroup_name': None}
+HOST_FIELDS = dict(HOST, host=HOST)
+
+
+class SlotHistogram(object):
+    """
+    Check-ins per time slot, slot 0 is the most recent one
+
+    >>> now = datetime(2012, 2, 14, 9, 30)
+    >>> slots = SlotHistogram(now, window=5, slot=60)
+    >>> for seconds, hostgroup in [(10, 'web'), (20, 'web'), (50, 'db'),
+    ...                            (130, 'db'), (900, 'db')]:
+    ...     added = slots.add(now - timedelta(seconds=seconds), hostgroup)
+    >>> slots.counts.tolist()
+    [3, 0, 1, 0, 0]
+    >>> slots.worst(2)
+    [0, 2]
+    >>> slots.hostgroups([0], 5)
+    [('web', 2), ('db', 1)]
+    >>> slots.label(0)
+    '09:29'
+    """
+
+    def __init__(self, now, window, slot):
+        self.now = now
+        self.slot = slot
+        self.counts = array('l', [0] * max(window * 60 / slot, 1))
+        # per host : its slot, and its hostgroup as an index in groups
+        self.host_slots = array('l')
+        self.host_groups = array('l')
+        self.groups = []
+        self.group_ids = {}
+
+    def add(self, reported_at, hostgroup):
+        """
+        Count a check-in, False if older than the window
+        """
+
+        age = self.now - reported_at
+        # a client clock ahead of ours checked in just now
+        index = max(age.days * 86400 + age.seconds, 0) / self.slot
+        if index >= len(self.counts):
+            return False
+        self.counts[index] += 1
+
+        if hostgroup not in self.group_ids:
+            self.group_ids[hostgroup] = len(self.groups)
+            self.groups.append(hostgroup)
+        self.host_slots.append(index)
+        self.host_groups.append(self.group_ids[hostgroup])
+        return True
+
+    def worst(self, top):
+        """
+        Indexes of the top slots with the most check-ins
+        """
+
+        ranked = sorted(range(len(self.counts)),
+                        key=lambda index: (-self.counts[index], index))
+        return [index for index in ranked[:top] if self.counts[index]]
+
+    def hostgroups(self, slots, top):
+        """
+        (hostgroup, check-ins) of the top hostgroups within those slots
+        """
+
+        wanted = set(slots)
+        counts = array('l', [0] * len(self.groups))
+        for index, group in zip(self.host_slots, self.host_groups):
+            if index in wanted:
+                counts[group] += 1
+        ranked = sorted(range(len(counts)),
+                        key=lambda group: (-counts[group], self.groups[group]))
+        return [(self.groups[group], counts[group])
+                for group in ranked[:top] if counts[group]]
+
+    def label(self, index):
+        """
+        UTC start time of a slot
+        """
+
+        start = self.now - timedelta(seconds=(index + 1) * self.slot)
+        if self.slot % 60:
+            return start.strftime('%H:%M:%S')
+        return start.strftime('%H:%M')
+
+
+def check_result(params, slots):
+    """
+    From the check-ins per slot and input parameter
+    check if the agents are synchronized enough to trigger an alert
+
+    >>> now = datetime(2012, 2, 14, 9, 30)
+    >>> slots = SlotHistogram(now, window=4, slot=60)
+    >>> for seconds in (10, 20, 30, 40, 50, 70, 130, 190):
+    ...     added = slots.add(now - timedelta(seconds=seconds), 'web')
+    >>> check_result({'warning': 2, 'critical': 3, 'slot': 60, 'top': 2},
+    ...              slots)
+    ('WARNING', 'peak of 5 check-ins per 60s, 2.5 times the mean of 2.0 - \
+worst slots 09:29 (5), 09:28 (1) - hostgroups web (6) (levels at 2/3)', \
+'peak_ratio=2.50;2;3;0 peak=5;;;0 mean=2.00;;;0 hosts=8;;;0')
+    """
+
+    hosts = sum(slots.counts)
+    if not hosts:
+        return ('UNKNOWN', 'No check-in in the last %s slots of %ss' % (
+                                len(slots.counts), params['slot']), None)
+
+    peak = max(slots.counts)
+    mean = float(hosts) / len(slots.counts)
+    ratio = peak / mean
+
+    if (ratio >= params['critical']):
+        status = 'CRITICAL'
+    elif (ratio >= params['warning']):
+        status = 'WARNING'
+    else:
+        status = 'OK'
+
+    worst = slots.worst(params['top'])
+    msg = 'peak of %s check-ins per %ss, %.1f times the mean of %.1f' % (
+                peak, params['slot'], ratio, mean)
+    if status != 'OK':
+        msg = '%s - worst slots %s - hostgroups %s' % (
+                msg,
+                ', '.join(['%s (%s)' % (slots.label(index),
+                                        slots.counts[index])
+                           for index in worst]),
+                ', '.join(['%s (%s)' % item for item in slots.hostgroups(
+                                                    worst, params['top'])]))
+    msg = '%s (levels at %g/%g)' % (msg, params['warning'],
+                                    params['critical'])
+
+    perfdata = 'peak_ratio=%.2f;%g;%g;0 peak=%s;;;0 mean=%.2f;;;0 ' \
+               'hosts=%s;;;0' % (ratio, params['warning'], params['critical'],
+                                 peak, mean, hosts)
+    return status, msg, perfdata
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    usage_string = """
+    usage: %prog [options] -H FOREMAN_HOST -w WARNING -c CRITICAL
+
+    Warning and Critical are ratios between the peak and the mean number
+    of check-ins per --slot seconds, over the last --window minutes
+
+    Ex :
+
+    check_foreman.py herd -H foreman.example.com -w 3 -c 5 --window 30
+    will alert when a minute of the last half hour saw three times as many
+    agents checking in as an average minute
+
+    """
+    return usage_string
+
+
+def add_options(parser):
+    """
+    Options of the herd check
+    """
+
+    parser.add_option('-H', '--hostname', type='string',
+                      help='Foreman hostname, or several separated by commas')
+
+    parser.add_option('-w', '--warning', type='float', default=3,
+                      help='Warning threshold, peak to mean ratio')
+
+    parser.add_option('-c', '--critical', type='float', default=5,
+                      help='Critical threshold, peak to mean ratio')
+
+    herd = OptionGroup(parser, "Herd Options", "Time slots of the check-ins")
+    herd.add_option('--window', type='int', default=30,
+                    help='Minutes of check-ins looked at, '
+                         'the puppet runinterval')
+    herd.add_option('--slot', type='int', default=60,
+                    help='Seconds per time slot')
+    herd.add_option('--top', type='int', default=3,
+                    help='Worst slots and hostgroups named in the message')
+    herd.add_option('--per-page', type='int', default=100,
+                    help='Hosts fetched per request')
+    parser.add_option_group(herd)
+
+
+def validate(options):
+    """
+    Fail quick if not enough parameters
+    """
+
+    if options.hostname is None:
+        print "Missing -H HOSTNAME"
+        print "We need the hostname of the Foreman server"
+        print usage()
+        raise SystemExit(2)
+
+    if options.slot <= 0 or options.window * 60 < options.slot:
+        print "\nInvalid --slot %s" % options.slot
+        print "\nA slot is a positive number of seconds, within --window"
+        raise SystemExit(2)
+
+    options.foreman = options.hostname
+
+
+def run(params, session, verboseprint):
+    """
+    Bin the last check-in of every host and look for a peak
+
+    Every host of the hosts listing counts : an agent with nothing to
+    change, not an active host for foreman, still loads the puppetmaster
+    """
+
+    params['now'] = datetime.utcnow().replace(microsecond=0)
+
+    slots = SlotHistogram(params['now'], params['window'], params['slot'])
+    for item in nodes.iter_listing(params, session, 'hosts/', HOST_FIELDS):
+        host = item.get('host', item)
+        if host.get('last_report'):
+            slots.add(puppet.parse_timestamp(host['last_report']),
+                      host.get('hostgroup_name') or 'none')
+
+    verboseprint("Check-ins per slot, newest first : %s" % (
+                    slots.counts.tolist()))
+
+    return check_result(params, slots)
@@ -0,0 +1,166 @@
+#-*- coding: utf-8 -*-
+"""
+
+Puppet run times of a host over its last runs, and their trend
+
+The run times of the last N runs are kept in a fixed-size ring buffer,
+a few hundred bytes per host whatever the number of runs. The trend
+check compares the window with thresholds : the p95 run time in
+seconds, and the increase of the last run over the median of the
+previous ones in percent.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/history.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from array import array
+
+from foreman_checks import core
+
+# Fewer run times than this say nothing about a trend
+MIN_SAMPLES = 5
+
+
+class RingBuffer(object):
+    """
+    The last size values appended, stored in an array of doubles
+
+    >>> ring = RingBuffer(3, [1, 2])
+    >>> ring.append(3)
+    >>> ring.append(4)
+    >>> ring.values()
+    [2.0, 3.0, 4.0]
+    >>> position, count, blob = ring.dumps()
+    >>> RingBuffer.loads(position, count, blob).values()
+    [2.0, 3.0, 4.0]
+    """
+
+    def __init__(self, size, values=()):
+        self.samples = array('d', [0.0] * size)
+        self.position = 0
+        self.count = 0
+        for value in list(values)[-size:]:
+            self.append(value)
+
+    @property
+    def size(self):
+        """ Values kept at most """
+        return len(self.samples)
+
+    def append(self, value):
+        """ Add a value, overwriting the oldest one when full """
+        self.samples[self.position] = value
+        self.position = (self.position + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+
+    def values(self):
+        """ Values kept, oldest first """
+        start = (self.position - self.count) % len(self.samples)
+        if start + self.count <= len(self.samples):
+            return self.samples[start:start + self.count].tolist()
+        return (self.samples[start:].tolist() +
+                self.samples[:self.position].tolist())
+
+    def dumps(self):
+        """ (position, count, bytes) to store the buffer """
+        return self.position, self.count, self.samples.tostring()
+
+    @classmethod
+    def loads(cls, position, count, blob):
+        """ Buffer stored with dumps() """
+        ring = cls(0)
+        ring.samples.fromstring(str(blob))
+        ring.position = position
+        ring.count = count
+        return ring
+
+
+def quantile(values, fraction):
+    """
+    Nearest-rank quantile
+
+    >>> quantile(range(1, 101), 0.95)
+    95
+    >>> quantile([3, 1, 2], 0.5)
+    2
+    """
+
+    ordered = sorted(values)
+    rank = int(fraction * len(ordered) + 0.5)
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def exceeds(value, warning, critical):
+    """
+    Status of value against optional thresholds
+
+    >>> exceeds(10, 5, None)
+    'WARNING'
+    >>> exceeds(10, None, None)
+    'OK'
+    """
+
+    if critical is not None and value >= critical:
+        return 'CRITICAL'
+    if warning is not None and value >= warning:
+        return 'WARNING'
+    return 'OK'
+
+
+def check_trend(params, samples):
+    """
+    Judge the run times of a host, oldest first
+
+    Return (status, message, perfdata), message and perfdata are empty
+    as long as there are too few samples
+
+    >>> params = {'runtime_warning': 60, 'runtime_critical': 300,
+    ...           'regression_warning': 50, 'regression_critical': 100}
+    >>> check_trend(params, [40.0] * 9 + [90.0])
+    ('CRITICAL', 'run time p95 90.0s over 10 runs, last one +125% over \
+the median', 'runtime_p95=90.0s;60;300;0 runtime_increase=125%;50;100')
+    >>> check_trend(params, [40.0, 90.0])
+    ('OK', '', '')
+    """
+
+    if len(samples) < MIN_SAMPLES:
+        return 'OK', '', ''
+
+    p95 = quantile(samples, 0.95)
+    baseline = quantile(samples[:-1], 0.5)
+    if baseline:
+        increase = int(round((samples[-1] - baseline) * 100 / baseline))
+    else:
+        increase = 0
+
+    status = core.worst([exceeds(p95, params['runtime_warning'],
+                                 params['runtime_critical']),
+                         exceeds(increase, params['regression_warning'],
+                                 params['regression_critical'])])
+    message = 'run time p95 %.1fs over %d runs, last one %+d%% over ' \
+              'the median' % (p95, len(samples), increase)
+    perfdata = 'runtime_p95=%.1fs;%s;%s;0 runtime_increase=%d%%;%s;%s' % (
+                    p95,
+                    threshold(params['runtime_warning']),
+                    threshold(params['runtime_critical']),
+                    increase,
+                    threshold(params['regression_warning']),
+                    threshold(params['regression_critical']))
+    return status, message, perfdata
+
+
+def threshold(value):
+    """
+    A threshold as written in perfdata, empty when unset
+
+    >>> threshold(None), threshold(60)
+    ('', '60')
+    """
+
+    if value is None:
+        return ''
+    return '%s' % value
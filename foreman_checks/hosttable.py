@@ -0,0 +1,154 @@
+#-*- coding: utf-8 -*-
+"""
+
+Last report of many hosts, column by column
+
+Bulk mode used to keep the last report of every host as the nested
+dicts json.loads() gives, a kilobyte or two per host. A HostTable keeps
+one row per host in a few columns instead : the hostname, interned, the
+reported_at in seconds since the epoch in an array of integers, the run
+time in an array of doubles (NaN when unknown) and the summary as a
+small integer, its index in the list of the summaries seen. Thresholds
+are checked over whole columns at once, with numpy when it is installed.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/hosttable.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from array import array
+
+# What HostTable.check() codes stand for
+STATUSES = ['OK', 'WARNING', 'CRITICAL']
+NAN = float('nan')
+# Below that many rows, importing numpy costs more than it saves
+NUMPY_ROWS = 20000
+
+
+def numpy_module():
+    """
+    numpy when available, imported on first use only, None otherwise
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class HostTable(object):
+    """
+    The newest report of every host, in columns
+
+    >>> table = HostTable()
+    >>> table.add('server1', 1329211312, 'Success', 12.5)
+    True
+    >>> table.add('server2', 1329200000, 'Error')
+    True
+    >>> table.add('server1', 1329200000, 'Error', 3)
+    False
+    >>> len(table), table.reported.tolist(), table.summary(1)
+    (2, [1329211312, 1329200000], 'Error')
+    >>> table.runtime(0), table.runtime(1) is None
+    (12.5, True)
+    """
+
+    def __init__(self):
+        self.names = []
+        self.rows = {}
+        self.reported = array('l')
+        self.runtimes = array('d')
+        self.summaries = array('B')
+        self.summary_names = []
+        self.summary_codes = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, hostname, reported_at, summary, total=None):
+        """
+        Count the report of hostname made at reported_at, in seconds since
+        the epoch, unless a newer one is known ; False when it is not
+        """
+
+        if summary not in self.summary_codes:
+            self.summary_codes[summary] = len(self.summary_names)
+            self.summary_names.append(summary)
+        runtime = NAN if total is None else float(total)
+
+        if isinstance(hostname, unicode):
+            hostname = hostname.encode('utf-8')
+        row = self.rows.get(hostname)
+        if row is None:
+            hostname = intern(hostname)
+            self.rows[hostname] = len(self.names)
+            self.names.append(hostname)
+            self.reported.append(reported_at)
+            self.runtimes.append(runtime)
+            self.summaries.append(self.summary_codes[summary])
+            return True
+        if reported_at <= self.reported[row]:
+            return False
+        self.reported[row] = reported_at
+        self.runtimes[row] = runtime
+        self.summaries[row] = self.summary_codes[summary]
+        return True
+
+    def summary(self, row):
+        """ Summary of the report of row """
+        return self.summary_names[self.summaries[row]]
+
+    def runtime(self, row):
+        """ Run time of the report of row, None when unknown """
+        runtime = self.runtimes[row]
+        if runtime != runtime:
+            return None
+        return runtime
+
+    def order(self):
+        """ Rows by hostname """
+        return sorted(range(len(self.names)), key=self.names.__getitem__)
+
+    def check(self, now, warning, critical, numpy=None):
+        """
+        Status code of every row, an index in STATUSES : CRITICAL or
+        WARNING when the report is critical / warning seconds old or more,
+        WARNING as well when it is not a Success
+
+        >>> table = HostTable()
+        >>> for name, age, summary in [('ok', 60, 'Success'),
+        ...                            ('failed', 60, 'Error'),
+        ...                            ('late', 2000, 'Success'),
+        ...                            ('gone', 4000, 'Error')]:
+        ...     added = table.add(name, 10000 - age, summary)
+        >>> table.check(10000, 1800, 3600).tolist()
+        [0, 1, 1, 2]
+        >>> numpy = numpy_module()
+        >>> numpy is None or table.check(10000, 1800, 3600,
+        ...                              numpy).tolist() == [0, 1, 1, 2]
+        True
+        """
+
+        success = self.summary_codes.get('Success', -1)
+        if numpy is not None and self.names:
+            ages = now - numpy.frombuffer(
+                                self.reported,
+                                'i%d' % self.reported.itemsize)
+            summaries = numpy.frombuffer(self.summaries, numpy.uint8)
+            codes = numpy.where(ages >= critical, 2,
+                                numpy.where(ages >= warning, 1,
+                                            summaries != success))
+            return array('B', codes.astype(numpy.uint8).tostring())
+
+        codes = array('B', [0]) * len(self.names)
+        for row, reported_at in enumerate(self.reported):
+            age = now - reported_at
+            if age >= critical:
+                codes[row] = 2
+            elif age >= warning or self.summaries[row] != success:
+                codes[row] = 1
+        return codes
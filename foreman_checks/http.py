@@ -0,0 +1,405 @@
+#-*- coding: utf-8 -*-
+"""
+
+HTTP/1.1 client for the Foreman checks
+
+ - connections are kept open and reused per foreman host, a process
+   doing several requests (bulk mode, daemon) pays the TCP and TLS
+   handshakes once
+ - replies are revalidated with If-None-Match / If-Modified-Since,
+   a 304 means the copy we already hold is still good
+ - given a timing.Timings, the connection, the wait for foreman and the
+   transfer of the body are timed
+ - gzip and deflate replies are inflated chunk by chunk as they are
+   read, the compressed body is never held whole, and stream() yields
+   the inflated chunks to the parser
+
+Errors are raised as urllib2.HTTPError / urllib2.URLError so callers
+handle them the way they did with urllib2.urlopen().
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/http.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import socket
+import httplib
+import threading
+import time
+import zlib
+from urlparse import urlsplit, urljoin
+from urllib2 import HTTPError, URLError
+
+# Redirections followed before giving up, urllib2 used the same limit
+MAX_REDIRECTS = 10
+# Replies remembered in memory for revalidation, per process
+MAX_REPLIES = 256
+# Bytes read at once when streaming a reply
+CHUNK_SIZE = 65536
+# What we ask foreman to compress replies with
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def parse_validators(line):
+    """
+    Read validators back from the line written by format_validators()
+
+    >>> parse_validators(format_validators({'etag': '"abc"'}))
+    {'etag': '"abc"'}
+
+    >>> parse_validators('')
+    {}
+    """
+
+    etag, _, last_modified = line.partition('\t')
+    validators = {}
+    if etag:
+        validators['etag'] = etag
+    if last_modified:
+        validators['last_modified'] = last_modified
+    return validators
+
+
+def format_validators(validators):
+    """
+    Validators on a single line, to be stored in front of a cached reply
+
+    >>> format_validators({'etag': '"abc"',
+    ...                    'last_modified': 'Tue, 14 Feb 2012 09:21:52 GMT'})
+    '"abc"\\tTue, 14 Feb 2012 09:21:52 GMT'
+    """
+
+    return '%s\t%s' % (validators.get('etag', ''),
+                       validators.get('last_modified', ''))
+
+
+def conditional_headers(validators):
+    """
+    Headers asking foreman to skip the body if it did not change
+
+    >>> conditional_headers({'etag': '"abc"'})
+    {'If-None-Match': '"abc"'}
+    """
+
+    headers = {}
+    if 'etag' in validators:
+        headers['If-None-Match'] = validators['etag']
+    if 'last_modified' in validators:
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+class Inflater(object):
+    """
+    Incremental decoding of a gzip or deflate body, counting the bytes
+    read and the bytes they inflated to
+
+    >>> body = zlib.compress('{"summary": "Success"}' * 100)
+    >>> inflater = Inflater('deflate')
+    >>> text = ''.join([inflater.feed(body[start:start + 10])
+    ...                 for start in range(0, len(body), 10)])
+    >>> text + inflater.flush() == '{"summary": "Success"}' * 100
+    True
+    >>> inflater.wire, inflater.size
+    (49, 2200)
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            # the gzip header and trailer instead of zlib's
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self.decompressor = zlib.decompressobj()
+        self.wire = 0
+        self.size = 0
+
+    def feed(self, data):
+        """ Inflate the next bytes of the body """
+        try:
+            text = self.decompressor.decompress(data)
+        except zlib.error:
+            if self.wire or self.encoding == 'gzip':
+                raise
+            # some servers send a raw deflate stream, without zlib header
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            text = self.decompressor.decompress(data)
+        self.wire += len(data)
+        self.size += len(text)
+        return text
+
+    def flush(self):
+        """ Whatever is left once the body was read """
+        text = self.decompressor.flush()
+        self.size += len(text)
+        return text
+
+
+def inflater(response):
+    """
+    Inflater of the body of response, None when it is not compressed
+    """
+
+    encoding = (response.getheader('content-encoding') or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        return Inflater('gzip')
+    if encoding == 'deflate':
+        return Inflater('deflate')
+    return None
+
+
+def read_body(url, response, timings=None):
+    """
+    The whole body of response, inflated a chunk at a time if compressed
+    """
+
+    started = time.time()
+    decoder = inflater(response)
+    if decoder is None:
+        body = response.read()
+        wire = len(body)
+    else:
+        parts = []
+        while True:
+            data = response.read(CHUNK_SIZE)
+            if not data:
+                break
+            parts.append(decoder.feed(data))
+        parts.append(decoder.flush())
+        body = ''.join(parts)
+        wire = decoder.wire
+    if timings is not None:
+        timings.add('transfer', time.time() - started, wire)
+        if decoder is not None:
+            timings.inflated(url, wire, len(body))
+    return body
+
+
+class ConnectionPool(object):
+    """
+    Idle connections, per (scheme, host:port), safe to share between threads
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def checkout(self, scheme, netloc, timeout):
+        """
+        Return (connection, reused)
+        """
+
+        with self.lock:
+            connections = self.idle.get((scheme, netloc))
+            if connections:
+                connection = connections.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+        return self.connect(scheme, netloc, timeout), False
+
+    @staticmethod
+    def connect(scheme, netloc, timeout):
+        """ New connection, opened lazily by the first request """
+        if scheme == 'https':
+            return httplib.HTTPSConnection(netloc, timeout=timeout)
+        return httplib.HTTPConnection(netloc, timeout=timeout)
+
+    def checkin(self, scheme, netloc, connection):
+        """
+        Keep the connection for the next request, unless we have enough
+        """
+
+        with self.lock:
+            connections = self.idle.setdefault((scheme, netloc), [])
+            if len(connections) < self.max_idle:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def open(self, url, headers, timeout, timings=None):
+        """
+        GET url, return (connection, response) with the body still unread
+        """
+
+        scheme, netloc, path, query, _ = urlsplit(url)
+        if query:
+            path = '%s?%s' % (path, query)
+
+        connection, reused = self.checkout(scheme, netloc, timeout)
+        try:
+            response = exchange(connection, path or '/', headers, timings)
+        except (httplib.HTTPException, socket.error):
+            connection.close()
+            if not reused:
+                raise
+            # foreman (or a proxy in front) closed the idle connection
+            connection = self.connect(scheme, netloc, timeout)
+            response = exchange(connection, path or '/', headers, timings)
+        return connection, response
+
+    def release(self, url, connection, response):
+        """
+        Give back a connection whose response was read to the end
+        """
+
+        if response.will_close:
+            connection.close()
+        else:
+            scheme, netloc = urlsplit(url)[:2]
+            self.checkin(scheme, netloc, connection)
+
+    def request(self, url, headers, timeout, timings=None):
+        """
+        GET url, return the fully read httplib response and its body
+        """
+
+        connection, response = self.open(url, headers, timeout, timings)
+        body = read_body(url, response, timings)
+        self.release(url, connection, response)
+        return response, body
+
+
+def exchange(connection, path, headers, timings=None):
+    """
+    Send the request and read the status line and headers, timing the
+    connection when it is a new one and the wait for the reply
+    """
+
+    if connection.sock is None and timings is not None:
+        started = time.time()
+        connection.connect()
+        timings.add('connect', time.time() - started)
+
+    started = time.time()
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    if timings is not None:
+        timings.add('server', time.time() - started)
+    return response
+
+
+# One pool and one set of remembered replies per process
+POOL = ConnectionPool()
+REPLIES = {}
+REPLIES_LOCK = threading.Lock()
+
+
+def remember(key, validators, body):
+    """
+    Keep the reply for the next revalidation, forget everything when full
+    """
+
+    if not validators:
+        return
+    with REPLIES_LOCK:
+        if len(REPLIES) >= MAX_REPLIES:
+            REPLIES.clear()
+        REPLIES[key] = (validators, body)
+
+
+def get(url, headers, timeout, previous=None, timings=None):
+    """
+    GET url through the pool, return (body, validators)
+
+    previous is the (validators, body) of a copy we already hold,
+    for instance from the on-disk cache ; the copy remembered by this
+    process from an earlier request is used otherwise
+    """
+
+    key = (url, headers.get('Authorization'))
+    if previous is None:
+        previous = REPLIES.get(key)
+
+    request_headers = dict(headers)
+    if previous is not None:
+        request_headers.update(conditional_headers(previous[0]))
+
+    try:
+        for _ in range(MAX_REDIRECTS):
+            response, body = POOL.request(url, request_headers, timeout,
+                                          timings)
+            if response.status in (301, 302, 303, 307):
+                url = urljoin(url, response.getheader('location'))
+                continue
+            break
+    except (httplib.HTTPException, socket.error, zlib.error), err:
+        raise URLError(err)
+
+    if response.status == 304 and previous is not None:
+        return previous[1], previous[0]
+
+    if response.status >= 300:
+        raise HTTPError(url, response.status, response.reason,
+                        response.msg, None)
+
+    validators = {}
+    if response.getheader('etag'):
+        validators['etag'] = response.getheader('etag')
+    if response.getheader('last-modified'):
+        validators['last_modified'] = response.getheader('last-modified')
+    remember(key, validators, body)
+    return body, validators
+
+
+def stream(url, headers, timeout, timings=None, chunk_size=CHUNK_SIZE):
+    """
+    GET url through the pool, yield the body chunk by chunk
+
+    Nothing is remembered for revalidation, the point is to never hold
+    the whole reply. Stopping early closes the connection instead of
+    returning it to the pool. A compressed reply is inflated as it
+    arrives.
+    """
+
+    try:
+        for _ in range(MAX_REDIRECTS):
+            connection, response = POOL.open(url, headers, timeout, timings)
+            if response.status in (301, 302, 303, 307):
+                response.read()
+                POOL.release(url, connection, response)
+                url = urljoin(url, response.getheader('location'))
+                continue
+            break
+    except (httplib.HTTPException, socket.error), err:
+        raise URLError(err)
+
+    if response.status >= 300:
+        response.read()
+        POOL.release(url, connection, response)
+        raise HTTPError(url, response.status, response.reason,
+                        response.msg, None)
+
+    decoder = inflater(response)
+    complete = False
+    try:
+        while True:
+            started = time.time()
+            try:
+                chunk = text = response.read(chunk_size)
+                if decoder is not None:
+                    if chunk:
+                        text = decoder.feed(chunk)
+                    else:
+                        text = decoder.flush()
+            except (httplib.HTTPException, socket.error, zlib.error), err:
+                raise URLError(err)
+            if timings is not None:
+                timings.add('transfer', time.time() - started, len(chunk))
+            if text:
+                yield text
+            if not chunk:
+                break
+        complete = True
+    finally:
+        if timings is not None and decoder is not None:
+            timings.inflated(url, decoder.wire, decoder.size)
+        if complete:
+            POOL.release(url, connection, response)
+        else:
+            connection.close()
@@ -0,0 +1,336 @@
+#-*- coding: utf-8 -*-
+"""
+
+Contact foreman to check the global health
+of the puppet nodes.
+
+If not too many clients are out of sync or in error
+
+The hosts list is parsed as it arrives, page by page with --per-page,
+and reading stops as soon as the critical threshold is reached,
+memory use does not grow with the size of the fleet. Only the names of
+the hosts are kept, see projection.py.
+
+With --api 2, foreman runs the search of the mode itself and sends the
+number of hosts found along with no more names than the message shows,
+a few hundred bytes whatever the size of the fleet.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/nodes.py -v
+
+"""
+__author__ = 'Julien Rottenberg'
+__date__ = "September 2012"
+
+__version__ = "1.1"
+__credits__ = """Thanks to Foreman - http://theforeman.org/"""
+
+import sys
+
+from foreman_checks import core
+
+DESCRIPTION = """A Nagios plugin to check if the puppet nodes are
+globally healthy : not too many in errors, not too many out of sync."""
+
+# What the nodes check reads of a host
+NAME_FIELDS = {'host': {'name': None}, 'name': None}
+# Minutes without a report before a host is out of sync, foreman's
+# puppet_interval + outofsync_interval defaults
+OUT_OF_SYNC_MINUTES = 35
+# The searches foreman runs for its dashboard, per mode
+MODE_SEARCHES = {
+    'out_of_sync': 'last_report < "%(minutes)s minutes ago" '
+                   'and status.enabled = true',
+    'errors': 'last_report > "%(minutes)s minutes ago" '
+              'and (status.failed > 0 or status.failed_restarts > 0) '
+              'and status.enabled = true',
+    'active': 'last_report > "%(minutes)s minutes ago" '
+              'and (status.applied > 0 or status.restarted > 0) '
+              'and status.enabled = true'}
+
+
+def error_message(url, err):
+    """
+    What went wrong while talking to foreman
+    """
+
+    from urllib2 import HTTPError
+    if isinstance(err, HTTPError):
+        return 'is %s valid mode ? Check credentials' % url
+    return 'Error on %s Double check foreman server name' % url
+
+
+def iter_json_array(chunks, fields=None):
+    """
+    Yield the items of a JSON array as soon as they are complete,
+    whatever way the text is cut into chunks, only their fields if given
+
+    >>> list(iter_json_array(['[{"host": {"na', 'me": "a"}}, 1', '2 ]']))
+    [{u'host': {u'name': u'a'}}, 12]
+
+    >>> list(iter_json_array(['[{"host": {"id": 1, "name": "a"}}]'],
+    ...                      NAME_FIELDS))
+    [{'host': {'name': u'a'}}]
+
+    >>> list(iter_json_array([' [ ', ']']))
+    []
+    """
+
+    import re
+    from foreman_checks.projection import project
+
+    # whitespace allowed between JSON values
+    whitespace = re.compile(r'[ \t\n\r]*')
+    decoder = core.json_module().JSONDecoder()
+    started = False
+    buf = ''
+    for chunk in chunks:
+        buf = buf + chunk
+        pos = 0
+        while True:
+            pos = whitespace.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError('Expected a JSON array from foreman')
+                started = True
+                pos += 1
+            elif buf[pos] == ']':
+                return
+            elif buf[pos] == ',':
+                pos += 1
+            else:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    # incomplete item, wait for the next chunk
+                    break
+                if end == len(buf):
+                    # a number could still go on in the next chunk
+                    break
+                yield project(item, fields)
+                pos = end
+        buf = buf[pos:]
+
+
+def iter_hosts(params, session, fields=None):
+    """
+    Yield the hosts foreman has in that mode, one page after the other,
+    several foremen one after the other, only their fields if given
+    """
+
+    return iter_listing(params, session, 'hosts/%s/' % params['mode'],
+                        fields)
+
+
+def iter_listing(params, session, listing, fields=None):
+    """
+    Yield the items of a foreman listing such as hosts/, paged with
+    --per-page, several foremen one after the other, leaving out those
+    which fail
+
+    Without the on-disk cache the reply is streamed into the parser
+    """
+
+    import urllib
+    from urllib2 import URLError
+
+    for member in session.members():
+        page = 1
+        while True:
+            path = listing
+            if params['per_page']:
+                path = '%s?%s' % (path, urllib.urlencode({
+                                            'per_page': params['per_page'],
+                                            'page': page}))
+
+            count = 0
+            try:
+                if member.cache is None:
+                    items = iter_json_array(member.chunks(path), fields)
+                else:
+                    items = member.fetch(path, fields=fields)
+                    if not isinstance(items, list):
+                        raise ValueError('Expected a JSON array from foreman')
+                for item in items:
+                    count += 1
+                    yield item
+            except URLError, err:
+                # the other foremen are still walked
+                session.failed(member, member.url(path), err, error_message)
+                break
+            except ValueError, err:
+                session.failed(member, member.url(path),
+                               URLError('invalid reply : %s' % err),
+                               error_message)
+                break
+
+            # a foreman ignoring per_page sends everything on the first page
+            if count != params['per_page']:
+                break
+            page += 1
+
+
+def count_hosts(params, session):
+    """
+    (count, names) of the hosts in that mode, foreman running the search
+    and sending the count with the names of the first hosts only, thin
+    """
+
+    import urllib
+
+    query = urllib.urlencode({'search': MODE_SEARCHES[params['mode']] % {
+                                            'minutes': OUT_OF_SYNC_MINUTES},
+                              'thin': 'true',
+                              'per_page': max(params['warning'], 1)})
+    count, names = 0, []
+    for reply in session.gather('api/v2/hosts?%s' % query, error_message):
+        count += reply['subtotal']
+        names.extend([host['name'] for host in reply['results']])
+    return count, names
+
+
+def count_result(params, count, names):
+    """
+    Same as check_result() from the count foreman gives
+
+    >>> params = {'mode': 'errors', 'warning': 2, 'critical': 3}
+    >>> count_result(params, 1, ['a'])
+    ('OK', '1 servers have the status : errors - a (levels at 2/3)')
+
+    >>> count_result(params, 50, ['a', 'b'])
+    ('CRITICAL', '50 servers have the status : errors (levels at 2/3)')
+    """
+
+    msg = '%s servers have the status : %s' % (count, params['mode'])
+    if (count >= params['critical']):
+        status = 'CRITICAL'
+    elif (count >= params['warning']):
+        status = 'WARNING'
+    else:
+        msg = '%s -%s' % (msg, ''.join([' %s' % name for name in names]))
+        status = 'OK'
+
+    msg = '%s (levels at %s/%s)' % (msg, params['warning'], params['critical'])
+    return(status, msg)
+
+
+def check_result(params, server):
+    """
+    From the server response and input parameter
+    check if the puppet client report should trigger an alert
+
+    server can be any iterable, it is not read past the critical threshold
+
+    http://theforeman.org/projects/foreman/wiki/API
+
+    >>> params = {'mode': 'errors', 'warning': 2, 'critical': 3}
+    >>> check_result(params, [{'host': {'name': 'a'}}])
+    ('OK', '1 servers have the status : errors - a (levels at 2/3)')
+
+    >>> check_result(params, iter([{'host': {'name': 'a'}}] * 50))
+    ('CRITICAL', 'at least 3 servers have the status : errors (levels at 2/3)')
+    """
+
+    mode = params['mode']
+    servers = []
+    for item in server:
+        servers.append(item['host']['name'])
+        if (len(servers) >= params['critical']):
+            break
+
+    target = len(servers)
+    msg = '%s servers have the status : %s' % (target, mode)
+
+    if (target >= params['critical']):
+        msg = 'at least %s' % msg
+        status = 'CRITICAL'
+    elif (target >= params['warning']):
+        status = 'WARNING'
+    else:
+        msg = '%s -%s' % (msg, ''.join([' %s' % name for name in servers]))
+        status = 'OK'
+
+    msg = '%s (levels at %s/%s)' % (msg, params['warning'], params['critical'])
+    return(status, msg)
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    usage_string = """
+    usage: %prog [options] -H FOREMAN_HOST -m MODE -w WARNING -c CRITICAL
+
+    Warning and Critical are maximum number of hosts foreman has in that MODE
+
+    Ex :
+
+    check_puppet_nodes.py -H foreman.example.com -m out_of_sync -w 5 -c 10
+    will check if less than 5 nodes are out of sync, 10 for a critical
+
+    """
+    return usage_string
+
+
+def add_options(parser):
+    """
+    Options of the nodes check
+    """
+
+    parser.add_option('-H', '--hostname', type='string',
+                      help='Foreman hostname, or several separated by commas')
+
+    parser.add_option('-w', '--warning', type='int', default=5,
+                      help='Warning threshold in minutes')
+
+    parser.add_option('-c', '--critical', type='int', default=10,
+                      help='Critical threshold in minutes')
+
+    parser.add_option('-m', '--mode', type='choice',
+                      choices=['out_of_sync', 'errors', 'active'],
+                      help='Mode of check')
+
+    connection = parser.get_option_group('--prefix')
+    connection.add_option('--per-page', type='int',
+                          help='Walk the hosts list by pages of that size')
+    connection.add_option('--api', type='choice', choices=['1', '2'],
+                          default='1',
+                          help='Foreman API version, with 2 foreman counts '
+                               'the hosts and only sends a few names')
+
+
+def validate(options):
+    """
+    Fail quick if not enough parameters
+    """
+
+    if options.hostname is None:
+        print "Missing -H HOSTNAME"
+        print "We need the hostname of the Foreman server"
+        print usage()
+        sys.exit(2)
+
+    if options.mode is None:
+        print "\nMissing -m MODE"
+        print "\nWhat mode are you executing this check in ?"
+        print usage()
+        sys.exit(2)
+
+    options.foreman = options.hostname
+
+
+def run(params, session, verboseprint):
+    """
+    Count the hosts foreman has in that mode
+    """
+
+    if params['api'] == '2':
+        count, names = count_hosts(params, session)
+        status, message = count_result(params, count, names)
+    else:
+        status, message = check_result(params, iter_hosts(params, session,
+                                                          NAME_FIELDS))
+    return status, message, None
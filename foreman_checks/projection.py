@@ -0,0 +1,216 @@
+#-*- coding: utf-8 -*-
+"""
+
+Keep only the fields a check reads, while parsing a foreman reply
+
+The last report of a host carries every log line of the puppet run,
+hundreds of kilobytes for a big catalog, when the puppet check reads
+three fields of it. raw_decode() walks the JSON text and only builds
+the values named in a projection, the others are stepped over by a
+regexp and never become Python objects. A projection is a dict of the
+fields to keep, the value None keeping the whole field :
+
+    {'report': {'reported_at': None, 'metrics': {'time': {'total': None}}}}
+
+keeps report.reported_at and report.metrics.time.total, and applies to
+every item of a list.
+
+Stepping over a value in Python costs more than json.loads() building
+it in C, unless the value is big : replies smaller than SKIP_BYTES, and
+lists which hold many small items, are loaded whole then projected with
+project(), the other fields are dropped all the same.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/projection.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import re
+
+from foreman_checks import core
+
+STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+# Anything but a string or a bracket
+PLAIN = r'[^"\[\]{}]*'
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# A string, or a bracket out of the strings
+TOKEN = re.compile(r'%s|[\[\]{}]' % STRING)
+# A number, true, false or null
+SCALAR = re.compile(r'[^,:\[\]{}\s]+')
+# Below that many bytes, loads() lets json.loads() build the whole reply
+SKIP_BYTES = 256 * 1024
+# Depth of the containers stepped over in one regexp match, a log entry
+# of a report is 3 deep ; the regexp doubles in size with every level
+SHALLOW_DEPTH = 3
+SHALLOW = []
+
+
+def shallow():
+    """
+    The regexp matching a whole container at most SHALLOW_DEPTH deep,
+    compiled on first use, it takes a few milliseconds
+
+    >>> shallow().match('[{"a": [1, "]"]}, 2] tail').group()
+    '[{"a": [1, "]"]}, 2]'
+    >>> shallow().match('[[[[1]]]]') is None
+    True
+    """
+
+    if not SHALLOW:
+        inner = r'%s(?:%s%s)*' % (PLAIN, STRING, PLAIN)
+        for _ in range(SHALLOW_DEPTH - 1):
+            # every alternative starts with its own character, a
+            # mismatch is found without backtracking
+            inner = r'%s(?:(?:%s|\[%s\]|\{%s\})%s)*' % (PLAIN, STRING, inner,
+                                                        inner, PLAIN)
+        SHALLOW.append(re.compile(r'\[%s\]|\{%s\}' % (inner, inner)))
+    return SHALLOW[0]
+
+
+def skip(text, pos):
+    """
+    End of the JSON value starting at pos, without decoding it
+
+    >>> text = '{"logs": ["a ] \\\\" }", {"b": [1]}], "c": 2}'
+    >>> text[skip(text, text.index('[')):]
+    ', "c": 2}'
+    >>> text[skip(text, text.index('2')):]
+    '}'
+    """
+
+    char = text[pos]
+    if char not in '[{':
+        match = (char == '"' and TOKEN or SCALAR).match(text, pos)
+        if match is None:
+            raise ValueError('No JSON value at %d' % pos)
+        return match.end()
+
+    # bracket by bracket, containers shallow enough in one go
+    start, depth = pos, 0
+    while True:
+        match = TOKEN.search(text, pos)
+        if match is None:
+            raise ValueError('Unterminated JSON value at %d' % start)
+        char = text[match.start()]
+        pos = match.end()
+        if char in '[{':
+            whole = shallow().match(text, match.start())
+            if whole is None:
+                depth += 1
+                continue
+            pos = whole.end()
+        elif char in ']}':
+            depth -= 1
+        if not depth:
+            return pos
+
+
+def expect(text, pos, chars):
+    """
+    Position after the separator at pos, one of chars
+    """
+
+    if text[pos] not in chars:
+        raise ValueError('Expecting %s at %d' % (' or '.join(chars), pos))
+    return WHITESPACE.match(text, pos + 1).end()
+
+
+def decode(decoder, text, pos, fields):
+    """
+    (value, end) of the JSON value at pos, projected on fields
+    """
+
+    pos = WHITESPACE.match(text, pos).end()
+    if fields is None or text[pos] not in '[{':
+        return decoder.raw_decode(text, pos)
+
+    if text[pos] == '[':
+        items = []
+        pos = WHITESPACE.match(text, pos + 1).end()
+        while text[pos] != ']':
+            item, pos = decode(decoder, text, pos, fields)
+            items.append(item)
+            pos = WHITESPACE.match(text, pos).end()
+            if text[pos] != ']':
+                pos = expect(text, pos, ',')
+        return items, pos + 1
+
+    obj = {}
+    pos = WHITESPACE.match(text, pos + 1).end()
+    while text[pos] != '}':
+        if text[pos] != '"':
+            raise ValueError('Expecting a property name at %d' % pos)
+        key, pos = decoder.raw_decode(text, pos)
+        pos = expect(text, WHITESPACE.match(text, pos).end(), ':')
+        if key in fields:
+            obj[key], pos = decode(decoder, text, pos, fields[key])
+        else:
+            pos = skip(text, pos)
+        pos = WHITESPACE.match(text, pos).end()
+        if text[pos] != '}':
+            pos = expect(text, pos, ',')
+    return obj, pos + 1
+
+
+def raw_decode(text, pos=0, fields=None, decoder=None):
+    """
+    (value, end) of the JSON value at pos projected on fields, like
+    JSONDecoder.raw_decode() : ValueError when the text is cut short
+
+    >>> raw_decode('{"a": {"b": 1, "c": [2]}, "d": "x"} ', 0,
+    ...            {'a': {'b': None}})
+    ({u'a': {u'b': 1}}, 35)
+    >>> raw_decode('[{"a": 1, "b": 2}, {"b": 3}]', 0, {'a': None})[0]
+    [{u'a': 1}, {}]
+    >>> raw_decode('[{"a": 1, "b": [2', 0, {'a': None})
+    Traceback (most recent call last):
+    ...
+    ValueError: Unterminated JSON value at 15
+    """
+
+    if decoder is None:
+        decoder = core.json_module().JSONDecoder()
+    try:
+        return decode(decoder, text, pos, fields)
+    except IndexError:
+        raise ValueError('Unexpected end of JSON text at %d' % len(text))
+
+
+def project(value, fields):
+    """
+    value with only fields kept, the same as raw_decode() of its text
+
+    >>> project([{'a': 1, 'b': {'c': 2, 'd': 3}}, 4], {'b': {'c': None}})
+    [{'b': {'c': 2}}, 4]
+    """
+
+    if fields is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    if isinstance(value, dict):
+        return dict([(key, project(value[key], fields[key]))
+                     for key in fields if key in value])
+    return value
+
+
+def loads(text, fields=None):
+    """
+    Same as json.loads(), keeping only fields when given
+
+    >>> loads('{"report": {"summary": "Success", "logs": ["a", "b"]}}',
+    ...       {'report': {'summary': None}})
+    {'report': {'summary': u'Success'}}
+    """
+
+    start = WHITESPACE.match(text).end()
+    if fields is None or len(text) < SKIP_BYTES or \
+            text[start:start + 1] == '[':
+        return project(core.json_module().loads(text), fields)
+    value, end = raw_decode(text, 0, fields)
+    if WHITESPACE.match(text, end).end() != len(text):
+        raise ValueError('Extra data at %d' % end)
+    return value
@@ -0,0 +1,966 @@
+#-*- coding: utf-8 -*-
+"""
+
+Contact foreman to see when was the last puppet run for a given client.
+
+If the client reported within valid period,
+check also that puppet reported a success
+
+With --bulk, walk the latest reports of every host known to Foreman
+and emit one Nagios passive check result per host instead
+
+With --hosts-file or --hostgroup, check a list of hosts concurrently
+and emit passive check results the same way
+
+With --state-file, the last report of every host is remembered between
+runs and only the reports newer than the last one seen are fetched
+
+With --history, the run times of the last runs are remembered as well,
+to alert when puppet runs get slower
+
+With --daemon, stay in memory and answer check_puppet_client.py
+over a unix socket, saving the interpreter startup on every check
+
+With --receive, stay in memory and receive the reports foreman pushes,
+checks pointed at it get the last reports without asking foreman
+
+With --schedule, stay in memory and check the hosts of a file over and
+over, spread evenly over --interval, see scheduler.py
+
+Only the few fields of a report the checks read are parsed, the log
+lines are stepped over, see projection.py
+
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/puppet.py -v
+
+"""
+__author__ = 'Julien Rottenberg'
+__date__ = "February 2012"
+
+__version__ = "1.0"
+__credits__ = """Thanks to Foreman - http://theforeman.org/"""
+
+from datetime import timedelta, datetime
+from optparse import OptionGroup
+import sys
+
+from foreman_checks import core
+from foreman_checks.session import default_error_message
+
+DESCRIPTION = """A Nagios plugin to check if the last report
+for a puppet client was successful and not too long ago."""
+
+# What foreman appends to timestamps in UTC
+UTC_SUFFIXES = frozenset(['Z', '', ' UTC', '+00:00', '+0000', 'UTC'])
+
+# What the checks read of a report, bare or wrapped in 'report'
+REPORT = {'host_name': None, 'host': {'name': None}, 'reported_at': None,
+          'summary': None, 'metrics': {'time': {'total': None}}}
+REPORT_FIELDS = dict(REPORT, report=REPORT)
+# What the checks read of a host
+HOST_FIELDS = {'host': {'name': None}, 'name': None}
+# What bulk mode reads of the hosts listing
+LISTED = {'name': None, 'last_report': None, 'enabled': None}
+LISTED_FIELDS = dict(LISTED, host=LISTED)
+
+# Reports reach foreman a little after their reported_at, --state-file
+# asks again for the reports that much older than the watermark
+STATE_OVERLAP = timedelta(minutes=5)
+
+
+def seconds2human(my_time):
+    """
+    Convert given duration in seconds into human readable string
+
+    >>> seconds2human(60)
+    '0:01:00'
+
+    >>> seconds2human(300)
+    '0:05:00'
+
+    >>> seconds2human(3601)
+    '1:00:01'
+
+    >>> seconds2human(86401)
+    '1 day, 0:00:01'
+    """
+
+    time_delta = timedelta(seconds=my_time)
+    return str(time_delta)
+
+
+def check_result(params, server):
+    """
+    From the server response and input parameter
+    check if the puppet client report should trigger an alert
+
+    http://theforeman.org/projects/foreman/wiki/API
+    """
+
+    last_report_str = server['reported_at']
+    report_summary = server['summary']
+
+    try:
+        total_report_time = server['metrics']['time']['total']
+    # foreman seems to have issue with sum of time for some reports
+    except KeyError:
+        total_report_time = 'N/A'
+    last_report = parse_timestamp(last_report_str)
+
+    now = params['now']
+    now_since_last_report = now - last_report
+
+    msg = 'Last report was marked as %s %s ago - took %s seconds' % (
+                    report_summary,
+                    now_since_last_report,
+                    total_report_time)
+
+    if (now_since_last_report >= timedelta(minutes=params['critical'])):
+        status = 'CRITICAL'
+    elif (now_since_last_report >= timedelta(minutes=params['warning'])):
+        status = 'WARNING'
+    else:
+        if (report_summary != 'Success'):
+            status = 'WARNING'
+        else:
+            status = 'OK'
+
+    return(status, msg)
+
+
+def report_perfdata(params, server):
+    """
+    Age of the report and time the puppet run took, as Nagios perfdata
+
+    >>> report_perfdata({'now': datetime(2012, 2, 14, 9, 30),
+    ...                  'warning': 30, 'critical': 60},
+    ...                 {'reported_at': '2012-02-14T09:21:52Z',
+    ...                  'metrics': {'time': {'total': 12.5}}})
+    'age=488s;1800;3600;0 runtime=12.5s;;;0'
+    """
+
+    age = params['now'] - parse_timestamp(server['reported_at'])
+    perfdata = 'age=%ds;%d;%d;0' % (age.days * 86400 + age.seconds,
+                                    params['warning'] * 60,
+                                    params['critical'] * 60)
+    total = report_total(server)
+    if total is not None:
+        perfdata = '%s runtime=%ss;;;0' % (perfdata, total)
+    return perfdata
+
+
+def evaluate(params, hostname, server, state=None):
+    """
+    check_result() and report_perfdata() of the last report of hostname
+
+    With a state and --history, the run time joins the previous ones
+    of the host and their trend is checked too
+    """
+
+    status, message = check_result(params, server)
+    return add_trend(params, state, hostname,
+                     (parse_timestamp(server['reported_at']),
+                      report_total(server)),
+                     (status, message, report_perfdata(params, server)))
+
+
+def add_trend(params, state, hostname, run, result):
+    """
+    With a state and --history, the run (reported_at, total) joins the
+    previous runs of hostname and their trend is checked on top of result
+    """
+
+    status, message, perfdata = result
+    if state is None or not params['history']:
+        return result
+
+    from foreman_checks.history import check_trend
+
+    reported_at, total = run
+    samples = state.record_runtime(hostname, reported_at, total,
+                                   params['history'])
+    trend_status, trend_message, trend_perfdata = check_trend(params, samples)
+    if trend_message:
+        status = core.worst([status, trend_status])
+        message = '%s, %s' % (message, trend_message)
+        perfdata = '%s %s' % (perfdata, trend_perfdata)
+    return status, message, perfdata
+
+
+def evaluate_table(params, table, state=None):
+    """
+    evaluate() every host of a HostTable, the thresholds being checked
+    over the whole table at once
+
+    Yield (hostname, status, message, perfdata) by hostname
+
+    >>> from foreman_checks.hosttable import HostTable
+    >>> table = HostTable()
+    >>> table.add('server1', 1329211312, 'Success', 12.5)
+    True
+    >>> list(evaluate_table({'now': datetime(2012, 2, 14, 9, 30),
+    ...                      'warning': 30, 'critical': 60}, table))
+    [('server1', 'OK', 'Last report was marked as Success 0:08:08 ago - \
+took 12.5 seconds', 'age=488s;1800;3600;0 runtime=12.5s;;;0')]
+    """
+
+    from calendar import timegm
+    from foreman_checks.hosttable import STATUSES, NUMPY_ROWS, numpy_module
+
+    now = timegm(params['now'].timetuple())
+    warning, critical = params['warning'] * 60, params['critical'] * 60
+    codes = table.check(now, warning, critical,
+                        len(table) >= NUMPY_ROWS and numpy_module() or None)
+    levels = '%d;%d;0' % (warning, critical)
+    for row in table.order():
+        age = now - table.reported[row]
+        total = table.runtime(row)
+        message = 'Last report was marked as %s %s ago - took %s seconds' % (
+                        table.summary(row), timedelta(seconds=age),
+                        'N/A' if total is None else total)
+        perfdata = 'age=%ds;%s' % (age, levels)
+        if total is not None:
+            perfdata = '%s runtime=%ss;;;0' % (perfdata, total)
+
+        result = (STATUSES[codes[row]], message, perfdata)
+        if state is not None and params['history']:
+            result = add_trend(params, state, table.names[row],
+                               (datetime.utcfromtimestamp(
+                                    table.reported[row]), total),
+                               result)
+        yield (table.names[row],) + result
+
+
+def report_hostname(report):
+    """
+    Find out which host a report belongs to, foreman versions disagree
+
+    >>> report_hostname({'host_name': 'server1.example.com'})
+    'server1.example.com'
+
+    >>> report_hostname({'host': {'name': 'server2.example.com'}})
+    'server2.example.com'
+    """
+
+    if 'host_name' in report:
+        return report['host_name']
+    return report['host']['name']
+
+
+def report_total(report):
+    """
+    Time the puppet run took, None when foreman does not know
+
+    >>> report_total({'metrics': {'time': {'total': 12.5}}})
+    12.5
+    >>> report_total({'metrics': {}}) is None
+    True
+    """
+
+    try:
+        return report['metrics']['time']['total']
+    except KeyError:
+        return None
+
+
+def member_reports(params, member, search=None):
+    """
+    Walk the reports index of one foreman, newest first, one page at a
+    time ; search narrows the index down on the foreman side
+    Errors are raised as urllib2 HTTPError / URLError
+
+    Stop once a page is short or only holds reports older than the horizon
+    """
+
+    import urllib
+
+    horizon = params['now'] - timedelta(minutes=params['horizon'])
+    page = 1
+    while True:
+        query = {'per_page': params['per_page'], 'page': page}
+        if search:
+            query['search'] = search
+        reports = member.fetch('reports/?%s' % urllib.urlencode(query),
+                               remember=False, fields=REPORT_FIELDS)
+        oldest = None
+        for item in reports:
+            report = item.get('report', item)
+            oldest = report['reported_at']
+            yield report
+
+        if (len(reports) < params['per_page'] or
+                parse_timestamp(oldest) < horizon):
+            break
+        page += 1
+
+
+def iter_reports(params, session, search=None):
+    """
+    member_reports() of several foremen one after the other, those which
+    fail are left out
+    """
+
+    from urllib2 import URLError
+
+    for member in session.members():
+        try:
+            for report in member_reports(params, member, search):
+                yield report
+        except URLError, err:
+            session.failed(member, member.url('reports/'), err)
+
+
+def parse_timestamp(timestamp):
+    """
+    Foreman timestamps, as naive UTC datetimes to compare with params['now']
+
+    Fixed positions are sliced out instead of going through a regexp,
+    this runs once per report in bulk mode. Zulu time is the usual case,
+    offsets and fractions of seconds are handled as well.
+    No dateutil.parser on centos5 stock (python-dateutil.noarch)
+
+    >>> parse_timestamp('2012-02-14T09:21:52Z')
+    datetime.datetime(2012, 2, 14, 9, 21, 52)
+
+    >>> parse_timestamp('2012-02-14 09:21:52 UTC')
+    datetime.datetime(2012, 2, 14, 9, 21, 52)
+
+    >>> parse_timestamp('2012-02-14T10:21:52+01:00')
+    datetime.datetime(2012, 2, 14, 9, 21, 52)
+
+    >>> parse_timestamp('2012-02-14T06:51:52.250-0230')
+    datetime.datetime(2012, 2, 14, 9, 21, 52)
+    """
+
+    when = datetime(int(timestamp[0:4]), int(timestamp[5:7]),
+                    int(timestamp[8:10]), int(timestamp[11:13]),
+                    int(timestamp[14:16]), int(timestamp[17:19]))
+
+    zone = timestamp[19:]
+    if zone in UTC_SUFFIXES:
+        return when
+
+    # fractions of seconds do not matter for minutes thresholds
+    zone = zone.lstrip('.0123456789 ')
+    if zone in UTC_SUFFIXES:
+        return when
+
+    digits = zone[1:].replace(':', '')
+    offset = timedelta(hours=int(digits[0:2]), minutes=int(digits[2:4] or 0))
+    if zone[0] == '+':
+        return when - offset
+    if zone[0] == '-':
+        return when + offset
+    raise ValueError('Unknown timezone in %s' % timestamp)
+
+
+def passive_result(params, hostname, status, message, perfdata=None):
+    """
+    Format a check result as a Nagios external command
+
+    >>> passive_result({'now': datetime(2012, 2, 14), 'service': 'puppet'},
+    ...                'server1', 'OK', 'all good')
+    '[1329177600] PROCESS_SERVICE_CHECK_RESULT;server1;puppet;0;OK - all good'
+    """
+
+    from calendar import timegm
+
+    if perfdata:
+        message = '%s | %s' % (message, perfdata)
+    return core.passive_result(timegm(params['now'].timetuple()),
+                               hostname, params['service'], status, message)
+
+
+def open_state(params):
+    """
+    The --state-file, UNKNOWN if it cannot be used
+    """
+
+    import sqlite3
+    from foreman_checks.state import HostState
+
+    try:
+        return HostState(params['state_file'])
+    except sqlite3.Error, err:
+        print 'UNKNOWN - Could not open %s : %s' % (params['state_file'], err)
+        raise SystemExit, 3
+
+
+def store_report(state, hostname, report):
+    """
+    Remember the last report of hostname in the state
+    """
+
+    state.store(hostname, parse_timestamp(report['reported_at']),
+                report['summary'], report_total(report))
+
+
+def sync_state(params, session, state, scope, search=None):
+    """
+    Pull the reports newer than the watermark of scope into the state,
+    the first run starts from the horizon ; several foremen each have
+    their own watermark
+
+    Return the number of reports pulled
+    """
+
+    from urllib2 import URLError
+
+    count = 0
+    for member in session.members():
+        member_scope = scope
+        if member is not session:
+            member_scope = '%s %s' % (scope, member.base_url)
+
+        watermark = state.watermark(member_scope)
+        if watermark is None:
+            since = params['now'] - timedelta(minutes=params['horizon'])
+        else:
+            since = watermark - STATE_OVERLAP
+        terms = ['last_report > "%s"' % since.strftime(
+                                            '%Y-%m-%d %H:%M:%S UTC')]
+        if search:
+            terms.append(search)
+
+        newest = watermark or since
+        try:
+            for report in member_reports(params, member,
+                                         ' and '.join(terms)):
+                store_report(state, report_hostname(report), report)
+                newest = max(newest, parse_timestamp(report['reported_at']))
+                count += 1
+        except URLError, err:
+            # its watermark stays, the next run asks for the same reports
+            session.failed(member, member.url('reports/'), err)
+            continue
+
+        # a client clock ahead of ours must not hide the next reports
+        state.set_watermark(member_scope, min(newest, params['now']))
+    state.commit()
+    return count
+
+
+def listed_hosts(params, session):
+    """
+    last_report per hostname of the enabled hosts foreman lists, paged
+    with --per-page
+
+    None when that listing is incomplete : a source of reports without
+    hosts/ (404, such as receiver.py) or a foreman left out on an error
+    """
+
+    import urllib
+    from urllib2 import URLError
+
+    listed = {}
+    for member in session.members():
+        page = 1
+        while True:
+            path = 'hosts/'
+            if params['per_page']:
+                path = '%s?%s' % (path, urllib.urlencode({
+                                            'per_page': params['per_page'],
+                                            'page': page}))
+            try:
+                hosts = member.fetch(path, remember=False,
+                                     fields=LISTED_FIELDS)
+            except URLError, err:
+                if getattr(err, 'code', None) != 404:
+                    session.failed(member, member.url(path), err)
+                return None
+
+            for item in hosts:
+                host = item.get('host', item)
+                hostname = host['name']
+                if isinstance(hostname, unicode):
+                    hostname = hostname.encode('utf-8')
+                if host.get('enabled') is not False:
+                    listed[hostname] = host.get('last_report')
+
+            # a foreman ignoring per_page sends everything on the first page
+            if len(hosts) != params['per_page']:
+                break
+            page += 1
+    return listed
+
+
+def missing_result(params, hostname, last_report):
+    """
+    (hostname, status, message, perfdata) of a host without any report
+    within --horizon, CRITICAL as the check of that host alone would be
+
+    >>> params = {'now': datetime(2012, 2, 14, 9, 30), 'horizon': 120,
+    ...           'warning': 30, 'critical': 60}
+    >>> missing_result(params, 'server1', '2012-02-14T06:30:00Z')
+    ('server1', 'CRITICAL', 'No report in the last 120 minutes, the last \
+one 3:00:00 ago', 'age=10800s;1800;3600;0')
+    >>> missing_result(params, 'server2', None)[2:]
+    ('No report from this host', None)
+    """
+
+    if not last_report:
+        return hostname, 'CRITICAL', 'No report from this host', None
+    age = params['now'] - parse_timestamp(last_report)
+    return (hostname, 'CRITICAL',
+            'No report in the last %s minutes, the last one %s ago' % (
+                params['horizon'], age),
+            'age=%ds;%d;%d;0' % (age.days * 86400 + age.seconds,
+                                 params['warning'] * 60,
+                                 params['critical'] * 60))
+
+
+def check_bulk(params, session, verboseprint):
+    """
+    Evaluate the last report of every host like check_result() does,
+    the reports being kept in a HostTable ; the hosts foreman lists
+    without a report since --horizon are CRITICAL
+
+    Return the list of passive check results, one per host
+    """
+
+    from calendar import timegm
+    from foreman_checks.hosttable import HostTable
+
+    table = HostTable()
+    listed = listed_hosts(params, session)
+    if listed is None:
+        verboseprint("No hosts listing, hosts gone quiet are not looked for")
+    state = params['state_file'] and open_state(params) or None
+    try:
+        if state is not None:
+            verboseprint("New reports : %s" % sync_state(params, session,
+                                                         state, 'all'))
+            # hosts gone quiet are evaluated from their last report, the
+            # hosts foreman no longer lists are not
+            since = params['now'] - timedelta(minutes=params['horizon'])
+            if listed is not None:
+                since = datetime(1970, 1, 1)
+            for row in state.rows(since):
+                if listed is None or row[0].encode('utf-8') in listed:
+                    table.add(*row)
+        else:
+            for report in iter_reports(params, session):
+                # reports come newest first, the table keeps the newest
+                table.add(report_hostname(report),
+                          timegm(parse_timestamp(
+                              report['reported_at']).timetuple()),
+                          report['summary'], report_total(report))
+
+        verboseprint("Hosts found : %s" % len(table))
+
+        results = list(evaluate_table(params, table, state))
+        missing = [missing_result(params, hostname, last_report)
+                   for hostname, last_report in sorted((listed or {}).items())
+                   if hostname not in table.rows]
+        verboseprint("Hosts without a report : %s" % len(missing))
+
+        return [passive_result(params, *result)
+                for result in sorted(results + missing)]
+    finally:
+        if state is not None:
+            state.close()
+
+
+def read_hostnames(path):
+    """
+    One hostname per line, '-' reads them from stdin
+    Blank lines and lines starting with # are skipped
+    """
+
+    if path == '-':
+        lines = sys.stdin
+    else:
+        try:
+            lines = open(path)
+        except IOError, err:
+            print 'UNKNOWN - Could not read %s : %s' % (path, err)
+            raise SystemExit, 3
+
+    hostnames = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            hostnames.append(line)
+    return hostnames
+
+
+def iter_hostgroup(params, session):
+    """
+    Yield the name of every host in the hostgroup, one page at a time,
+    from every foreman answering
+    """
+
+    import urllib
+    from urllib2 import URLError
+
+    for member in session.members():
+        page = 1
+        while True:
+            search = 'hostgroup = "%s"' % params['hostgroup']
+            query = urllib.urlencode({'search': search,
+                                      'per_page': params['per_page'],
+                                      'page': page})
+            try:
+                hosts = member.fetch('hosts/?%s' % query, remember=False,
+                                     fields=HOST_FIELDS)
+            except URLError, err:
+                session.failed(member, member.url('hosts/?%s' % query), err)
+                break
+            for item in hosts:
+                yield item.get('host', item)['name']
+
+            # a foreman ignoring per_page sends everything on the first page
+            if len(hosts) != params['per_page']:
+                break
+            page += 1
+
+
+def fetch_report(session, hostname):
+    """
+    Fetch the last report of one host, return (hostname, report, error)
+    Errors are returned as (status, message), other hosts still get checked
+    """
+
+    from foreman_checks.retry import CircuitOpen
+    from urllib2 import URLError
+
+    path = 'hosts/%s/reports/last' % hostname
+    try:
+        foreman_out = session.fetch(path, remember=False,
+                                    fields=REPORT_FIELDS)
+    except CircuitOpen, err:
+        return hostname, None, ('UNKNOWN', str(err))
+    except URLError, err:
+        return (hostname, None,
+                ('CRITICAL', default_error_message(session.url(path), err)))
+    return hostname, foreman_out['report'], None
+
+
+def check_many(params, session, hostnames, verboseprint, state=None):
+    """
+    Check the hosts with at most --concurrency requests in flight
+    Hosts the state knows about are evaluated without any request
+
+    Return the list of passive check results, in the hostnames order
+    """
+
+    from multiprocessing.pool import ThreadPool
+
+    verboseprint("Hosts to check : %s" % len(hostnames))
+
+    known = {}
+    if state is not None:
+        for hostname in hostnames:
+            report = state.report(hostname)
+            if report is not None:
+                known[hostname] = report
+        verboseprint("Hosts known to the state : %s" % len(known))
+
+    errors = {}
+    unknown = [hostname for hostname in hostnames if hostname not in known]
+    if unknown:
+        pool = ThreadPool(min(params['concurrency'], len(unknown)))
+        try:
+            for hostname, report, error in pool.imap(
+                    lambda hostname: fetch_report(session, hostname),
+                    unknown):
+                if report is None:
+                    errors[hostname] = error
+                    continue
+                known[hostname] = report
+                # sqlite connections stay in the thread which opened them
+                if state is not None:
+                    store_report(state, hostname, report)
+        finally:
+            pool.close()
+
+    results = []
+    for hostname in hostnames:
+        if hostname in errors:
+            results.append(passive_result(params, hostname,
+                                          *errors[hostname]))
+        else:
+            results.append(passive_result(params, hostname, *evaluate(
+                                params, hostname, known[hostname], state)))
+    return results
+
+
+def check_list(params, session, verboseprint):
+    """
+    Check the hosts of --hosts-file or --hostgroup
+
+    With --state-file, the reports newer than the watermark are pulled
+    in one walk of the reports index, instead of one request per host
+    """
+
+    if params['hosts_file']:
+        hostnames = read_hostnames(params['hosts_file'])
+        scope, search = 'all', None
+    else:
+        hostnames = list(iter_hostgroup(params, session))
+        scope = 'hostgroup:%s' % params['hostgroup']
+        search = 'hostgroup = "%s"' % params['hostgroup']
+
+    if not params['state_file']:
+        return check_many(params, session, hostnames, verboseprint)
+
+    state = open_state(params)
+    try:
+        verboseprint("New reports : %s" % sync_state(params, session, state,
+                                                     scope, search))
+        return check_many(params, session, hostnames, verboseprint, state)
+    finally:
+        state.close()
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    usage_string = """
+    usage: %prog [options] -H SERVER -F FOREMAN_HOST -w WARNING -c CRITICAL
+
+    Make sure the last report seen by report for the given host is not too old
+    or exiting with an error
+
+    Warning and Critical are defined in minutes
+
+    Ex :
+
+    check_puppet.py -H server1.example.com -F foreman.example.com -w 60 -c 120
+    will check if the server1 has reported to foreman.example.com in the last hour
+
+    check_puppet.py --bulk -F foreman.example.com -w 60 -c 120 \\
+        --command-file /var/spool/nagios/cmd/nagios.cmd
+    will submit a passive check_puppet result for every host of foreman
+
+    check_puppet.py --hostgroup web -F foreman.example.com -w 60 -c 120
+    will print a passive check_puppet result for every host of web
+
+    check_puppet.py --schedule hosts.txt -F foreman.example.com -w 60 -c 120 \\
+        --interval 5 --command-file /var/spool/nagios/cmd/nagios.cmd
+    will check every host of hosts.txt every 5 minutes, one after the other
+
+    """
+    return usage_string
+
+
+def add_options(parser):
+    """
+    Options of the puppet check
+    """
+
+    parser.add_option('-H', '--hostname', type='string',
+                      help='Puppet client hostname')
+
+    parser.add_option('-w', '--warning', type='int', default=30,
+                      help='Warning threshold in minutes')
+
+    parser.add_option('-c', '--critical', type='int', default=60,
+                      help='Critical threshold in minutes')
+
+    parser.add_option('-F', '--foreman', type='string',
+                      help='foreman host to contact, or several separated '
+                           'by commas')
+
+    bulk = OptionGroup(parser, "Bulk Options",
+                       "Check every host in one run, results are passive "
+                       "checks")
+    bulk.add_option('--bulk', action='store_true', default=False,
+                    help='Check every host which reported to foreman')
+    bulk.add_option('--hosts-file', type='string',
+                    help='Check the hosts listed in a file, - for stdin')
+    bulk.add_option('--hostgroup', type='string',
+                    help='Check the hosts of that foreman hostgroup')
+    bulk.add_option('--concurrency', type='int', default=10,
+                    help='Hosts checked at the same time')
+    bulk.add_option('--per-page', type='int', default=100,
+                    help='Reports or hosts fetched per request')
+    bulk.add_option('--horizon', type='int',
+                    help='Ignore reports older than this, in minutes '
+                         '(default twice the critical threshold)')
+    bulk.add_option('--service', type='string', default='check_puppet',
+                    help='Nagios service description to submit to')
+    bulk.add_option('--command-file', type='string',
+                    help='Nagios external command file, stdout if unset')
+    bulk.add_option('--state-file', type='string',
+                    help='SQLite file remembering the last report of '
+                         'every host, only newer reports are fetched')
+    parser.add_option_group(bulk)
+
+    trend = OptionGroup(parser, "Trend Options",
+                        "Alert on puppet runs getting slower, needs "
+                        "--state-file")
+    trend.add_option('--history', type='int', default=0,
+                     help='Run times remembered per host, 0 to disable')
+    trend.add_option('--runtime-warning', type='float',
+                     help='Warning threshold for the p95 run time, '
+                          'in seconds')
+    trend.add_option('--runtime-critical', type='float',
+                     help='Critical threshold for the p95 run time, '
+                          'in seconds')
+    trend.add_option('--regression-warning', type='int',
+                     help='Warning threshold for the increase of the last '
+                          'run time over the median, in percent')
+    trend.add_option('--regression-critical', type='int',
+                     help='Critical threshold for the increase of the last '
+                          'run time over the median, in percent')
+    parser.add_option_group(trend)
+
+    daemon = OptionGroup(parser, "Daemon Options",
+                         "Serve checks to check_puppet_client.py over a "
+                         "socket, or receive the reports pushed by foreman")
+    daemon.add_option('--daemon', type='string', metavar='SOCKET',
+                      help='Listen on that unix socket')
+    daemon.add_option('--receive', type='string', metavar='[ADDRESS:]PORT',
+                      help='Receive foreman reports over HTTP, keep them '
+                           'in --state-file and serve them to the checks')
+    parser.add_option_group(daemon)
+
+    schedule = OptionGroup(parser, "Scheduler Options",
+                           "Check the hosts of a file forever at a steady "
+                           "pace, results are passive checks")
+    schedule.add_option('--schedule', type='string', metavar='FILE',
+                        help='Hosts to check, one per line, optionally '
+                             'followed by their own WARNING CRITICAL')
+    schedule.add_option('--interval', type='float', default=5,
+                        help='Minutes between two checks of a host')
+    schedule.add_option('--rate', type='float', default=10,
+                        help='Maximum foreman requests per second')
+    parser.add_option_group(schedule)
+
+
+def validate(options):
+    """
+    Fail quick if not enough parameters
+    """
+
+    if options.daemon:
+        return
+
+    if options.receive:
+        from foreman_checks.receiver import parse_address
+        try:
+            options.receive_address = parse_address(options.receive)
+        except ValueError:
+            print "\nInvalid --receive %s, expected [ADDRESS:]PORT" % (
+                        options.receive)
+            raise SystemExit, 2
+        if options.state_file == None:
+            print "\n--receive [ADDRESS:]PORT"
+            print "\nReceived reports are kept in --state-file, we need one"
+            print usage()
+            raise SystemExit, 2
+        return
+
+    if (options.hostname == None and not options.bulk and
+            not options.hosts_file and not options.hostgroup and
+            not options.schedule):
+        print "-H HOSTNAME"
+        print "We need the puppet client hostname to test against"
+        print usage()
+        raise SystemExit, 2
+
+    if (options.foreman == None):
+        print "\n-F FOREMAN_SERVER"
+        print "\nWe need to know which Foreman to query against"
+        print usage()
+        raise SystemExit, 2
+
+    if (options.horizon == None):
+        options.horizon = 2 * options.critical
+
+    from foreman_checks.history import MIN_SAMPLES
+    if (options.history < 0 or 0 < options.history < MIN_SAMPLES):
+        print "\n--history HISTORY"
+        print "\nThe number of run times remembered per host, 0 to " \
+              "disable or %s and more" % MIN_SAMPLES
+        print usage()
+        raise SystemExit, 3
+
+    if (options.history and options.state_file == None):
+        print "\n--history HISTORY"
+        print "\nRun times are remembered in --state-file, we need one"
+        print usage()
+        raise SystemExit, 2
+
+    if options.schedule:
+        from foreman_checks.scheduler import read_schedule
+        if options.interval <= 0 or options.rate <= 0:
+            print "\n--interval and --rate have to be positive"
+            raise SystemExit, 2
+        try:
+            options.schedule_hosts = read_schedule(options.schedule,
+                                                   options.warning,
+                                                   options.critical)
+        except (IOError, ValueError), err:
+            print "\nInvalid --schedule %s : %s" % (options.schedule, err)
+            raise SystemExit, 2
+
+
+def submit_bulk(params, session, results):
+    """
+    Send the passive results to the Nagios command file (or stdout),
+    at least WARNING when some foremen did not answer
+    """
+
+    core.submit_passive(params['command_file'], results)
+    if params['command_file'] is None:
+        raise SystemExit, 0
+    result = ('OK', '%s passive results submitted to %s' % (
+                        len(results), params['command_file']), None)
+    if session.unreachable:
+        from foreman_checks.federation import degrade
+        result = degrade(result, session.unreachable)
+    core.nagios_exit(*result)
+
+
+def run(params, session, verboseprint):
+    """
+    Check the last report of the host, or of many hosts in bulk modes
+    which submit their passive results and exit on their own
+    """
+
+    if params['daemon']:
+        from foreman_checks import daemon
+        daemon.serve(params['daemon'], params)
+
+    if params['receive']:
+        from foreman_checks import receiver
+        receiver.serve(params['receive_address'], params['state_file'],
+                       (params['username'], params['password']))
+
+    if params['schedule']:
+        from foreman_checks import scheduler
+        scheduler.serve(params, session, verboseprint)
+
+    # Get the current UTC time, no need to get the microseconds
+    # we use UTC time as foreman output utc time by default
+    params['now'] = datetime.utcnow().replace(microsecond=0)
+
+    if params['bulk']:
+        submit_bulk(params, session,
+                    check_bulk(params, session, verboseprint))
+
+    if params['hosts_file'] or params['hostgroup']:
+        submit_bulk(params, session,
+                    check_list(params, session, verboseprint))
+
+    foreman_out = session.get('hosts/%s/reports/last' % params['hostname'],
+                              fields=REPORT_FIELDS)
+
+    if params['verbose']:
+        verboseprint("Fields of the reply : \n%s" % core.json_module().dumps(
+                                                    foreman_out,
+                                                    sort_keys=True,
+                                                    indent=2))
+
+    state = params['state_file'] and open_state(params) or None
+    try:
+        return evaluate(params, params['hostname'], foreman_out['report'],
+                        state)
+    finally:
+        if state is not None:
+            state.close()
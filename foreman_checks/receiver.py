@@ -0,0 +1,332 @@
+#-*- coding: utf-8 -*-
+"""
+
+Let foreman push the reports instead of polling it
+
+check_puppet.py --receive [ADDRESS:]PORT --state-file FILE listens for
+the reports foreman posts as they arrive (a webhook, or a report
+processor posting the JSON of the report to any path) and keeps the
+last one of every host in memory and in the --state-file. It answers
+the requests of the checks the way foreman does :
+
+ - GET hosts/?per_page=..&page=..  every host a report was received
+                                   from, with its last_report
+ - GET hosts/<name>/reports/last   last report received from that host
+ - GET reports/?search=last_report > "..."&per_page=..&page=..
+                                   last report of every host, newest
+                                   first, for --bulk and --state-file
+
+so checks run with -F pointing at the receiver make no foreman request
+at all. A host which stops reporting keeps its last report, which only
+gets older : -w/-c catch it the way they do with foreman.
+
+With -u/-p, every request has to carry these credentials.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/receiver.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from calendar import timegm
+from datetime import datetime
+import re
+import time
+
+from foreman_checks import core, puppet
+
+# What the search of a reports listing may hold, nothing else is known here
+LAST_REPORT_TERM = re.compile(r'^\s*last_report\s*>\s*"([^"]+)"\s*$')
+# Seconds a client may take to send its request
+REQUEST_TIMEOUT = 10
+
+
+def parse_payload(payload):
+    """
+    (hostname, reported_at, summary, total) of a report posted by
+    foreman, bare or wrapped in config_report / report
+
+    Without a summary, a report with failed resources is a failure
+
+    >>> parse_payload({'config_report': {'host': 'server1',
+    ...     'reported_at': '2012-02-14 09:21:52 UTC',
+    ...     'status': {'applied': 2, 'failed': 1},
+    ...     'metrics': {'time': {'total': 12.5}}}})
+    ('server1', datetime.datetime(2012, 2, 14, 9, 21, 52), 'Failed', 12.5)
+    >>> parse_payload({'host': {'name': 'server2'}, 'summary': 'Success',
+    ...                'reported_at': '2012-02-14T09:21:52Z'})[::2]
+    ('server2', 'Success')
+    """
+
+    report = payload.get('config_report') or payload.get('report') or payload
+    host = report.get('host_name') or report['host']
+    if isinstance(host, dict):
+        host = host['name']
+
+    summary = report.get('summary')
+    if summary is None:
+        status = report.get('status') or {}
+        failed = status.get('failed', 0) + status.get('failed_restarts', 0)
+        summary = failed and 'Failed' or 'Success'
+
+    return (host, puppet.parse_timestamp(report['reported_at']), summary,
+            puppet.report_total(report))
+
+
+def parse_search(search):
+    """
+    Oldest reported_at wanted by the search of a reports listing, None
+    for all of them ; ValueError for a search the receiver cannot answer
+
+    >>> parse_search('last_report > "2012-02-14 09:21:52 UTC"')
+    datetime.datetime(2012, 2, 14, 9, 21, 52)
+    >>> parse_search('') is None
+    True
+    >>> parse_search('hostgroup = "web"')
+    Traceback (most recent call last):
+    ...
+    ValueError: Unsupported search term : hostgroup = "web"
+    """
+
+    since = None
+    for term in [term for term in search.split(' and ') if term.strip()]:
+        match = LAST_REPORT_TERM.match(term)
+        if match is None:
+            raise ValueError('Unsupported search term : %s' % term.strip())
+        when = puppet.parse_timestamp(match.group(1))
+        if since is None or when > since:
+            since = when
+    return since
+
+
+def format_report(hostname, reported_at, summary, total):
+    """
+    A report the way foreman lists it, reported_at in seconds since the
+    epoch
+
+    >>> format_report('server1', 1329211312, 'Success', 12.5)['reported_at']
+    '2012-02-14T09:21:52Z'
+    """
+
+    report = {'host_name': hostname,
+              'reported_at': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                           time.gmtime(reported_at)),
+              'summary': summary}
+    if total is not None:
+        report['metrics'] = {'time': {'total': total}}
+    return report
+
+
+class Receiver(object):
+    """
+    Last report of every host, in memory and in a HostState
+
+    >>> from foreman_checks.state import HostState
+    >>> receiver = Receiver(HostState(':memory:'))
+    >>> receiver.ingest({'host': 'server1', 'summary': 'Success',
+    ...                  'reported_at': '2012-02-14T09:21:52Z'})
+    'server1'
+    >>> receiver.ingest({'host': 'server2', 'summary': 'Failed',
+    ...                  'reported_at': '2012-02-14T09:25:00Z'})
+    'server2'
+    >>> receiver.last('server1')['report']['summary']
+    'Success'
+    >>> [report['host_name'] for report in receiver.listing(None, 10, 1)]
+    ['server2', 'server1']
+    >>> receiver.listing(datetime(2012, 2, 14, 9, 22), 10, 1)[0]['summary']
+    'Failed'
+    >>> receiver.host_listing(1, 2)
+    [{'last_report': '2012-02-14T09:25:00Z', 'name': 'server2'}]
+    """
+
+    def __init__(self, state):
+        self.state = state
+        # hostname -> (reported_at in seconds since the epoch, summary, total)
+        self.hosts = {}
+        for hostname, reported_at, summary, total in state.rows(
+                                                        datetime(1970, 1, 1)):
+            self.hosts[hostname] = (reported_at, summary, total)
+        self.newest_first = None
+        self.by_name = None
+
+    def ingest(self, payload):
+        """
+        Remember a report posted by foreman, unless a newer one is known
+        Return the hostname
+        """
+
+        hostname, reported_at, summary, total = parse_payload(payload)
+        epoch = timegm(reported_at.timetuple())
+        if hostname not in self.hosts:
+            self.by_name = None
+        if epoch >= self.hosts.get(hostname, (0,))[0]:
+            self.hosts[hostname] = (epoch, summary, total)
+            self.newest_first = None
+        self.state.store(hostname, reported_at, summary, total)
+        self.state.commit()
+        return hostname
+
+    def last(self, hostname):
+        """
+        The hosts/<name>/reports/last reply, None for an unknown host
+        """
+
+        if hostname not in self.hosts:
+            return None
+        return {'report': format_report(hostname, *self.hosts[hostname])}
+
+    def listing(self, since, per_page, page):
+        """
+        One page of the last reports newer than since, newest first
+        """
+
+        if self.newest_first is None:
+            self.newest_first = sorted(self.hosts.items(),
+                                       key=lambda item: -item[1][0])
+        oldest = since and timegm(since.timetuple()) or 0
+
+        reports = []
+        for hostname, row in self.newest_first[(page - 1) * per_page:]:
+            if row[0] <= oldest or len(reports) == per_page:
+                break
+            reports.append(format_report(hostname, *row))
+        return reports
+
+    def host_listing(self, per_page, page):
+        """
+        One page of the hosts/ reply, by hostname
+        """
+
+        if self.by_name is None:
+            self.by_name = sorted(self.hosts)
+
+        hosts = []
+        for hostname in self.by_name[(page - 1) * per_page:page * per_page]:
+            report = format_report(hostname, *self.hosts[hostname])
+            hosts.append({'name': hostname,
+                          'last_report': report['reported_at']})
+        return hosts
+
+
+def parse_address(value):
+    """
+    (address, port) of --receive [ADDRESS:]PORT, every address by default
+
+    >>> parse_address('8140'), parse_address('127.0.0.1:8140')
+    (('', 8140), ('127.0.0.1', 8140))
+    """
+
+    address, _, port = value.rpartition(':')
+    return address, int(port)
+
+
+def serve(address, state_path, credentials=None):
+    """
+    Receive reports and answer the checks at (address, port) until
+    interrupted ; credentials is the (username, password) every request
+    must carry, if any
+    """
+
+    import BaseHTTPServer
+    import socket
+    import urlparse
+    from foreman_checks.state import HostState
+
+    json = core.json_module()
+    receiver = Receiver(HostState(state_path))
+    expected = None
+    if credentials and all(credentials):
+        import base64
+        expected = 'Basic %s' % base64.b64encode('%s:%s' % credentials)
+
+    class ReceiverHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+        """
+        One request per connection, replies in JSON
+        """
+
+        timeout = REQUEST_TIMEOUT
+
+        def reply(self, code, data):
+            """ Send data as the JSON body of the reply """
+            body = json.dumps(data)
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def authorized(self):
+            """ Whether the request carries the credentials, 401 if not """
+            if expected is None or \
+                    self.headers.getheader('Authorization') == expected:
+                return True
+            self.reply(401, {'error': 'Unauthorized'})
+            return False
+
+        def do_POST(self):
+            """ A report pushed by foreman """
+            if not self.authorized():
+                return
+            length = int(self.headers.getheader('Content-Length') or 0)
+            try:
+                hostname = receiver.ingest(json.loads(self.rfile.read(length)))
+            except (ValueError, KeyError, TypeError, AttributeError), err:
+                self.reply(422, {'error': 'Invalid report : %s' % err})
+                return
+            self.reply(201, {'host_name': hostname})
+
+        def do_GET(self):
+            """ A check asking for reports """
+            if not self.authorized():
+                return
+            url = urlparse.urlsplit(self.path)
+            parts = [part for part in url.path.split('/') if part]
+            query = dict(urlparse.parse_qsl(url.query))
+
+            if len(parts) == 4 and parts[0] == 'hosts' and \
+                    parts[2:] == ['reports', 'last']:
+                last = receiver.last(parts[1])
+                if last is None:
+                    self.reply(404, {'error': 'No report from %s' % parts[1]})
+                else:
+                    self.reply(200, last)
+            elif parts == ['hosts']:
+                try:
+                    per_page = int(query.get('per_page', 20))
+                    page = int(query.get('page', 1))
+                except ValueError, err:
+                    self.reply(422, {'error': str(err)})
+                    return
+                self.reply(200, receiver.host_listing(per_page, page))
+            elif parts == ['reports']:
+                try:
+                    since = parse_search(query.get('search', ''))
+                    per_page = int(query.get('per_page', 20))
+                    page = int(query.get('page', 1))
+                except ValueError, err:
+                    self.reply(422, {'error': str(err)})
+                    return
+                self.reply(200, receiver.listing(since, per_page, page))
+            else:
+                self.reply(404, {'error': 'Not found'})
+
+        def log_message(self, *args):
+            """ Quiet, this runs under a service manager """
+            pass
+
+    try:
+        server = BaseHTTPServer.HTTPServer(address, ReceiverHandler)
+    except socket.error, err:
+        receiver.state.close()
+        print 'UNKNOWN - Could not listen on %s:%s : %s' % (
+                    address[0] or '*', address[1], err)
+        raise SystemExit(3)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.state.close()
+    raise SystemExit(0)
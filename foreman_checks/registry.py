@@ -0,0 +1,71 @@
+#-*- coding: utf-8 -*-
+"""
+
+Subcommands of check_foreman and the modules implementing them
+
+A check module provides :
+
+ - DESCRIPTION and __version__
+ - usage()                         usage text
+ - add_options(parser)             its own options and option groups
+ - validate(options)               print and raise SystemExit(2) when
+                                   mandatory options are missing,
+                                   set options.foreman to the host(s) to ask
+ - run(params, session, verboseprint)
+                                   return (status, message, perfdata),
+                                   perfdata may be None
+
+Modules are imported when their subcommand is used only.
+Another package can add its own checks with register().
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/registry.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+CHECKS = {'puppet': 'foreman_checks.puppet',
+          'nodes': 'foreman_checks.nodes',
+          'dashboard': 'foreman_checks.dashboard',
+          'fleet': 'foreman_checks.fleet',
+          'herd': 'foreman_checks.herd',
+          'groups': 'foreman_checks.groups',
+          'resources': 'foreman_checks.resources'}
+
+
+def register(name, module_name):
+    """
+    Make module_name available as the name subcommand
+
+    >>> register('example', 'example_checks.example')
+    >>> 'example' in names()
+    True
+    >>> del CHECKS['example']
+    """
+
+    CHECKS[name] = module_name
+
+
+def names():
+    """
+    Known subcommands, sorted
+
+    >>> names()
+    ['dashboard', 'fleet', 'groups', 'herd', 'nodes', 'puppet', 'resources']
+    """
+
+    return sorted(CHECKS)
+
+
+def load(name):
+    """
+    Import and return the module of a subcommand, KeyError if unknown
+    """
+
+    module_name = CHECKS[name]
+    module = __import__(module_name)
+    for part in module_name.split('.')[1:]:
+        module = getattr(module, part)
+    return module
@@ -0,0 +1,218 @@
+#-*- coding: utf-8 -*-
+"""
+
+Contact foreman to see where the last puppet run of a client spent its time.
+
+The last report holds metrics.time per resource type (file, package,
+exec, service...) and per phase (config_retrieval, which is the catalog
+compilation on the master, fact_generation...). They are ranked, the
+slowest ones are named in the message, all of them go to perfdata, and
+any of them over its threshold raises an alert.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/resources.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from optparse import OptionGroup
+
+from foreman_checks import core
+
+DESCRIPTION = """A Nagios plugin to check which resource types and
+phases the last puppet run of a client spent its time on."""
+
+
+def rank_times(times):
+    """
+    (name, seconds) of every resource type and phase, slowest first,
+    total left out
+
+    >>> rank_times({'file': 1.5, 'total': 9.5, 'config_retrieval': 8})
+    [('config_retrieval', 8.0), ('file', 1.5)]
+    """
+
+    ranked = [(name, float(seconds)) for name, seconds in times.items()
+              if name != 'total' and seconds is not None]
+    ranked.sort(key=lambda item: (-item[1], item[0]))
+    return ranked
+
+
+def parse_type_thresholds(values):
+    """
+    --type-threshold TYPE=WARNING,CRITICAL, as a dict
+
+    >>> sorted(parse_type_thresholds(['config_retrieval=30,60',
+    ...                               'exec=10,20']).items())
+    [('config_retrieval', (30.0, 60.0)), ('exec', (10.0, 20.0))]
+    """
+
+    thresholds = {}
+    for value in values or []:
+        name, levels = value.split('=', 1)
+        warning, critical = levels.split(',')
+        thresholds[name.strip()] = (float(warning), float(critical))
+    return thresholds
+
+
+def fmt(threshold):
+    """
+    A threshold without a useless .0
+
+    >>> fmt(30.0), fmt(2.5)
+    ('30', '2.5')
+    """
+
+    return '%g' % threshold
+
+
+def check_result(params, server):
+    """
+    Rank the times of the report, alert on the ones over their threshold
+
+    >>> params = {'warning': 10, 'critical': 20, 'top': 2,
+    ...           'thresholds': {'config_retrieval': (5, 8)}}
+    >>> status, msg, perfdata = check_result(params, {'metrics': {'time': {
+    ...     'config_retrieval': 6.0, 'file': 2.0, 'exec': 1.0,
+    ...     'total': 9.0}}})
+    >>> status
+    'WARNING'
+    >>> msg
+    'config_retrieval took 6.0s (levels at 5/8) - run took 9.0s, \
+slowest config_retrieval 6.0s, file 2.0s'
+    >>> perfdata
+    'config_retrieval=6.0s;5;8;0 file=2.0s;10;20;0 exec=1.0s;10;20;0 \
+total=9.0s;;;0'
+    """
+
+    times = server.get('metrics', {}).get('time', {})
+    ranked = rank_times(times)
+    if not ranked:
+        return 'UNKNOWN', 'No time metrics in the last report', None
+
+    alerts = []
+    statuses = []
+    perfdata = []
+    for name, seconds in ranked:
+        warning, critical = params['thresholds'].get(name, (
+                                params['warning'], params['critical']))
+        if seconds >= critical:
+            status = 'CRITICAL'
+        elif seconds >= warning:
+            status = 'WARNING'
+        else:
+            status = 'OK'
+        if status != 'OK':
+            alerts.append('%s took %.1fs (levels at %s/%s)' % (
+                            name, seconds, fmt(warning), fmt(critical)))
+        statuses.append(status)
+        perfdata.append('%s=%.1fs;%s;%s;0' % (name, seconds, fmt(warning),
+                                              fmt(critical)))
+
+    total = times.get('total')
+    if total is None:
+        total = sum([seconds for _, seconds in ranked])
+    perfdata.append('total=%.1fs;;;0' % total)
+
+    msg = 'run took %.1fs, slowest %s' % (total, ', '.join(
+                ['%s %.1fs' % item for item in ranked[:params['top']]]))
+    if alerts:
+        msg = '%s - %s' % (', '.join(alerts), msg)
+    return core.worst(statuses), msg, ' '.join(perfdata)
+
+
+def usage():
+    """
+    Return usage text so it can be used on failed human interactions
+    """
+
+    usage_string = """
+    usage: %prog [options] -H SERVER -F FOREMAN_HOST -w WARNING -c CRITICAL
+
+    Rank the time the last puppet run of SERVER spent per resource type and
+    phase, alert when one of them took longer than its threshold
+
+    Warning and Critical are defined in seconds, for any single resource
+    type or phase, --type-threshold sets other ones for a given type
+
+    Ex :
+
+    check_foreman.py resources -H server1.example.com -F foreman.example.com \\
+        -w 60 -c 120 --type-threshold config_retrieval=20,40
+    will alert when server1 waited more than 20s for its catalog, or spent
+    more than a minute on any resource type
+
+    """
+    return usage_string
+
+
+def add_options(parser):
+    """
+    Options of the resources check
+    """
+
+    parser.add_option('-H', '--hostname', type='string',
+                      help='Puppet client hostname')
+
+    parser.add_option('-w', '--warning', type='float', default=60,
+                      help='Warning threshold in seconds, per type')
+
+    parser.add_option('-c', '--critical', type='float', default=120,
+                      help='Critical threshold in seconds, per type')
+
+    parser.add_option('-F', '--foreman', type='string',
+                      help='foreman host to contact, or several separated '
+                           'by commas')
+
+    resources = OptionGroup(parser, "Resources Options",
+                            "Thresholds and ranking of the resource types")
+    resources.add_option('--type-threshold', action='append',
+                         metavar='TYPE=WARNING,CRITICAL',
+                         help='Thresholds of one resource type or phase, '
+                              'may be given several times')
+    resources.add_option('--top', type='int', default=5,
+                         help='Slowest types named in the message')
+    parser.add_option_group(resources)
+
+
+def validate(options):
+    """
+    Fail quick if not enough parameters
+    """
+
+    if options.hostname is None:
+        print "Missing -H HOSTNAME"
+        print "We need the puppet client hostname to test against"
+        print usage()
+        raise SystemExit(2)
+
+    if options.foreman is None:
+        print "\nMissing -F FOREMAN_SERVER"
+        print "\nWe need to know which Foreman to query against"
+        print usage()
+        raise SystemExit(2)
+
+    try:
+        options.thresholds = parse_type_thresholds(options.type_threshold)
+    except ValueError:
+        print "\nInvalid --type-threshold, expected TYPE=WARNING,CRITICAL"
+        print usage()
+        raise SystemExit(2)
+
+
+def run(params, session, verboseprint):
+    """
+    Rank the times of the last report of the host
+    """
+
+    foreman_out = session.get('hosts/%s/reports/last' % params['hostname'])
+
+    if params['verbose']:
+        verboseprint("Time metrics : \n%s" % core.json_module().dumps(
+                        foreman_out['report'].get('metrics', {}).get('time'),
+                        sort_keys=True,
+                        indent=2))
+
+    return check_result(params, foreman_out['report'])
@@ -0,0 +1,244 @@
+#-*- coding: utf-8 -*-
+"""
+
+Staying polite with a foreman which is overloaded or down
+
+ - failed requests are retried after a jittered exponential backoff,
+   within a total deadline, so checks failing together do not all
+   come back together
+ - the latency of every url is tracked (smoothed round trip time and
+   its variation, as TCP does) and the timeout of a retry is derived
+   from it, bounded by -t ; the first attempt always gets -t
+ - a circuit breaker shared on disk by every check of a poller opens
+   after a few consecutive failures : while foreman is known to be
+   down, checks answer UNKNOWN at once without touching the network,
+   one of them probes foreman again once the cooldown is over
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/retry.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import os
+import threading
+import time
+from urllib2 import URLError
+
+# Backoff before the first retry and longest one, in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+# Shortest timeout derived from the latency, in seconds
+MIN_TIMEOUT = 1.0
+# Urls whose latency is remembered, per process
+MAX_TRACKED = 1024
+
+# url -> (smoothed round trip time, round trip time variation)
+LATENCIES = {}
+LATENCIES_LOCK = threading.Lock()
+
+
+class CircuitOpen(URLError):
+    """
+    Foreman is known to be down, it was not asked
+    """
+
+    def __str__(self):
+        return self.reason
+
+
+def backoff(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """
+    Seconds to wait before retry number attempt, "full jitter" :
+    anything between 0 and the exponential backoff
+
+    >>> import random
+    >>> random.seed(1)
+    >>> [round(backoff(attempt), 2) for attempt in (1, 2, 3, 6)]
+    [0.07, 0.85, 1.53, 2.04]
+    >>> max([backoff(10) for _ in range(100)]) <= BACKOFF_CAP
+    True
+    """
+
+    import random
+
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def smooth(estimate, sample):
+    """
+    New (srtt, rttvar) once a round trip time is measured, RFC 6298
+
+    >>> smooth(None, 0.2)
+    (0.2, 0.1)
+    >>> smooth((0.2, 0.1), 0.6)
+    (0.25, 0.175)
+    """
+
+    if estimate is None:
+        return sample, sample / 2
+    srtt, rttvar = estimate
+    rttvar = 0.75 * rttvar + 0.25 * abs(srtt - sample)
+    srtt = 0.875 * srtt + 0.125 * sample
+    return srtt, rttvar
+
+
+def timeout_from(estimate, default):
+    """
+    Timeout to use given a latency estimate, never more than default
+
+    >>> timeout_from((0.25, 0.175), 10)
+    1.0
+    >>> timeout_from((2.0, 0.5), 10)
+    4.0
+    >>> timeout_from(None, 10)
+    10
+    """
+
+    if estimate is None:
+        return default
+    srtt, rttvar = estimate
+    return min(max(srtt + 4 * rttvar, MIN_TIMEOUT), default)
+
+
+def observe(url, seconds):
+    """
+    Remember how long a request to url took
+    """
+
+    with LATENCIES_LOCK:
+        if url not in LATENCIES and len(LATENCIES) >= MAX_TRACKED:
+            LATENCIES.clear()
+        LATENCIES[url] = smooth(LATENCIES.get(url), seconds)
+
+
+class CircuitBreaker(object):
+    """
+    Consecutive failures and latency of one foreman, in a file shared
+    by every check of the poller ; without directory, nothing is shared
+    and the circuit never opens
+
+    >>> import shutil, tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> breaker = CircuitBreaker(directory, 'foreman:443', threshold=2)
+    >>> breaker.failure()
+    >>> breaker.check()
+    >>> breaker.failure()
+    >>> breaker.check()
+    Traceback (most recent call last):
+    ...
+    CircuitOpen: Foreman foreman:443 failed 2 times in a row, not asked \
+again for 60 seconds
+    >>> breaker.success(0.2)
+    >>> breaker.check()
+    >>> shutil.rmtree(directory)
+    """
+
+    def __init__(self, directory, name, threshold=5, cooldown=60):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        # this process probes foreman, the cooldown being over
+        self.probing = False
+        self.path = None
+        if directory:
+            import hashlib
+
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0700)
+            self.path = os.path.join(directory, '%s.breaker' %
+                                     hashlib.sha1(name).hexdigest())
+
+    def load(self):
+        """ What the checks know about that foreman """
+        try:
+            handle = open(self.path)
+            try:
+                failures, open_until, srtt, rttvar = handle.read().split()
+            finally:
+                handle.close()
+        except (IOError, ValueError):
+            return 0, 0.0, None
+        estimate = None
+        if float(srtt) > 0:
+            estimate = (float(srtt), float(rttvar))
+        return int(failures), float(open_until), estimate
+
+    def save(self, failures, open_until, estimate):
+        """ Write the file, renamed so readers never see half of it """
+        import tempfile
+
+        srtt, rttvar = estimate or (0, 0)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        os.write(handle, '%d %.3f %.6f %.6f\n' % (failures, open_until,
+                                                  srtt, rttvar))
+        os.close(handle)
+        os.rename(temporary, self.path)
+
+    def check(self):
+        """
+        Raise CircuitOpen while foreman is known to be down
+
+        Once the cooldown is over, the first check to come along probes
+        foreman, the others keep answering UNKNOWN for another cooldown
+        """
+
+        if self.path is None or self.probing:
+            return
+        with self.lock:
+            failures, open_until, estimate = self.load()
+            if failures < self.threshold:
+                return
+            now = time.time()
+            if open_until > now:
+                raise CircuitOpen('Foreman %s failed %s times in a row, '
+                                  'not asked again for %d seconds' % (
+                                        self.name, failures,
+                                        open_until - now + 0.5))
+            self.save(failures, now + self.cooldown, estimate)
+            self.probing = True
+
+    def success(self, seconds=None):
+        """
+        Foreman answered, in seconds if the latency is to be counted
+        """
+
+        if self.path is None:
+            return
+        self.probing = False
+        with self.lock:
+            failures, _, estimate = self.load()
+            if seconds is not None:
+                estimate = smooth(estimate, seconds)
+            elif not failures:
+                return
+            self.save(0, 0, estimate)
+
+    def failure(self):
+        """
+        A request failed even after its retries
+        """
+
+        if self.path is None:
+            return
+        self.probing = False
+        with self.lock:
+            failures, open_until, estimate = self.load()
+            failures += 1
+            if failures >= self.threshold:
+                open_until = time.time() + self.cooldown
+            self.save(failures, open_until, estimate)
+
+    def estimate(self, url):
+        """
+        Latency estimate of url, or of that foreman when url is new
+        """
+
+        if url in LATENCIES:
+            return LATENCIES[url]
+        if self.path is None:
+            return None
+        return self.load()[2]
@@ -0,0 +1,291 @@
+#-*- coding: utf-8 -*-
+"""
+
+Check a list of hosts forever, at a steady pace
+
+check_puppet.py --schedule FILE runs its own scheduler instead of having
+Nagios fire every check_puppet service at once after a reload : every
+host of FILE gets its last report fetched once per --interval, the
+fetches being spread evenly over the interval, and its passive result
+written to --command-file as soon as it is known.
+
+FILE lists one host per line, optionally followed by its own warning
+and critical thresholds in minutes, -w / -c otherwise :
+
+    # hostname              warning critical
+    web1.example.com
+    db1.example.com         60      120
+
+It is read again when it changes. On top of the spreading, a token
+bucket keeps foreman requests under --rate per second, a scheduler
+behind schedule (slow foreman, hosts added) catches up at that rate
+and no faster, at most --concurrency requests are in flight.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/scheduler.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from datetime import datetime
+import os
+import sys
+import time
+
+from foreman_checks import core, puppet
+
+# Seconds to wait for a fetch when every thread is busy, before going on
+BUSY_WAIT = 600
+
+
+def parse_schedule(lines, warning, critical):
+    """
+    (hostname, warning, critical) of every host, warning and critical
+    being the thresholds of the hosts without their own
+    Blank lines and lines starting with # are skipped
+
+    >>> parse_schedule(['# hosts', 'web1', '', 'db1  60 120'], 30, 60)
+    [('web1', 30, 60), ('db1', 60, 120)]
+    >>> parse_schedule(['db1 60'], 30, 60)
+    Traceback (most recent call last):
+    ...
+    ValueError: line 1 : expected HOSTNAME [WARNING CRITICAL]
+    """
+
+    hosts = []
+    for number, line in enumerate(lines):
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        if len(fields) == 1:
+            hosts.append((fields[0], warning, critical))
+        elif len(fields) == 3 and fields[1].isdigit() and \
+                fields[2].isdigit():
+            hosts.append((fields[0], int(fields[1]), int(fields[2])))
+        else:
+            raise ValueError('line %d : expected HOSTNAME [WARNING CRITICAL]'
+                             % (number + 1))
+    return hosts
+
+
+def read_schedule(path, warning, critical):
+    """
+    parse_schedule() of the file at path
+    IOError / ValueError when it cannot be read
+    """
+
+    handle = open(path)
+    try:
+        hosts = parse_schedule(handle, warning, critical)
+    finally:
+        handle.close()
+    if not hosts:
+        raise ValueError('no host to check')
+    return hosts
+
+
+class TokenBucket(object):
+    """
+    At most rate requests per second in the long run, burst at once
+
+    >>> clock = [0.0]
+    >>> bucket = TokenBucket(2, 2, lambda: clock[0])
+    >>> [bucket.reserve() for _ in range(4)]
+    [0.0, 0.0, 0.5, 1.0]
+    >>> clock[0] = 10.0
+    >>> bucket.reserve()
+    0.0
+    """
+
+    def __init__(self, rate, burst, clock=time.time):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.clock = clock
+        self.stamp = clock()
+
+    def reserve(self):
+        """
+        Take a token, return the seconds to wait before using it
+        """
+
+        now = self.clock()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class Scheduler(object):
+    """
+    The hosts to check and when, the results to write
+
+    Fetches run in a pool of threads, the evaluation and the writes
+    happen in the thread of run(), which owns the state
+    """
+
+    def __init__(self, params, session, verboseprint):
+        import Queue
+
+        self.params = params
+        self.session = session
+        self.verboseprint = verboseprint
+        self.use(params['schedule_hosts'])
+        self.modified = os.stat(params['schedule']).st_mtime
+        self.bucket = TokenBucket(params['rate'], max(params['rate'], 1))
+        self.done = Queue.Queue()
+        self.in_flight = 0
+        self.pending = []
+        self.state = params['state_file'] and puppet.open_state(params) or None
+
+    def use(self, hosts):
+        """ Check these (hostname, warning, critical) from now on """
+        self.hosts = hosts
+        self.thresholds = dict([(hostname, (warning, critical))
+                                for hostname, warning, critical in hosts])
+
+    def reload(self):
+        """
+        Read the schedule again if it changed, keep the current one if
+        the new one is broken
+        """
+
+        path = self.params['schedule']
+        try:
+            modified = os.stat(path).st_mtime
+            if modified == self.modified:
+                return
+            self.modified = modified
+            hosts = read_schedule(path, self.params['warning'],
+                                  self.params['critical'])
+        except (IOError, OSError, ValueError), err:
+            print >> sys.stderr, 'Keeping the schedule, %s : %s' % (path, err)
+            return
+        self.use(hosts)
+        self.verboseprint("Schedule reloaded : %s hosts" % len(hosts))
+
+    def fetch(self, hostname):
+        """
+        Fetch the last report of hostname, in a pool thread ; whatever
+        happens, a result is queued
+        """
+
+        result = (hostname, None, ('UNKNOWN', 'No result'))
+        try:
+            result = puppet.fetch_report(self.session, hostname)
+        # pylint: disable-msg=W0703
+        except Exception, err:
+            result = (hostname, None, ('UNKNOWN', '%s: %s' % (
+                                        err.__class__.__name__, err)))
+        finally:
+            self.done.put(result)
+
+    def collect(self, until):
+        """
+        Evaluate the reports fetched until the time until, or until a
+        fetch completes when every thread is busy
+        """
+
+        import Queue
+
+        while True:
+            busy = self.in_flight >= self.params['concurrency']
+            timeout = until - time.time()
+            if timeout <= 0 and not busy:
+                break
+            try:
+                # with a timeout, a blocked get() lets ^C through
+                result = self.done.get(True, busy and BUSY_WAIT or timeout)
+            except Queue.Empty:
+                break
+            self.in_flight -= 1
+            self.record(*result)
+        self.flush()
+
+    def record(self, hostname, report, error):
+        """
+        Turn a fetched report into a passive result, with the thresholds
+        of the host
+        """
+
+        warning, critical = self.thresholds.get(hostname, (
+                                self.params['warning'],
+                                self.params['critical']))
+        params = dict(self.params, warning=warning, critical=critical,
+                      now=datetime.utcnow().replace(microsecond=0))
+        result = error
+        if report is not None:
+            try:
+                if self.state is not None:
+                    puppet.store_report(self.state, hostname, report)
+                result = puppet.evaluate(params, hostname, report,
+                                         self.state)
+            except (KeyError, TypeError, ValueError), err:
+                result = ('UNKNOWN', 'Invalid report : %s' % err)
+        self.pending.append(puppet.passive_result(params, hostname, *result))
+
+    def flush(self):
+        """
+        Write the pending results, keep them for the next time when the
+        command file cannot be written
+        """
+
+        if not self.pending:
+            return
+        try:
+            core.write_passive(self.params['command_file'], self.pending)
+        except IOError, err:
+            print >> sys.stderr, 'Could not write to %s : %s' % (
+                                    self.params['command_file'], err)
+            # a few cycles worth at most
+            del self.pending[:-4 * len(self.hosts)]
+            return
+        if self.state is not None:
+            self.state.commit()
+        self.pending = []
+
+    def run(self):
+        """
+        Check every host once per interval, forever
+        """
+
+        from multiprocessing.pool import ThreadPool
+
+        interval = self.params['interval'] * 60.0
+        pool = ThreadPool(self.params['concurrency'])
+        cycle = time.time()
+        try:
+            while True:
+                spacing = interval / len(self.hosts)
+                for index, (hostname, _, _) in enumerate(self.hosts):
+                    self.collect(cycle + index * spacing)
+                    self.collect(time.time() + self.bucket.reserve())
+                    self.in_flight += 1
+                    pool.apply_async(self.fetch, (hostname,))
+                self.collect(cycle + interval)
+                self.verboseprint("Cycle of %s hosts done in %.1fs" % (
+                                    len(self.hosts), time.time() - cycle))
+                # behind schedule, the next cycle starts now
+                cycle = max(cycle + interval, time.time())
+                self.reload()
+        finally:
+            pool.terminate()
+            if self.state is not None:
+                self.state.close()
+
+
+def serve(params, session, verboseprint):
+    """
+    Run the scheduler until interrupted
+    """
+
+    try:
+        Scheduler(params, session, verboseprint).run()
+    except KeyboardInterrupt:
+        pass
+    raise SystemExit(0)
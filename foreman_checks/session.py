@@ -0,0 +1,355 @@
+#-*- coding: utf-8 -*-
+"""
+
+Connection to one Foreman, shared by every check of a run
+
+The session knows the base url, the credentials, the timeout and the
+on-disk cache, and keeps the parsed replies it fetched : two checks of
+the same run asking for the same url cost one request and one
+json.loads(). The daemon additionally keeps replies across runs for
+Session.memory_ttl seconds. Failed requests are retried and a circuit
+breaker stops asking a foreman which is down, see retry.py. The time
+spent connecting, waiting, reading and parsing is counted in
+Session.timings, see timing.py.
+
+connect() gives a Federation instead when several foremen are given,
+see federation.py.
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import time
+
+from foreman_checks import core
+
+
+def split_foremen(params):
+    """
+    Params of every foreman of a comma separated list, each one may
+    have its own :port
+
+    >>> [(params['foreman'], params['port']) for params in split_foremen(
+    ...     {'foreman': 'dc1.example.com, dc2.example.com:8443', 'port': 80})]
+    [('dc1.example.com', 80), ('dc2.example.com', 8443)]
+    """
+
+    foremen = []
+    for name in (params['foreman'] or '').split(','):
+        name, _, port = name.strip().partition(':')
+        if name:
+            foremen.append(dict(params, foreman=name,
+                                port=port and int(port) or params['port']))
+    return foremen
+
+
+def connect(params):
+    """
+    Session to the foreman of params, a Federation of sessions when
+    it is a comma separated list of foremen
+    """
+
+    foremen = split_foremen(params)
+    if len(foremen) < 2:
+        # no foreman at all for the daemon, which runs checks later
+        return Session(foremen and foremen[0] or params)
+
+    from foreman_checks.federation import Federation
+    return Federation([Session(foreman) for foreman in foremen])
+
+
+def default_error_message(url, err):
+    """
+    What went wrong while talking to foreman
+    """
+
+    from urllib2 import HTTPError
+    if isinstance(err, HTTPError):
+        return 'Check %s does that node ever reported?' % url
+    return 'Error on %s Double check foreman name' % url
+
+
+class Session(object):
+    """
+    Settings and replies of one foreman for the current run
+    """
+
+    # Replies kept across runs by the daemon, key is (url, username, password)
+    memory = {}
+    memory_ttl = 0
+    # Foremen which did not answer, only a Federation has some
+    unreachable = ()
+
+    def __init__(self, params):
+        from foreman_checks.timing import Timings
+
+        self.base_url = core.base_url(params)
+        self.timings = Timings()
+        self.username = params['username']
+        self.password = params['password']
+        self.timeout = params['timeout']
+        self.retries = params.get('retries') or 0
+        self.deadline = params.get('deadline') or \
+            self.timeout * (self.retries + 1)
+        self.replies = {}
+        self.rtt = None
+        self.breaker = None
+        if params.get('breaker_dir'):
+            from foreman_checks.retry import CircuitBreaker
+            self.breaker = CircuitBreaker(params['breaker_dir'],
+                                          self.base_url,
+                                          params['breaker_threshold'],
+                                          params['breaker_cooldown'])
+        self.cache = None
+        if params.get('cache_dir'):
+            from foreman_checks.cache import ResponseCache
+            self.cache = ResponseCache(params['cache_dir'],
+                                       params['cache_ttl'],
+                                       params['cache_stale'],
+                                       params['cache_size'])
+
+    @staticmethod
+    def key(params):
+        """
+        Checks whose params give the same key can share a session
+        """
+
+        return tuple([params.get(name) for name in (
+                        'foreman', 'port', 'ssl', 'prefix', 'username',
+                        'password', 'timeout', 'cache_dir', 'retries',
+                        'deadline', 'breaker_dir')])
+
+    def headers(self):
+        """
+        Headers sent with every request to foreman
+        """
+
+        from foreman_checks.http import ACCEPT_ENCODING
+
+        headers = {'Content-Type': 'application/json',
+                   'Accept': 'application/json',
+                   'Accept-Encoding': ACCEPT_ENCODING}
+
+        if (self.username and self.password):
+            import base64
+            b64string = base64.b64encode('%s:%s' % (self.username,
+                                                    self.password))
+            headers["Authorization"] = "Basic %s" % b64string
+        return headers
+
+    def url(self, path):
+        """
+        Full url of a path relative to the foreman root
+        """
+
+        return '%s%s' % (self.base_url, path)
+
+    def members(self):
+        """
+        Sessions of the foremen to walk for a listing, this one alone
+        """
+
+        return [self]
+
+    def measured(self):
+        """
+        Timings of the requests made so far
+        """
+
+        return self.timings
+
+    def latency(self):
+        """
+        Smoothed round trip time to this foreman in seconds, None until
+        a request went through
+        """
+
+        if self.rtt is None and self.breaker is not None:
+            estimate = self.breaker.load()[2]
+            if estimate is not None:
+                return estimate[0]
+        return self.rtt and self.rtt[0]
+
+    def available(self):
+        """
+        False while the circuit breaker of this foreman is open
+        """
+
+        from foreman_checks.retry import CircuitOpen
+
+        try:
+            if self.breaker is not None:
+                self.breaker.check()
+        except CircuitOpen:
+            return False
+        return True
+
+    def request(self, url, headers, previous=None):
+        """
+        http.get() with retries within the deadline, timeouts of the
+        retries adapted to the latency of url, and the circuit breaker
+        Errors are raised as urllib2 HTTPError / URLError, CircuitOpen
+        without any request when foreman is known to be down
+        """
+
+        from foreman_checks import http, retry
+        from urllib2 import HTTPError, URLError
+
+        breaker = self.breaker or retry.CircuitBreaker(None, self.base_url)
+        breaker.check()
+        deadline = time.time() + self.deadline
+        attempt = 0
+        while True:
+            # the first attempt gets -t, a slow foreman is not a failing
+            # one ; a retry gets what the latency of url calls for, each
+            # one twice as long, the last one what is left
+            timeout = self.timeout
+            if attempt:
+                timeout = min(retry.timeout_from(breaker.estimate(url),
+                                                 self.timeout) *
+                              2 ** (attempt - 1), self.timeout)
+            timeout = min(timeout,
+                          max(deadline - time.time(), retry.MIN_TIMEOUT))
+            started = time.time()
+            try:
+                reply = http.get(url, headers, timeout, previous,
+                                 self.timings)
+            except HTTPError, err:
+                if err.code < 500:
+                    # foreman is fine, the url is not
+                    breaker.success()
+                    raise
+                error = err
+            except URLError, err:
+                error = err
+            else:
+                elapsed = time.time() - started
+                retry.observe(url, elapsed)
+                self.rtt = retry.smooth(self.rtt, elapsed)
+                breaker.success(elapsed)
+                return reply
+
+            attempt += 1
+            pause = retry.backoff(attempt)
+            if attempt > self.retries or time.time() + pause >= deadline:
+                breaker.failure()
+                raise error
+            time.sleep(pause)
+
+    def fetch(self, path, remember=True, fields=None):
+        """
+        Fetch data using the api, through the on-disk cache if any
+        Errors are raised as urllib2 HTTPError / URLError
+
+        Replies are kept for the rest of the run unless remember is False,
+        do so when fetching many different urls once each
+        Only fields are parsed out of the reply when given, see
+        projection.py
+        """
+
+        url = self.url(path)
+        key = (url, self.username, self.password)
+        # the whole reply serves any projection of it
+        for kept in (key, fields and key + (repr(fields),)):
+            if kept in self.replies:
+                return self.replies[kept]
+            if Session.memory_ttl and kept:
+                fetched_at, out = Session.memory.get(kept, (0, None))
+                if time.time() - fetched_at < Session.memory_ttl:
+                    return out
+
+        headers = self.headers()
+        if self.cache is None:
+            raw_out = self.request(url, headers)[0]
+        else:
+            raw_out = self.cache.fetch(key,
+                                       lambda previous: self.request(
+                                           url, headers, previous))
+        started = time.time()
+        if fields is None:
+            out = core.json_module().loads(raw_out)
+        else:
+            from foreman_checks import projection
+            out = projection.loads(raw_out, fields)
+            key = key + (repr(fields),)
+        self.timings.add('parse', time.time() - started)
+
+        if remember:
+            self.replies[key] = out
+        if Session.memory_ttl:
+            Session.memory[key] = (time.time(), out)
+        return out
+
+    def get(self, path, error_message=default_error_message, remember=True,
+            fields=None):
+        """
+        Same as fetch(), errors are reported as CRITICAL and end the run,
+        UNKNOWN when foreman was not even asked
+        """
+
+        from urllib2 import URLError
+        try:
+            return self.fetch(path, remember, fields)
+        except URLError, err:
+            # HTTPError and CircuitOpen are subclasses of URLError
+            self.failed(self, self.url(path), err, error_message)
+
+    def failed(self, member, url, err, error_message=default_error_message):
+        """
+        A request of member, one of members(), failed : the run ends as
+        CRITICAL, UNKNOWN when foreman was not even asked
+        """
+
+        from foreman_checks.retry import CircuitOpen
+        if isinstance(err, CircuitOpen):
+            print 'UNKNOWN - %s' % err
+            raise SystemExit(3)
+        print 'CRITICAL - %s' % error_message(url, err)
+        raise SystemExit(2)
+
+    def gather(self, path, error_message=default_error_message):
+        """
+        Replies of every foreman to path, get() of this one alone
+        """
+
+        return [self.get(path, error_message)]
+
+    def chunks(self, path):
+        """
+        Yield the body of a reply chunk by chunk, without holding it
+        Errors are raised as urllib2 HTTPError / URLError, CircuitOpen
+        when foreman is known to be down ; they are not retried, part of
+        the reply may already be used
+        """
+
+        from foreman_checks import http
+        from foreman_checks.retry import CircuitBreaker
+        from urllib2 import HTTPError, URLError
+
+        breaker = self.breaker or CircuitBreaker(None, self.base_url)
+        breaker.check()
+        chunks = http.stream(self.url(path), self.headers(), self.timeout,
+                             self.timings)
+        try:
+            for chunk in chunks:
+                yield chunk
+        except URLError, err:
+            if not isinstance(err, HTTPError) or err.code >= 500:
+                breaker.failure()
+            raise
+        finally:
+            chunks.close()
+        breaker.success()
+
+    def stream(self, path, error_message=default_error_message):
+        """
+        Same as chunks(), errors are reported as CRITICAL and end the run
+        """
+
+        from urllib2 import URLError
+        try:
+            for chunk in self.chunks(path):
+                yield chunk
+        except URLError, err:
+            self.failed(self, self.url(path), err, error_message)
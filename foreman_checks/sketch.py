@@ -0,0 +1,109 @@
+#-*- coding: utf-8 -*-
+"""
+
+Quantiles and histograms of a stream of values, in bounded memory
+
+QuantileSketch puts each value in a logarithmic bucket, bucket i holding
+the values in (gamma^(i-1), gamma^i]. Any quantile it returns is within
+the relative accuracy of the true one, its memory depends on the range
+of the values and not on their number, and sketches built separately
+(one per foreman, one per page...) merge by adding their counts.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/sketch.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from bisect import bisect_left
+import math
+
+# Smaller values are counted as zero, log() does not go there
+MIN_VALUE = 1e-9
+
+
+class QuantileSketch(object):
+    """
+    Mergeable quantile sketch with logarithmic buckets
+
+    >>> sketch = QuantileSketch(0.01)
+    >>> for value in range(1, 1001):
+    ...     sketch.add(value)
+    >>> [abs(sketch.quantile(q) - exact) / exact < 0.01
+    ...  for q, exact in ((0.5, 500), (0.95, 950), (0.99, 990))]
+    [True, True, True]
+
+    >>> other = QuantileSketch(0.01)
+    >>> other.add(5000, count=1000)
+    >>> sketch.merge(other)
+    >>> sketch.count, abs(sketch.quantile(0.75) - 5000) / 5000 < 0.01
+    (2000, True)
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        """ Count value, count times """
+        if value <= MIN_VALUE:
+            self.zeros += count
+        else:
+            index = int(math.ceil(math.log(value) / self.log_gamma))
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other):
+        """ Add the values counted by another sketch of the same accuracy """
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches of different accuracy')
+        for index, count in other.buckets.iteritems():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def quantile(self, fraction):
+        """ Value under which fraction of the values are, None if empty """
+        if not self.count:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+        # middle of the bucket, in relative terms
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+
+class Histogram(object):
+    """
+    Number of values in each bucket delimited by edges
+
+    >>> histogram = Histogram([10, 60])
+    >>> for value in (1, 10, 11, 59, 300):
+    ...     histogram.add(value)
+    >>> histogram.buckets()
+    [('le_10', 2), ('le_60', 2), ('gt_60', 1)]
+    """
+
+    def __init__(self, edges):
+        self.edges = sorted(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+
+    def add(self, value):
+        """ Count value in its bucket """
+        self.counts[bisect_left(self.edges, value)] += 1
+
+    def buckets(self):
+        """ (label, count) of every bucket, lowest first """
+        labels = ['le_%g' % edge for edge in self.edges]
+        labels.append('gt_%g' % self.edges[-1])
+        return zip(labels, self.counts)
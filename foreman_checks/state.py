@@ -0,0 +1,207 @@
+#-*- coding: utf-8 -*-
+"""
+
+Last report of every host, remembered between runs
+
+A small SQLite file keyed by hostname holds the reported_at, summary
+and metrics.time.total of the newest report seen for each host, and
+one high-water mark per scope (all hosts, a hostgroup...) : the newest
+reported_at pulled from foreman for that scope. The next run only asks
+foreman for the reports newer than the mark, the other hosts are
+evaluated from here.
+
+With --history, the run times of the last runs of every host are kept
+as well, see history.py.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/state.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+from datetime import datetime
+
+# How timestamps are stored, naive UTC, sorts like the dates it holds
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    hostname TEXT PRIMARY KEY,
+    reported_at TEXT NOT NULL,
+    summary TEXT,
+    total
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    scope TEXT PRIMARY KEY,
+    reported_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runtimes (
+    hostname TEXT PRIMARY KEY,
+    reported_at TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    samples BLOB NOT NULL
+);
+"""
+
+
+class HostState(object):
+    """
+    Hosts, high-water marks and run times stored in the SQLite file at path
+
+    >>> state = HostState(':memory:')
+    >>> state.store('server1', datetime(2012, 2, 14, 9, 21, 52), 'Success',
+    ...             12.5)
+    >>> state.store('server1', datetime(2012, 2, 14, 8, 0, 0), 'Error', 3)
+    >>> report = state.report('server1')
+    >>> report['reported_at'], report['summary']
+    (u'2012-02-14 09:21:52', u'Success')
+    >>> report['metrics']
+    {'time': {'total': 12.5}}
+    >>> state.report('server2') is None
+    True
+    >>> state.set_watermark('all', datetime(2012, 2, 14, 9, 21, 52))
+    >>> state.watermark('all')
+    datetime.datetime(2012, 2, 14, 9, 21, 52)
+    >>> state.watermark('hostgroup:web') is None
+    True
+    """
+
+    def __init__(self, path):
+        import sqlite3
+
+        # several checks may share the file, wait for each other
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.executescript(SCHEMA)
+
+    def store(self, hostname, reported_at, summary, total=None):
+        """
+        Remember a report of hostname, unless a newer one is known
+        """
+
+        when = reported_at.strftime(TIMESTAMP_FORMAT)
+        self.db.execute('INSERT OR REPLACE INTO hosts '
+                        '(hostname, reported_at, summary, total) '
+                        'SELECT ?, ?, ?, ? WHERE NOT EXISTS ('
+                        'SELECT 1 FROM hosts '
+                        'WHERE hostname = ? AND reported_at > ?)',
+                        (hostname, when, summary, total, hostname, when))
+
+    @staticmethod
+    def as_report(row):
+        """
+        A hosts row shaped like the report foreman would send
+        """
+
+        hostname, reported_at, summary, total = row
+        report = {'host_name': hostname,
+                  'reported_at': reported_at,
+                  'summary': summary}
+        if total is not None:
+            report['metrics'] = {'time': {'total': total}}
+        return report
+
+    def report(self, hostname):
+        """
+        Last known report of hostname, None if never seen
+        """
+
+        row = self.db.execute('SELECT hostname, reported_at, summary, total '
+                              'FROM hosts WHERE hostname = ?',
+                              (hostname,)).fetchone()
+        return row and self.as_report(row) or None
+
+    def rows(self, since):
+        """
+        (hostname, reported_at in seconds since the epoch, summary, total)
+        of every host which reported after since, rows of a HostTable
+
+        >>> state = HostState(':memory:')
+        >>> state.store('server1', datetime(2012, 2, 14, 9, 21, 52), 'Success',
+        ...             12.5)
+        >>> list(state.rows(datetime(2012, 2, 14)))
+        [(u'server1', 1329211312, u'Success', 12.5)]
+        """
+
+        return self.db.execute("SELECT hostname, "
+                               "CAST(strftime('%s', reported_at) AS INTEGER), "
+                               "summary, total FROM hosts "
+                               "WHERE reported_at >= ?",
+                               (since.strftime(TIMESTAMP_FORMAT),))
+
+    def watermark(self, scope):
+        """
+        Newest reported_at pulled for that scope, None on the first run
+        """
+
+        row = self.db.execute('SELECT reported_at FROM watermarks '
+                              'WHERE scope = ?', (scope,)).fetchone()
+        if row is None:
+            return None
+        return datetime.strptime(row[0], TIMESTAMP_FORMAT)
+
+    def set_watermark(self, scope, reported_at):
+        """
+        Move the high-water mark of that scope
+        """
+
+        self.db.execute('INSERT OR REPLACE INTO watermarks '
+                        '(scope, reported_at) VALUES (?, ?)',
+                        (scope, reported_at.strftime(TIMESTAMP_FORMAT)))
+
+    def record_runtime(self, hostname, reported_at, runtime, size):
+        """
+        Add the run time of a report to the last size ones of hostname,
+        unless that report was already seen
+
+        Return the run times kept, oldest first
+
+        >>> state = HostState(':memory:')
+        >>> state.record_runtime('server1', datetime(2012, 2, 14), 40, 2)
+        [40.0]
+        >>> state.record_runtime('server1', datetime(2012, 2, 14), 40, 2)
+        [40.0]
+        >>> state.record_runtime('server1', datetime(2012, 2, 15), 50, 2)
+        [40.0, 50.0]
+        >>> state.record_runtime('server1', datetime(2012, 2, 16), 60, 2)
+        [50.0, 60.0]
+        """
+
+        from foreman_checks.history import RingBuffer
+
+        when = reported_at.strftime(TIMESTAMP_FORMAT)
+        row = self.db.execute('SELECT reported_at, position, count, samples '
+                              'FROM runtimes WHERE hostname = ?',
+                              (hostname,)).fetchone()
+        if row is None:
+            last, ring = None, RingBuffer(size)
+        else:
+            last, ring = row[0], RingBuffer.loads(*row[1:])
+            if ring.size != size:
+                ring = RingBuffer(size, ring.values())
+
+        if runtime is not None and (last is None or when > last):
+            ring.append(runtime)
+            position, count, blob = ring.dumps()
+            self.db.execute('INSERT OR REPLACE INTO runtimes '
+                            '(hostname, reported_at, position, count, samples)'
+                            ' VALUES (?, ?, ?, ?, ?)',
+                            (hostname, when, position, count, buffer(blob)))
+        return ring.values()
+
+    def commit(self):
+        """
+        Write what was stored so far
+        """
+
+        self.db.commit()
+
+    def close(self):
+        """
+        Write and release the file
+        """
+
+        self.db.commit()
+        self.db.close()
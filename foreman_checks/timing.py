@@ -0,0 +1,202 @@
+#-*- coding: utf-8 -*-
+"""
+
+Where the time of a check goes
+
+Every session counts, over all its requests :
+
+ - connect    name resolution, TCP and TLS handshakes of new connections
+ - server     request sent to status line received, foreman at work
+ - transfer   reading the body, with the bytes read
+ - parse      json.loads() of the replies
+
+and the cli times the whole run, what is left is the check itself.
+The bytes are the bytes read off the wire, compressed replies are
+listed with the size they inflated to.
+With --timing the totals are given as perfdata (fetch_ms, parse_ms,
+check_ms, bytes), -v prints the breakdown, --timing-log appends them as
+a JSON line to a file and --timing-statsd sends them as StatsD metrics
+over UDP. Requests made in parallel (bulk mode, several foremen) add up,
+fetch_ms may exceed the run time.
+
+Few doctests, run with :
+ $ python -m doctest foreman_checks/timing.py -v
+
+"""
+__date__ = "October 2026"
+
+__version__ = "1.0"
+
+import threading
+import time
+
+PHASES = ['connect', 'server', 'transfer', 'parse']
+
+
+class Timings(object):
+    """
+    Seconds spent per phase, bytes and requests, safe to share between
+    threads
+
+    >>> timings = Timings()
+    >>> timings.add('connect', 0.002)
+    >>> timings.add('server', 0.030)
+    >>> timings.add('transfer', 0.005, 2048)
+    >>> timings.add('parse', 0.001)
+    >>> timings.run = 0.040
+    >>> timings.perfdata()
+    'fetch_ms=37.0ms;;;0 parse_ms=1.0ms;;;0 check_ms=2.0ms;;;0 bytes=2048B;;;0'
+    >>> timings.breakdown()
+    'connect 2.0ms, server 30.0ms, transfer 5.0ms, parse 1.0ms, check 2.0ms \
+- 2048 bytes in 1 requests'
+    >>> timings.inflated('http://foreman/reports/last', 2048, 40960)
+    >>> timings.compression()
+    ['http://foreman/reports/last 2048 bytes inflated to 40960, 20.0:1']
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.size = 0
+        self.requests = 0
+        # (url, bytes read, bytes inflated) of the compressed replies
+        self.compressed = []
+        # wall clock of the whole run, set by the cli
+        self.run = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, phase, seconds, size=0):
+        """ Count seconds spent in phase, size bytes read """
+        with self.lock:
+            self.seconds[phase] += seconds
+            self.size += size
+            if phase == 'server':
+                self.requests += 1
+
+    def inflated(self, url, wire, size):
+        """ Count a compressed reply of wire bytes, size once inflated """
+        with self.lock:
+            self.compressed.append((url, wire, size))
+
+    def merge(self, other):
+        """ Add the counts of another Timings """
+        with self.lock:
+            for phase in PHASES:
+                self.seconds[phase] += other.seconds[phase]
+            self.size += other.size
+            self.requests += other.requests
+            self.compressed.extend(other.compressed)
+
+    def milliseconds(self):
+        """ fetch, parse and check milliseconds """
+        fetch = sum([self.seconds[phase]
+                     for phase in ('connect', 'server', 'transfer')])
+        parse = self.seconds['parse']
+        check = max(self.run - fetch - parse, 0)
+        return fetch * 1000, parse * 1000, check * 1000
+
+    def perfdata(self):
+        """ The totals as Nagios perfdata """
+        fetch, parse, check = self.milliseconds()
+        return 'fetch_ms=%.1fms;;;0 parse_ms=%.1fms;;;0 check_ms=%.1fms;;;0 ' \
+               'bytes=%dB;;;0' % (fetch, parse, check, self.size)
+
+    def breakdown(self):
+        """ Every phase, for -v """
+        return '%s, check %.1fms - %s bytes in %s requests' % (
+                    ', '.join(['%s %.1fms' % (phase,
+                                              self.seconds[phase] * 1000)
+                               for phase in PHASES]),
+                    self.milliseconds()[2], self.size, self.requests)
+
+    def compression(self):
+        """ Compression ratio of every compressed reply, for -v """
+        return ['%s %s bytes inflated to %s, %.1f:1' % (
+                    url, wire, size, float(size) / max(wire, 1))
+                for url, wire, size in self.compressed]
+
+    def as_dict(self):
+        """
+        Every figure in milliseconds, for the JSON lines and StatsD
+
+        >>> sorted(Timings().as_dict())[:4]
+        ['bytes', 'check_ms', 'connect_ms', 'fetch_ms']
+        """
+
+        fetch, parse, check = self.milliseconds()
+        figures = {'fetch_ms': fetch, 'parse_ms': parse, 'check_ms': check,
+                   'run_ms': self.run * 1000, 'bytes': self.size,
+                   'requests': self.requests}
+        for phase in PHASES:
+            figures['%s_ms' % phase] = self.seconds[phase] * 1000
+        return figures
+
+
+def statsd_lines(prefix, figures):
+    """
+    StatsD metrics of figures : timers for the milliseconds, counters
+    for the rest
+
+    >>> statsd_lines('check_foreman.herd', {'fetch_ms': 12.5, 'bytes': 10})
+    ['check_foreman.herd.bytes:10|c', 'check_foreman.herd.fetch_ms:12.5|ms']
+    """
+
+    lines = []
+    for name in sorted(figures):
+        kind = name.endswith('_ms') and 'ms' or 'c'
+        lines.append('%s.%s:%g|%s' % (prefix, name, figures[name], kind))
+    return lines
+
+
+def send_statsd(target, lines):
+    """
+    Send the lines to the StatsD daemon at [HOST:]PORT over UDP, a lost
+    packet or an absent daemon never fails the check
+    """
+
+    import socket
+
+    host, _, port = target.rpartition(':')
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.sendto('\n'.join(lines), (host or '127.0.0.1', int(port)))
+        finally:
+            sock.close()
+    except (socket.error, ValueError):
+        pass
+
+
+def append_log(path, record):
+    """
+    Append record as one JSON line to the file at path, ignoring errors
+    for the same reason
+    """
+
+    from foreman_checks import core
+
+    try:
+        handle = open(path, 'a')
+        try:
+            handle.write(core.json_module().dumps(record, sort_keys=True))
+            handle.write('\n')
+        finally:
+            handle.close()
+    except IOError:
+        pass
+
+
+def report(params, names, timings, status):
+    """
+    Hand the timings of a run of the checks names over to --timing-log
+    and --timing-statsd
+    """
+
+    figures = timings.as_dict()
+    if params.get('timing_log'):
+        record = dict(figures, time=int(time.time()), checks=names,
+                      foreman=params.get('foreman'), status=status)
+        append_log(params['timing_log'], record)
+    if params.get('timing_statsd'):
+        send_statsd(params['timing_statsd'],
+                    statsd_lines('check_foreman.%s' % '_'.join(names),
+                                 figures))